@@ -1,15 +1,48 @@
+import os
+import sys
 from datetime import datetime, timedelta
 from airflow import DAG
-from airflow.operators.bash import BashOperator
+from airflow.decorators import task
+from airflow.exceptions import AirflowException, AirflowSkipException
+from airflow.operators.python import get_current_context
 
 # Path to your project inside the Airflow containers
 PROJECT_ROOT = "/opt/airflow/project"
-PYTHON_EXE = "python"
+TRACKING_URI = "sqlite:///mlflow.db"
+SKIP_EXIT_CODE = 99  # src.pipeline.stage_cache.SKIP_EXIT_CODE
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+# No heavy imports: the candidate list only shapes the training fan-out
+from src.training.candidates import task_groups
+
+
+def run_cli(*argv):
+    """
+    Run one `python -m src.cli` command inside the task process (no extra
+    interpreter; the command imports only what it needs). Exit code 99
+    (stage cache hit, nothing to do) marks the task skipped.
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    os.environ.setdefault("MLFLOW_TRACKING_URI", TRACKING_URI)
+    from src.cli import run
+
+    code, result = run(list(argv))
+    if code == SKIP_EXIT_CODE:
+        raise AirflowSkipException(f"{argv[0]}: nothing to do")
+    if code != 0:
+        raise AirflowException(f"{' '.join(argv)} exited with {code}")
+    return result
+
 
 default_args = {
     "owner": "chaithu",
     "retries": 1,
     "retry_delay": timedelta(minutes=5),
+    # A skipped (unchanged) upstream must not skip the stages after it:
+    # each one checks its own fingerprint
+    "trigger_rule": "none_failed",
 }
 
 with DAG(
@@ -17,51 +50,88 @@ with DAG(
     default_args=default_args,
     description="IVF trigger model retraining with MLflow model registry",
     start_date=datetime(2026, 1, 17),
-    schedule_interval="@daily",   # adjust to @weekly if needed
+    # Frequent, cheap checks; retrain_needed decides whether anything runs
+    schedule_interval="@hourly",
     catchup=False,
+    max_active_runs=1,
     tags=["ivf", "mlops", "mlflow"],
 ) as dag:
 
-    # 1) Pull latest IVF data from MySQL into data/raw/ivf_from_mysql.csv
-    pull_mysql = BashOperator(
-        task_id="pull_mysql_to_csv",
-        bash_command=(
-            f"cd {PROJECT_ROOT} && "
-            f"{PYTHON_EXE} src/data/pull_mysql_to_csv.py"
-        ),
-    )
-
-    # 2) Run Great Expectations + preprocessing
-    #    ge_validate_ivf_preprocessed.py should:
-    #      - read data/raw/ivf_from_mysql.csv
-    #      - validate with Great Expectations
-    #      - write data/processed/ivf_trigger_preprocessed.csv
-    ge_validate = BashOperator(
-        task_id="ge_validate_and_preprocess",
-        bash_command=(
-            f"cd {PROJECT_ROOT} && "
-            f"{PYTHON_EXE} ge_validate_ivf_preprocessed.py"
-        ),
-    )
-
-    # 3) Train models and log to MLflow
-    train_mlflow = BashOperator(
-        task_id="train_models_mlflow",
-        bash_command=(
-            f"cd {PROJECT_ROOT} && "
-            f"MLFLOW_TRACKING_URI=sqlite:///mlflow.db "
-            f"{PYTHON_EXE} mlflow_training.py"
-        ),
-    )
-
-    # 4) Register best model in MLflow Model Registry
-    register_best = BashOperator(
-        task_id="register_best_model",
-        bash_command=(
-            f"cd {PROJECT_ROOT} && "
-            f"MLFLOW_TRACKING_URI=sqlite:///mlflow.db "
-            f"{PYTHON_EXE} register_best_model.py"
-        ),
-    )
-
-    pull_mysql >> ge_validate >> train_mlflow >> register_best
+    # 0) Retrain only when enough new rows arrived since the last trained
+    #    watermark, live drift crossed its thresholds, or the model is older
+    #    than the max staleness (src/pipeline/retrain_trigger.py).
+    #    Short-circuit: skips every downstream task, whatever its trigger rule
+    @task.short_circuit(task_id="retrain_needed", ignore_downstream_trigger_rules=True)
+    def retrain_needed():
+        return run_cli("retrain-check")["retrain"]
+
+    # 1) Pull rows added since the last run from MySQL into Parquet parts
+    #    under data/raw/ivf_from_mysql/ (high-water mark kept alongside);
+    #    skipped when no new rows arrived
+    @task(task_id="pull_mysql_to_csv")
+    def pull_mysql():
+        run_cli("stage", "pull", "--", "pull")
+
+    # 2) Preprocess the pulled rows not seen before into the date-partitioned
+    #    dataset (src/preprocessing/incremental_preprocess.py), so validation
+    #    and training see them; skipped when the pull brought nothing new
+    @task(task_id="preprocess_new_rows")
+    def preprocess():
+        run_cli("stage", "preprocess", "--", "preprocess")
+
+    # 3) Validate the preprocessed dataset (native validator).
+    #    --stream validates the daily partitions in parallel worker processes
+    #    and merges their summary states, so memory stays flat
+    @task(task_id="ge_validate_and_preprocess")
+    def ge_validate():
+        run_cli("stage", "validate", "--", "validate", "--stream", "--workers", "4")
+
+    # 4) Materialize Feast features once per run (skipped when the online
+    #    store is already current); training/registration only check freshness
+    @task(task_id="materialize_features")
+    def materialize_features():
+        return run_cli("materialize")
+
+    # 5) Train candidates in parallel, one mapped task instance per model in
+    #    src/training/candidates.py, each retried on its own. The gate skips
+    #    the whole fan-out for an unchanged dataset and training code.
+    @task(task_id="train_gate")
+    def train_gate():
+        run_cli("stage", "train", "--check")
+
+    # Candidates are grouped by their resources into one mapped task per
+    # pool / pool_slots / queue (mapped instances share operator arguments);
+    # the task caps its own BLAS/OpenMP threads to the candidate's n_jobs
+    @task(trigger_rule="all_success", retries=2)
+    def train_candidate(name: str):
+        run_cli("train", "--candidate", name, "--batch", get_current_context()["run_id"])
+
+    # Reduce: best run of this batch -> data/processed/training_winner.json.
+    # all_done, so one failed candidate doesn't block the others' winner
+    # (the batch is then left uncached and retrained next run). Fails when
+    # the gate opened but no candidate finished, so mark_trained never runs
+    @task(task_id="select_winner", trigger_rule="all_done")
+    def select_winner():
+        run_cli("select-winner", "--batch", get_current_context()["run_id"])
+
+    # 6) Register best model in MLflow Model Registry (skipped when the
+    #    training fingerprint is the one already registered from)
+    @task(task_id="register_best_model")
+    def register_best():
+        run_cli("stage", "register", "--", "register")
+
+    # 7) Advance the trained watermark, only when the train stage ran in
+    #    this run; otherwise the task is skipped and the watermark stays
+    #    pending, so rows that did not reach training trigger the next run
+    @task(task_id="mark_trained")
+    def mark_trained():
+        run_cli("mark-trained")
+
+    gate = train_gate()
+    trained = [
+        train_candidate.override(task_id=f"train_candidate_{suffix}", **args).expand(name=names)
+        for suffix, (args, names) in task_groups().items()
+    ]
+    retrain_needed() >> pull_mysql() >> preprocess() >> ge_validate() >> materialize_features() >> gate
+    gate >> trained
+    trained >> select_winner() >> register_best() >> mark_trained()
@@ -1,14 +1,23 @@
 from fastapi import FastAPI, UploadFile, File
 from pydantic import BaseModel
+from typing import List
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-import mlflow
+import numpy as np
 import io
+import threading
+import time
+from prometheus_client import Counter, Gauge
 from prometheus_fastapi_instrumentator import Instrumentator
-from feast import FeatureStore
 import os
 from datetime import datetime
 
+from src.monitoring.drift import DriftMonitor, observe_predictions
+from src.monitoring.quality import QualityTracker
+from src.serving.feature_cache import OnlineFeatureCache
+from src.serving.model_cache import ModelCache
+from src.serving.prediction_log import PredictionLogger
+from src.validation.online import InputChecker
+
 # ===================================================================
 # CONFIG
 # ===================================================================
@@ -24,13 +33,31 @@ MODEL_NAME = "ivf_trigger_model"
 MODEL_VERSION = 5
 BEST_RUN_ID = "8bcf729641d0463cad34bb45a7443a6b"
 BEST_ARTIFACT_NAME = "GradientBoosting"  # The algorithm name used in training
+MODEL_REFRESH_INTERVAL_S = int(os.environ.get("IVF_MODEL_REFRESH_INTERVAL_S", "300"))
+# "flag": predict and report violations; "reject": don't predict for invalid rows
+INPUT_VALIDATION_MODE = os.environ.get("IVF_INPUT_VALIDATION_MODE", "flag")
 
 
 # ===================================================================
 # INITIALIZE FEAST
 # ===================================================================
+# Nothing Feast-related happens at import: the FeatureStore (and the feast
+# import itself) is built on the first /features call
 FEAST_REPO_PATH = os.path.join(os.path.dirname(__file__), "..", "feast", "feature_repo")
-fs = FeatureStore(repo_path=FEAST_REPO_PATH)
+feature_cache = None
+_feature_cache_lock = threading.Lock()
+
+
+def get_feature_cache() -> OnlineFeatureCache:
+    """Read-through cache in front of the online store, created on first use"""
+    global feature_cache
+    if feature_cache is None:
+        with _feature_cache_lock:
+            if feature_cache is None:
+                from feast import FeatureStore
+
+                feature_cache = OnlineFeatureCache(store=FeatureStore(repo_path=FEAST_REPO_PATH))
+    return feature_cache
 
 # ===================================================================
 # INITIALIZE FASTAPI
@@ -40,33 +67,130 @@ Instrumentator().instrument(app).expose(app)
 
 # Global model variable
 model = None
+model_version = MODEL_VERSION
+model_cache = ModelCache()
+_model_lock = threading.Lock()
+drift_monitor = None
+# Audit/feedback log: request threads only append to an in-memory buffer
+prediction_logger = PredictionLogger()
+# Delayed outcome labels joined to logged predictions by patient/day
+quality_tracker = QualityTracker()
+
+MODEL_COLD_START_SECONDS = Gauge(
+    "ivf_model_cold_start_seconds",
+    "Time to get a servable model at startup",
+    ["source"],
+)
+MODEL_LOADED_VERSION = Gauge(
+    "ivf_model_loaded_version",
+    "Registry version of the model currently being served",
+)
+
+# Same rule definitions as the offline validation suite (src/validation/suite.py)
+input_checker = InputChecker(DATA_COLUMNS)
+
+INPUT_RULE_VIOLATIONS = Counter(
+    "ivf_input_rule_violations_total",
+    "Input values breaking an expectation-suite rule",
+    ["rule", "endpoint"],
+)
+INPUT_ROWS_CHECKED = Counter(
+    "ivf_input_rows_checked_total",
+    "Input rows checked against the expectation suite",
+    ["endpoint", "outcome"],
+)
+
+
+def record_input_checks(endpoint: str, rule_counts: dict, n_rows: int, n_invalid: int):
+    for rule, count in rule_counts.items():
+        INPUT_RULE_VIOLATIONS.labels(rule=rule, endpoint=endpoint).inc(count)
+    INPUT_ROWS_CHECKED.labels(endpoint=endpoint, outcome="valid").inc(n_rows - n_invalid)
+    INPUT_ROWS_CHECKED.labels(endpoint=endpoint, outcome="invalid").inc(n_invalid)
+
+
+def attach_drift_monitor(version):
+    """Compare live inputs with the training profile of the served version"""
+    global drift_monitor
+    profile = model_cache.reference_profile(MODEL_NAME, version)
+    if profile is None:
+        drift_monitor = None
+        print(f"⚠️  No drift reference profile for {MODEL_NAME} v{version}")
+        return
+    drift_monitor = DriftMonitor(profile).bind_metrics()
+
 
 def load_best_model():
-    """Load model from MLflow models registry"""
-    global model
+    """Load model from the local cache, falling back to the MLflow registry"""
+    global model, model_version
     if model is not None:
         return model
     
-    try:
-        print("Loading model from MLflow models registry...")
-        # Load directly from model registry using stage
-        model = mlflow.sklearn.load_model(f"models:/{MODEL_NAME}/latest")
-        print(f"✅ Model loaded successfully: {MODEL_NAME}")
+    with _model_lock:
+        if model is not None:
+            return model
+        
+        start = time.perf_counter()
+        cached = model_cache.load(MODEL_NAME)
+        if cached is not None:
+            model, model_version = cached[0], int(cached[1])
+            source = "cache"
+            print(f"✅ Model loaded from local cache: {MODEL_NAME} v{model_version}")
+        else:
+            try:
+                print("Cache miss - loading model from MLflow models registry...")
+                version = model_cache.refresh(MODEL_NAME)
+                model = model_cache.load(MODEL_NAME, version)[0]
+                model_version = int(version)
+                source = "registry"
+                print(f"✅ Model loaded: {MODEL_NAME} v{model_version}")
+            except Exception as e:
+                print(f"❌ Failed to load model: {e}")
+                raise
+        
+        MODEL_COLD_START_SECONDS.labels(source=source).set(time.perf_counter() - start)
+        MODEL_LOADED_VERSION.set(int(model_version))
+        attach_drift_monitor(model_version)
         return model
-    except Exception as e:
-        print(f"Error: {e}")
-        # Try alternate loading
+
+
+def refresh_model_loop(stop_event: threading.Event):
+    """Poll the registry in the background and hot-swap newer versions"""
+    global model, model_version
+    while not stop_event.wait(MODEL_REFRESH_INTERVAL_S):
         try:
-            print("Trying alternate model loading method...")
-            from mlflow.tracking import MlflowClient
-            client = MlflowClient()
-            model_version = client.get_latest_versions(MODEL_NAME, stages=["None"])[0]
-            model = mlflow.sklearn.load_model(f"models:/{MODEL_NAME}/{model_version.version}")
-            print(f"✅ Model loaded: {MODEL_NAME} v{model_version.version}")
-            return model
-        except Exception as e2:
-            print(f"❌ Failed to load model: {e2}")
-            raise
+            latest = model_cache.refresh(MODEL_NAME)
+        except Exception as e:
+            print(f"⚠️  Model refresh skipped: {e}")
+            continue
+        if str(latest) != str(model_version):
+            new_model = model_cache.load(MODEL_NAME, latest)[0]
+            with _model_lock:
+                model, model_version = new_model, int(latest)
+            MODEL_LOADED_VERSION.set(model_version)
+            attach_drift_monitor(model_version)
+            print(f"🔄 Switched to {MODEL_NAME} v{model_version}")
+
+
+_refresh_stop = threading.Event()
+
+
+@app.on_event("startup")
+def warm_start():
+    """Serve from the cache immediately; updates are picked up in the background"""
+    try:
+        load_best_model()
+    except Exception as e:
+        print(f"⚠️  No model available at startup: {e}")
+    prediction_logger.start()
+    threading.Thread(
+        target=refresh_model_loop, args=(_refresh_stop,), daemon=True
+    ).start()
+
+
+@app.on_event("shutdown")
+def stop_refresh():
+    _refresh_stop.set()
+    prediction_logger.close()
 
 
 # ===================================================================
@@ -74,6 +198,8 @@ def load_best_model():
 # ===================================================================
 def preprocess(df: pd.DataFrame) -> pd.DataFrame:
     """Preprocess data: handle missing values, encode categoricals"""
+    from sklearn.preprocessing import LabelEncoder
+
     if TARGET_COL in df.columns:
         df = df.drop(columns=[TARGET_COL])
     
@@ -99,6 +225,16 @@ def preprocess(df: pd.DataFrame) -> pd.DataFrame:
 # ===================================================================
 # PYDANTIC MODEL
 # ===================================================================
+class PatientIds(BaseModel):
+    patient_ids: List[str]
+
+
+class OutcomeRecord(BaseModel):
+    patient_id: str
+    day: int
+    trigger_outcome: int
+
+
 class PatientRecord(BaseModel):
     patient_id: str
     age: float
@@ -127,7 +263,7 @@ def root():
         "message": "IVF Trigger Decision API is running",
         "version": "1.0",
         "model": MODEL_NAME,
-        "model_version": MODEL_VERSION,
+        "model_version": model_version,
         "feast_integrated": True
     }
 
@@ -138,20 +274,55 @@ def health_check():
     return {
         "status": "healthy",
         "model_loaded": model is not None,
+        "model_version": model_version,
         "feast_path": FEAST_REPO_PATH,
-        "feast_initialized": True
+        "feast_initialized": feature_cache is not None,
+        "feature_cache": feature_cache.stats() if feature_cache is not None else None,
+        "input_validation_mode": INPUT_VALIDATION_MODE
     }
 
 
+@app.get("/features/{patient_id}")
+def online_features(patient_id: str):
+    """Latest online features for one patient (served from the in-process cache)"""
+    return {"patient_id": patient_id, "features": get_feature_cache().get(patient_id)}
+
+
+@app.post("/features")
+def online_features_batch(request: PatientIds):
+    """Online features for many patients; cache misses go to Feast in one batch"""
+    return {"features": get_feature_cache().get_many(request.patient_ids)}
+
+
 @app.post("/predict/row")
 def predict_row(record: PatientRecord):
     """Predict for single patient"""
+    start = time.perf_counter()
     try:
+        # Check inputs against the clinical rules before predicting
+        record_dict = record.dict()
+        violations = input_checker.check_record(record_dict)
+        record_input_checks("row", {rule: 1 for rule in violations}, 1, int(bool(violations)))
+        if violations and INPUT_VALIDATION_MODE == "reject":
+            prediction_logger.log({
+                "endpoint": "row",
+                "patient_id": record.patient_id,
+                "day": record.day,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "input_valid": False,
+                "inputs": record_dict,
+            })
+            return {
+                "error": "Input outside the validated clinical ranges",
+                "patient_id": record.patient_id,
+                "input_violations": violations
+            }
+        
         # Load model if not loaded
         model_to_use = load_best_model()
         
         # Create dataframe from record
-        df = pd.DataFrame([record.dict()])
+        df = pd.DataFrame([record_dict])
         
         # Preprocess
         features = preprocess(df)
@@ -160,12 +331,31 @@ def predict_row(record: PatientRecord):
         proba = model_to_use.predict_proba(features)[:, 1]
         pred = int(proba[0] > 0.5)
         
+        # Streaming drift histograms: O(1) per row, no raw inputs kept
+        if drift_monitor is not None:
+            drift_monitor.update_record(record_dict)
+        observe_predictions(proba, model_version)
+        
+        prediction_logger.log({
+            "endpoint": "row",
+            "patient_id": record.patient_id,
+            "day": record.day,
+            "model_version": model_version,
+            "pred_trigger_probability": float(proba[0]),
+            "pred_trigger_recommended": pred,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "input_valid": not violations,
+            "inputs": record_dict,
+        })
+        
         return {
             "patient_id": record.patient_id,
             "pred_trigger_recommended": pred,
             "pred_trigger_probability": float(proba[0]),
-            "model_version": MODEL_VERSION,
-            "feast_enabled": True
+            "model_version": model_version,
+            "feast_enabled": True,
+            "input_valid": not violations,
+            "input_violations": violations
         }
     
     except Exception as e:
@@ -178,6 +368,7 @@ def predict_row(record: PatientRecord):
 @app.post("/predict/file")
 async def predict_file(file: UploadFile = File(...)):
     """Predict for multiple patients from CSV/Excel"""
+    start = time.perf_counter()
     try:
         # Load model if not loaded
         model_to_use = load_best_model()
@@ -190,23 +381,61 @@ async def predict_file(file: UploadFile = File(...)):
         else:
             df = pd.read_excel(io.BytesIO(content))
         
-        # Preprocess
-        features = preprocess(df.copy())
+        # Per-row check against the clinical rules
+        check = input_checker.check_frame(df)
+        record_input_checks("file", check.rule_counts(), len(df), check.n_invalid)
+        if INPUT_VALIDATION_MODE == "reject":
+            keep = check.row_ok
+        else:
+            keep = np.ones(len(df), dtype=bool)
         
-        # Make predictions
-        proba = model_to_use.predict_proba(features)[:, 1]
-        preds = (proba > 0.5).astype(int)
+        if drift_monitor is not None:
+            drift_monitor.update_frame(df)
+        
+        preds = pd.Series([None] * len(df), dtype=object)
+        probas = pd.Series([None] * len(df), dtype=object)
+        if keep.any():
+            # Preprocess
+            features = preprocess(df[keep].copy())
+            
+            # Make predictions
+            proba = model_to_use.predict_proba(features)[:, 1]
+            preds[keep] = (proba > 0.5).astype(int).tolist()
+            probas[keep] = proba.tolist()
+            observe_predictions(proba, model_version)
         
         # Add predictions to original dataframe
-        df["pred_trigger_recommended"] = preds
-        df["pred_trigger_probability"] = proba
-        df["model_version"] = MODEL_VERSION
+        df["pred_trigger_recommended"] = preds.to_numpy()
+        df["pred_trigger_probability"] = probas.to_numpy()
+        df["model_version"] = model_version
+        df["input_valid"] = check.row_ok
+        df["input_violations"] = check.violations()
+        predictions = df.to_dict(orient="records")
+        
+        # One buffered append for the whole batch; serialization happens
+        # on the logger's flusher thread
+        latency_ms = (time.perf_counter() - start) * 1000
+        prediction_logger.log_many([
+            {
+                "endpoint": "file",
+                "patient_id": row.get("patient_id"),
+                "day": row.get("day"),
+                "model_version": model_version,
+                "pred_trigger_probability": row["pred_trigger_probability"],
+                "pred_trigger_recommended": row["pred_trigger_recommended"],
+                "latency_ms": latency_ms,
+                "input_valid": bool(row["input_valid"]),
+                "inputs": row,
+            }
+            for row in predictions
+        ])
         
         return {
             "total_records": len(df),
-            "predictions": df.to_dict(orient="records"),
+            "invalid_records": check.n_invalid,
+            "predictions": predictions,
             "feast_enabled": True,
-            "model_version": MODEL_VERSION
+            "model_version": model_version
         }
     
     except Exception as e:
@@ -214,3 +443,14 @@ async def predict_file(file: UploadFile = File(...)):
             "error": str(e),
             "file": file.filename
         }
+
+
+@app.post("/outcomes")
+def ingest_outcomes(outcomes: List[OutcomeRecord]):
+    """Join delayed trigger outcomes to logged predictions and update quality metrics"""
+    summary = quality_tracker.ingest([o.dict() for o in outcomes])
+    return {
+        "received": len(outcomes),
+        **summary,
+        "quality": {v: quality_tracker.window(v) for v in quality_tracker.versions()}
+    }
@@ -0,0 +1,66 @@
+"""
+Benchmark for src/data/bulk_load.py against a local SQLite stand-in.
+
+Compares pandas' default to_sql with bulk_load in append, upsert (run
+twice to show idempotency) and staging-swap modes and prints rows/s.
+
+Run from the project root:
+    python -m benchmarks.bench_bulk_load
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from src.data.bulk_load import DEFAULT_BATCH_SIZE, bulk_load, format_stats
+
+N_ROWS = 200_000
+
+
+def make_rows(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "patient_id": [f"P{i // 10:07d}" for i in range(n_rows)],
+        "age": rng.integers(18, 50, n_rows),
+        "amh_ng_ml": rng.uniform(0.1, 15, n_rows).round(2),
+        "day": np.arange(n_rows) % 10 + 2,
+        "avg_follicle_size_mm": rng.uniform(8, 30, n_rows).round(1),
+        "follicle_count": rng.integers(1, 60, n_rows),
+        "estradiol_pg_ml": rng.uniform(20, 6000, n_rows).round(0),
+        "progesterone_ng_ml": rng.uniform(0.1, 5, n_rows).round(2),
+        "trigger_recommended": rng.integers(0, 2, n_rows),
+    })
+
+
+def main(n_rows: int, batch_size: int):
+    df = make_rows(n_rows)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="ivf_bulk_"), "bench.db")
+    engine = sa.create_engine(f"sqlite:///{db_path}")
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        df.to_sql("baseline", conn, index=False)
+    elapsed = time.perf_counter() - start
+    print(f"to_sql default {n_rows} rows in {elapsed:.3f}s ({n_rows / elapsed:.1f} rows/s)")
+
+    print(format_stats(bulk_load(df, engine, "appended", mode="append", batch_size=batch_size)))
+    print(format_stats(bulk_load(df, engine, "upserted", mode="upsert", batch_size=batch_size)))
+    print(format_stats(bulk_load(df, engine, "upserted", mode="upsert", batch_size=batch_size)))
+    print(format_stats(bulk_load(df, engine, "swapped", mode="swap", batch_size=batch_size)))
+
+    with engine.connect() as conn:
+        count = conn.execute(sa.text("SELECT COUNT(*) FROM upserted")).scalar()
+    assert count == n_rows, f"upsert is not idempotent: {count} rows"
+    print(f"upserted table holds {count} rows after two loads")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+    main(args.rows, args.batch_size)
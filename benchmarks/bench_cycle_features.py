@@ -0,0 +1,74 @@
+"""
+Benchmark for src/preprocessing/cycle_features.py.
+
+Times add_cycle_features() on synthetic patient-day tables of growing size
+(per-row cost should stay flat, i.e. linear scaling) and checks that the
+O(1) serving path CycleFeatureState matches the offline features.
+
+Run from the project root:
+    python -m benchmarks.bench_cycle_features
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.cycle_features import (
+    CYCLE_FEATURE_COLS,
+    CycleFeatureState,
+    add_cycle_features,
+)
+
+SIZES = [100_000, 1_000_000, 3_000_000]
+SCANS_PER_PATIENT = 6
+
+
+def make_patient_days(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n_patients = max(1, n_rows // SCANS_PER_PATIENT)
+    patient = rng.integers(0, n_patients, n_rows)
+    df = pd.DataFrame({
+        "patient_id": pd.Series(patient).map("P{:07d}".format),
+        "day": rng.integers(2, 15, n_rows),
+        "avg_follicle_size_mm": rng.uniform(8, 30, n_rows).round(1),
+        "estradiol_pg_ml": rng.uniform(20, 6000, n_rows).round(0),
+        "follicle_count": rng.integers(1, 60, n_rows),
+    })
+    # Shuffled like a real multi-clinic export
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def check_online_matches_offline(n_rows: int = 20_000):
+    df = make_patient_days(n_rows)
+    offline = add_cycle_features(df)
+
+    state = CycleFeatureState()
+    ordered = df.sort_values(["patient_id", "day"], kind="mergesort")
+    rows = []
+    for idx, rec in zip(ordered.index, ordered.to_dict(orient="records")):
+        rows.append((idx, state.update(rec["patient_id"], rec)))
+    online = pd.DataFrame([r for _, r in rows], index=[i for i, _ in rows]).loc[df.index]
+
+    pd.testing.assert_frame_equal(
+        offline[CYCLE_FEATURE_COLS], online[CYCLE_FEATURE_COLS],
+        check_dtype=False, rtol=1e-9,
+    )
+    print(f"online == offline on {n_rows:,} rows ({len(state):,} patients)")
+
+
+def main(sizes):
+    check_online_matches_offline()
+    print(f"{'rows':>12} {'seconds':>9} {'ns/row':>8}")
+    for n in sizes:
+        df = make_patient_days(n)
+        start = time.perf_counter()
+        add_cycle_features(df)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>12,} {elapsed:>9.3f} {elapsed / n * 1e9:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    main(parser.parse_args().sizes)
@@ -0,0 +1,104 @@
+"""
+Benchmark for src/serving/feature_cache.py against raw Feast lookups.
+
+Copies the feature repo definitions into a temporary directory, writes the
+offline source, applies and materializes it into a fresh SQLite online
+store, then replays a skewed stream of patient lookups (a few patients are
+requested far more often, as on a busy clinic day):
+  - raw get_online_features() per request
+  - OnlineFeatureCache.get() per request
+  - multi-patient requests: one batched cache call vs one Feast call each
+and prints p50/p99 latency and the cache hit rate.
+
+Run from the project root:
+    python -m benchmarks.bench_feature_cache
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.serving.feature_cache import OnlineFeatureCache
+from src.training.feast_dataset import FEAST_REPO_PATH, RAW_CSV_PATH, write_offline_source
+
+N_REQUESTS = 5_000
+BATCH_SIZE = 20
+
+
+def make_repo() -> str:
+    repo = tempfile.mkdtemp(prefix="ivf_feast_")
+    shutil.copy(os.path.join(FEAST_REPO_PATH, "feature_store.yaml"), repo)
+    shutil.copytree(os.path.join(FEAST_REPO_PATH, "features"), os.path.join(repo, "features"),
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    write_offline_source(RAW_CSV_PATH, os.path.join(repo, "data", "trigger_day_prediction"))
+    subprocess.run(["feast", "apply"], cwd=repo, check=True, capture_output=True)
+    return repo
+
+
+def percentiles(samples_s: list) -> str:
+    us = np.array(samples_s) * 1e6
+    return f"p50 {np.percentile(us, 50):8.1f} us  p99 {np.percentile(us, 99):8.1f} us"
+
+
+def main(n_requests: int, batch_size: int):
+    from feast import FeatureStore
+
+    repo = make_repo()
+    store = FeatureStore(repo_path=repo)
+    store.materialize(start_date=datetime(2000, 1, 1, tzinfo=timezone.utc),
+                      end_date=datetime.now(timezone.utc))
+    patients = pd.read_parquet(os.path.join(repo, "data", "trigger_day_prediction"),
+                               columns=["Patient_ID"])["Patient_ID"].unique()
+
+    # Zipf-like skew over patients
+    rng = np.random.default_rng(42)
+    weights = 1 / np.arange(1, len(patients) + 1)
+    stream = rng.choice(patients, size=n_requests, p=weights / weights.sum())
+
+    cache = OnlineFeatureCache(store=store, marker_path=os.path.join(repo, "data", "marker.json"))
+    refs = cache.features  # the feature service: measurements + on-demand derived features
+
+    raw = []
+    for pid in stream:
+        start = time.perf_counter()
+        store.get_online_features(features=refs, entity_rows=[{"Patient_ID": pid}]).to_dict()
+        raw.append(time.perf_counter() - start)
+    print(f"raw Feast, 1 patient     {percentiles(raw)}")
+
+    cached = []
+    for pid in stream:
+        start = time.perf_counter()
+        cache.get(pid)
+        cached.append(time.perf_counter() - start)
+    print(f"cache,     1 patient     {percentiles(cached)}  hit rate {cache.stats()['hit_rate']:.1%}")
+
+    batches = [stream[i:i + batch_size] for i in range(0, len(stream), batch_size)]
+    raw_batch, cached_batch = [], []
+    for batch in batches:
+        start = time.perf_counter()
+        for pid in batch:
+            store.get_online_features(features=refs, entity_rows=[{"Patient_ID": pid}]).to_dict()
+        raw_batch.append(time.perf_counter() - start)
+    cache.invalidate()
+    for batch in batches:
+        start = time.perf_counter()
+        cache.get_many(list(batch))
+        cached_batch.append(time.perf_counter() - start)
+    print(f"raw Feast, {batch_size} patients  {percentiles(raw_batch)}")
+    print(f"cache,     {batch_size} patients  {percentiles(cached_batch)}")
+
+    shutil.rmtree(repo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online feature cache vs raw Feast lookups")
+    parser.add_argument("--requests", type=int, default=N_REQUESTS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    main(args.requests, args.batch_size)
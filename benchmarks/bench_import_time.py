@@ -0,0 +1,79 @@
+"""
+Import-time benchmark for the entry points.
+
+Imports each entry-point module in a fresh interpreter with
+`python -X importtime` (what every Airflow task and API worker pays before
+doing any work), repeats it a few times and prints the median wall time,
+the total self-reported import time and the heaviest top-level packages
+pulled in. Importing must have no side effects, so this also
+catches a FeatureStore or materialization sneaking back into module scope.
+
+Run from the project root:
+    python -m benchmarks.bench_import_time [--repeat 5]
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = [
+    "src.cli",
+    "api.main",
+    "mlflow_training",
+    "register_best_model",
+    "predict_ivf",
+    "src.pipeline.retrain_trigger",
+]
+REPEAT = 5
+TOP_PACKAGES = 5
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def import_once(module: str) -> tuple:
+    """(wall seconds, {top-level package: self us}) for one cold import"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    wall_s = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # Self time summed per top-level package, so the entry module itself
+    # doesn't swallow everything it imports
+    packages = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            name = match.group(3).split(".")[0]
+            packages[name] = packages.get(name, 0) + int(match.group(1))
+    return wall_s, packages
+
+
+def main(repeat: int):
+    print(f"{'entry point':<30} {'wall p50':>10} {'imports':>10}  heaviest packages")
+    for module in ENTRY_POINTS:
+        walls, runs = [], []
+        for _ in range(repeat):
+            wall_s, packages = import_once(module)
+            walls.append(wall_s)
+            runs.append(packages)
+        packages = runs[len(runs) // 2]
+        top = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:TOP_PACKAGES]
+        print(
+            f"{module:<30} {statistics.median(walls) * 1e3:8.0f}ms "
+            f"{sum(packages.values()) / 1e3:8.0f}ms  "
+            + ", ".join(f"{name} {us / 1e3:.0f}ms" for name, us in top)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    args = parser.parse_args()
+    main(args.repeat)
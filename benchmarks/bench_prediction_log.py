@@ -0,0 +1,102 @@
+"""
+Benchmark for src/serving/prediction_log.py.
+
+Measures the per-request cost of recording one prediction:
+  - synchronous baseline: INSERT + COMMIT into SQLite for every request
+  - PredictionLogger.log(): buffered append, Parquet written by the flusher
+and reports p50/p99 per call against the overhead budget, plus how the
+drop and block backpressure policies behave with a deliberately small
+buffer.
+
+Run from the project root:
+    python -m benchmarks.bench_prediction_log
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from src.serving.prediction_log import LOG_RECORDS, PredictionLogger, list_log_files
+
+N_REQUESTS = 50_000
+P99_BUDGET_US = 100.0
+
+
+def make_record(i: int) -> dict:
+    inputs = {
+        "patient_id": f"P{i:07d}", "age": 33.0, "amh_ng_ml": 2.1, "day": i % 13 + 2,
+        "avg_follicle_size_mm": 17.5, "follicle_count": 12, "estradiol_pg_ml": 1450.0,
+        "progesterone_ng_ml": 0.8, "age_group": "30-34", "amh_group": "normal",
+        "follicle_size_band": "12-19",
+    }
+    return {
+        "endpoint": "row", "patient_id": inputs["patient_id"], "day": inputs["day"],
+        "model_version": 5, "pred_trigger_probability": 0.71, "pred_trigger_recommended": 1,
+        "latency_ms": 3.2, "input_valid": True, "inputs": inputs,
+    }
+
+
+def percentiles(samples_s: list) -> str:
+    us = np.array(samples_s) * 1e6
+    return f"p50 {np.percentile(us, 50):7.1f} us  p99 {np.percentile(us, 99):7.1f} us"
+
+
+def bench_sqlite(records: list, workdir: str) -> np.ndarray:
+    conn = sqlite3.connect(os.path.join(workdir, "sync.db"))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE predictions (patient_id TEXT, day INT, proba REAL, inputs TEXT)")
+    timings = []
+    for r in records:
+        start = time.perf_counter()
+        conn.execute("INSERT INTO predictions VALUES (?, ?, ?, ?)",
+                     (r["patient_id"], r["day"], r["pred_trigger_probability"], json.dumps(r["inputs"])))
+        conn.commit()
+        timings.append(time.perf_counter() - start)
+    conn.close()
+    return timings
+
+
+def bench_logger(records: list, log_dir: str, **kwargs):
+    logger = PredictionLogger(log_dir=log_dir, flush_interval_s=0.2, **kwargs).start()
+    timings = []
+    for r in records:
+        start = time.perf_counter()
+        logger.log(r)
+        timings.append(time.perf_counter() - start)
+    logger.close()
+    return timings
+
+
+def main(n_requests: int):
+    records = [make_record(i) for i in range(n_requests)]
+    workdir = tempfile.mkdtemp(prefix="ivf_predlog_")
+
+    print(f"sync SQLite commit   {percentiles(bench_sqlite(records, workdir))}")
+
+    log_dir = os.path.join(workdir, "log")
+    timings = bench_logger(records, log_dir)
+    rows = sum(pq.ParquetFile(f).metadata.num_rows for f in list_log_files(log_dir))
+    p99 = np.percentile(np.array(timings) * 1e6, 99)
+    print(f"PredictionLogger     {percentiles(timings)}  ({rows} rows in "
+          f"{len(list_log_files(log_dir))} file(s))")
+    print(("✅" if p99 <= P99_BUDGET_US else "❌") + f" p99 budget {P99_BUDGET_US:.0f} us")
+
+    # Tiny buffer to show the backpressure policies under overload
+    for policy in ("drop", "block"):
+        dropped_before = LOG_RECORDS.labels(outcome="dropped")._value.get()
+        timings = bench_logger(records, os.path.join(workdir, policy), capacity=256,
+                               backpressure=policy, block_timeout_s=0.01)
+        dropped = LOG_RECORDS.labels(outcome="dropped")._value.get() - dropped_before
+        print(f"{policy:5s} (capacity 256) {percentiles(timings)}  dropped {int(dropped)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prediction log overhead per request")
+    parser.add_argument("--requests", type=int, default=N_REQUESTS)
+    args = parser.parse_args()
+    main(args.requests)
@@ -0,0 +1,90 @@
+"""
+Query benchmark: legacy to_sql layout vs the managed schema in
+src/data/schema.py, on a local SQLite database (or IVF_DB_URL).
+
+Times a single-patient lookup and an incremental pull (rows ingested in
+the last day) on both layouts.
+
+Run from the project root:
+    python -m benchmarks.bench_schema_queries
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from src.data import schema
+from src.data.bulk_load import bulk_load
+
+N_ROWS = 500_000
+REPEATS = 20
+LEGACY_TABLE = "bench_legacy"
+
+
+def make_rows(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2026-01-01")
+    return pd.DataFrame({
+        "patient_id": [f"P{i // 10:07d}" for i in range(n_rows)],
+        "day": np.arange(n_rows) % 10 + 2,
+        "age": rng.integers(18, 50, n_rows),
+        "amh_ng_ml": rng.uniform(0.1, 15, n_rows).round(2),
+        "avg_follicle_size_mm": rng.uniform(8, 30, n_rows).round(1),
+        "follicle_count": rng.integers(1, 60, n_rows),
+        "estradiol_pg_ml": rng.uniform(20, 6000, n_rows).round(0),
+        "progesterone_ng_ml": rng.uniform(0.1, 5, n_rows).round(2),
+        "trigger_recommended": rng.integers(0, 2, n_rows),
+        # ~1000 rows ingested per day, oldest first
+        "ingested_at": start + pd.to_timedelta(np.arange(n_rows) // 1000, unit="D"),
+    })
+
+
+def time_query(engine, sql: str, params: dict) -> float:
+    with engine.connect() as conn:
+        conn.execute(sa.text(sql), params).fetchall()  # warm-up
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            conn.execute(sa.text(sql), params).fetchall()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main(n_rows: int):
+    url = os.environ.get("IVF_DB_URL") or (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ivf_schema_'), 'bench.db')}"
+    )
+    engine = sa.create_engine(url)
+    df = make_rows(n_rows)
+
+    with engine.begin() as conn:
+        df.to_sql(LEGACY_TABLE, conn, index=False, if_exists="replace", chunksize=50_000)
+    schema.raw_table.drop(engine, checkfirst=True)
+    schema.raw_table.create(engine)
+    bulk_load(df, engine, schema.RAW_TABLE, mode="append", batch_size=50_000)
+
+    patient = df["patient_id"].iloc[n_rows // 2]
+    since = (df["ingested_at"].max() - pd.Timedelta(days=1)).to_pydatetime()
+    queries = {
+        "patient lookup": (
+            "SELECT * FROM {table} WHERE patient_id = :pid ORDER BY day", {"pid": patient}
+        ),
+        "incremental pull": (
+            "SELECT * FROM {table} WHERE ingested_at > :since", {"since": since}
+        ),
+    }
+
+    print(f"{n_rows:,} rows on {engine.dialect.name}")
+    print(f"{'query':<18} {'legacy ms':>10} {'managed ms':>11} {'speed-up':>9}")
+    for name, (sql, params) in queries.items():
+        legacy = time_query(engine, sql.format(table=LEGACY_TABLE), params)
+        managed = time_query(engine, sql.format(table=schema.RAW_TABLE), params)
+        print(f"{name:<18} {legacy:>10.3f} {managed:>11.3f} {legacy / managed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    main(parser.parse_args().rows)
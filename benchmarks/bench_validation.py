@@ -0,0 +1,95 @@
+"""
+Benchmark for src/validation/native.py against Great Expectations.
+
+Builds a synthetic preprocessed frame (default 10M rows, a small share of
+out-of-range and null values), validates it with the native single-pass
+validator and, when great_expectations is installed, with GE's
+PandasDataset on the same suite. Prints wall time, rows/s and whether the
+two reports agree on every expectation's success and unexpected_count.
+
+Run from the project root:
+    python -m benchmarks.bench_validation --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.validation.native import validate
+from src.validation.suite import CATEGORY_SETS, build_suite
+
+N_ROWS = 10_000_000
+
+
+def make_rows(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "patient_id": pd.Series(rng.integers(0, n_rows // 10 + 1, n_rows)).map("P{:07d}".format),
+        "age": rng.integers(18, 51, n_rows),
+        "amh_ng_ml": rng.uniform(0.1, 15, n_rows).round(2),
+        "day": rng.integers(2, 15, n_rows),
+        "avg_follicle_size_mm": rng.uniform(8, 30, n_rows).round(1),
+        "follicle_count": rng.integers(1, 61, n_rows),
+        "estradiol_pg_ml": rng.uniform(20, 6000, n_rows).round(0),
+        "progesterone_ng_ml": rng.uniform(0.1, 5, n_rows).round(2),
+        "trigger_recommended": rng.integers(0, 2, n_rows),
+    })
+    # ~0.1% out-of-range ages and missing estradiol so failures are exercised
+    bad = rng.random(n_rows) < 0.001
+    df.loc[bad, "age"] = 99
+    df.loc[rng.random(n_rows) < 0.001, "estradiol_pg_ml"] = np.nan
+    for col, labels in CATEGORY_SETS.items():
+        df[col] = pd.Categorical.from_codes(rng.integers(0, len(labels), n_rows), labels).astype(object)
+    df["high_response_proxy"] = rng.integers(0, 2, n_rows)
+    df["ohss_risk_proxy"] = rng.integers(0, 2, n_rows)
+    return df
+
+
+def _summary(report: dict) -> list:
+    return [
+        (r["expectation_config"]["expectation_type"],
+         r["expectation_config"]["kwargs"].get("column"),
+         r["success"],
+         r["result"].get("unexpected_count"))
+        for r in report["results"]
+    ]
+
+
+def main(n_rows: int, skip_ge: bool):
+    print(f"📦 Generating {n_rows} rows ...")
+    df = make_rows(n_rows)
+    suite = build_suite(df.columns)
+
+    start = time.perf_counter()
+    native_report = validate(df, suite)
+    native_s = time.perf_counter() - start
+    print(f"native: {len(suite)} expectations in {native_s:.2f}s ({n_rows / native_s:,.0f} rows/s), "
+          f"success={native_report['success']}")
+
+    if skip_ge:
+        return
+    try:
+        from ge_validate_ivf_preprocessed import validate_with_ge
+        import great_expectations  # noqa: F401
+    except ImportError:
+        print("⚠️ great_expectations not installed; skipping GE comparison")
+        return
+
+    start = time.perf_counter()
+    ge_report = validate_with_ge(df, suite)
+    ge_s = time.perf_counter() - start
+    print(f"GE:     {len(suite)} expectations in {ge_s:.2f}s ({n_rows / ge_s:,.0f} rows/s), "
+          f"success={ge_report['success']}")
+    print(f"speedup: {ge_s / native_s:.1f}x")
+
+    mismatches = [(a, b) for a, b in zip(_summary(native_report), _summary(ge_report)) if a != b]
+    print("✅ reports agree" if not mismatches else f"❌ {len(mismatches)} mismatches: {mismatches[:5]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Native validator vs Great Expectations")
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    parser.add_argument("--skip-ge", action="store_true", help="time the native validator only")
+    args = parser.parse_args()
+    main(args.rows, args.skip_ge)
@@ -1,9 +1,10 @@
 from .entities import patient
-from .feature_views import ivf_trigger_features
+from .feature_views import ivf_derived_features, ivf_trigger_features
 from .feature_services import ivf_trigger_service_v1
 
 __all__ = [
     "patient",
     "ivf_trigger_features",
+    "ivf_derived_features",
     "ivf_trigger_service_v1",
 ]
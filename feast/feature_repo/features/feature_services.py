@@ -1,8 +1,9 @@
 from feast import FeatureService
-from .feature_views import ivf_trigger_features
+from .feature_views import ivf_derived_features, ivf_trigger_features
 
+# Raw measurements plus the derived bands/flags: the full model input in one lookup
 ivf_trigger_service_v1 = FeatureService(
     name="ivf_trigger_service_v1",
-    features=[ivf_trigger_features],
+    features=[ivf_trigger_features, ivf_derived_features],
     tags={"stage": "dev"},
 )
@@ -1,10 +1,12 @@
 from feast import FeatureView, Field, FileSource
-from feast.types import Float32, Int64
+from feast.on_demand_feature_view import on_demand_feature_view
+from feast.types import Float32, Int64, String
 from datetime import timedelta
+import pandas as pd
 from .entities import patient
 
 ivf_offline_source = FileSource(
-    path="data/trigger_day_prediction.parquet",
+    path="data/trigger_day_prediction",  # partitioned by event_date
     timestamp_field="event_timestamp",
 )
 
@@ -24,3 +26,51 @@ ivf_trigger_features = FeatureView(
     online=True,
     source=ivf_offline_source,
 )
+
+
+# Bands and flags from add_feature_engineering (src/preprocessing), computed
+# by Feast at lookup time over the whole batch with vectorized pandas ops.
+# Kept self-contained: the transform is serialized into the registry.
+@on_demand_feature_view(
+    sources=[ivf_trigger_features],
+    schema=[
+        Field(name="age_group", dtype=String),
+        Field(name="amh_group", dtype=String),
+        Field(name="follicle_size_band", dtype=String),
+        Field(name="follicle_size_12_19", dtype=Int64),
+        Field(name="high_follicle_count", dtype=Int64),
+        Field(name="high_e2", dtype=Int64),
+        Field(name="high_p4", dtype=Int64),
+        Field(name="late_cycle", dtype=Int64),
+    ],
+    mode="pandas",
+)
+def ivf_derived_features(inputs: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame(index=inputs.index)
+    # Unknown entities come back as all-None object columns
+    num = inputs.apply(pd.to_numeric, errors="coerce")
+    out["age_group"] = pd.cut(
+        num["Age"],
+        bins=[0, 29, 34, 37, 40, 100],
+        labels=["<30", "30-34", "35-37", "38-40", ">40"],
+        right=True,
+    ).astype(str)
+    out["amh_group"] = pd.cut(
+        num["AMH (ng/mL)"],
+        bins=[0, 1.0, 3.5, 100],
+        labels=["low", "normal", "high"],
+        right=True,
+    ).astype(str)
+    size = num["Avg_Follicle_Size_mm"]
+    out["follicle_size_band"] = pd.cut(
+        size,
+        bins=[0, 12, 19, 100],
+        labels=["<12", "12-19", ">=20"],
+        right=True,
+    ).astype(str)
+    out["follicle_size_12_19"] = ((size >= 12) & (size <= 19)).astype("int64")
+    out["high_follicle_count"] = (num["Follicle_Count"] >= 14).astype("int64")
+    out["high_e2"] = (num["Estradiol_pg_mL"] >= 2500).astype("int64")
+    out["high_p4"] = (num["Progesterone_ng_mL"] >= 1.0).astype("int64")
+    out["late_cycle"] = (num["Day"] >= 10).astype("int64")
+    return out
@@ -1,19 +1,18 @@
-import pandas as pd
+import os
+import sys
 
-def convert_csv_to_parquet():
-    # Read original CSV
-    df = pd.read_csv("data/trigger_day_prediction.csv")
-
-    # Simple missing handling (optional)
-    df["AMH (ng/mL)"] = df["AMH (ng/mL)"].fillna(df["AMH (ng/mL)"].median())
+try:
+    from src.training.feast_dataset import OFFLINE_SOURCE_DIR, write_offline_source
+except ImportError:  # run from the repo dir: python offline_workflow.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.training.feast_dataset import OFFLINE_SOURCE_DIR, write_offline_source
 
-    # Add a synthetic event_timestamp column (required by Feast)
-    from datetime import datetime
-    df["event_timestamp"] = datetime.utcnow()
 
-    # Save as Parquet for Feast offline store
-    df.to_parquet("data/trigger_day_prediction.parquet", index=False)
-    print("Saved Parquet file to data/trigger_day_prediction.parquet")
+def convert_csv_to_parquet():
+    # Event timestamps come from cycle dates (cycle start + Day - 1), and the
+    # Parquet source is partitioned by event_date for point-in-time joins
+    rows = write_offline_source()
+    print(f"Saved {rows} rows to {OFFLINE_SOURCE_DIR} (partitioned by event_date)")
 
 if __name__ == "__main__":
     convert_csv_to_parquet()
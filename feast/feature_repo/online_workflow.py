@@ -1,9 +1,16 @@
-from datetime import datetime, timezone
+import os
+import sys
 from feast import FeatureStore
 
+try:
+    from src.data.materialize_features import materialize
+except ImportError:  # run from the repo dir: python online_workflow.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.data.materialize_features import materialize
+
 def materialize_to_online():
-    store = FeatureStore(repo_path=".")
-    store.materialize_incremental(end_date=datetime.now(timezone.utc))
+    # Shared job: skips when fresh, parallel reads, chunked writes, cache marker
+    materialize()
     print("Materialized features to online store.")
 
 def fetch_online_example():
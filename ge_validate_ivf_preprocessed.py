@@ -1,83 +1,59 @@
 import os
+import argparse
 import pandas as pd
-import great_expectations as ge
 import json
 
-PROJECT_ROOT = r"C:\AI_IVF_Trigger_day"
+from src.validation.native import validate
+from src.validation.streaming import (
+    DEFAULT_CHUNK_SIZE,
+    list_partitions,
+    read_columns,
+    validate_partitions,
+)
+from src.validation.suite import build_suite
+
+# Script directory (C:\AI_IVF_Trigger_day on the dev box); the DAG stage cache uses the same paths
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocessed.csv")
+PARTITIONS_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocessed_parts")
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "data", "quality", "ivf_trigger_ge_validation.json")
 
 
-def main():
-    df = pd.read_csv(CSV_PATH)
+def validate_with_ge(df: pd.DataFrame, suite: list) -> dict:
+    """Run the same suite through Great Expectations (optional, for comparison)"""
+    import great_expectations as ge
 
     gdf = ge.dataset.PandasDataset(df)
+    for expectation in suite:
+        getattr(gdf, expectation["expectation_type"])(**expectation["kwargs"])
+    # Convert to JSON‑serializable dict
+    return gdf.validate().to_json_dict()
 
-    # ---------- Table-level checks ----------
-    gdf.expect_table_row_count_to_be_between(min_value=600, max_value=800)
-    gdf.expect_table_column_count_to_be_between(min_value=15, max_value=20)
-
-    # ---------- Core schema and non-null checks ----------
-    numeric_cols = [
-        "age",
-        "amh_ng_ml",
-        "day",
-        "avg_follicle_size_mm",
-        "follicle_count",
-        "estradiol_pg_ml",
-        "progesterone_ng_ml",
-        "trigger_recommended",
-    ]
-    for col in numeric_cols:
-        gdf.expect_column_to_exist(col)
-        gdf.expect_column_values_to_not_be_null(col)
-        gdf.expect_column_values_to_be_in_type_list(col, ["int64", "float64", "Int64"])
-
-    gdf.expect_column_to_exist("patient_id")
-    gdf.expect_column_values_to_not_be_null("patient_id")
-    gdf.expect_column_values_to_be_of_type("patient_id", "object")
-
-    # ---------- Clinical range checks ----------
-    gdf.expect_column_values_to_be_between("age", min_value=18, max_value=50)
-    gdf.expect_column_values_to_be_between("amh_ng_ml", min_value=0.1, max_value=15)
-    gdf.expect_column_values_to_be_between("day", min_value=2, max_value=14)
-    gdf.expect_column_values_to_be_between("avg_follicle_size_mm", min_value=8, max_value=30)
-    gdf.expect_column_values_to_be_between("follicle_count", min_value=1, max_value=60)
-    gdf.expect_column_values_to_be_between("estradiol_pg_ml", min_value=20, max_value=6000)
-    gdf.expect_column_values_to_be_between("progesterone_ng_ml", min_value=0.1, max_value=5.0)
-
-    # ---------- Target encoding ----------
-    gdf.expect_column_values_to_be_in_set("trigger_recommended", value_set=[0, 1])
-
-    # ---------- Engineered categorical features (if present) ----------
-    if "age_group" in gdf.columns:
-        gdf.expect_column_values_to_not_be_null("age_group")
-        gdf.expect_column_distinct_values_to_be_in_set(
-            "age_group", ["<30", "30-34", "35-37", "38-40", ">40"]
-        )
 
-    if "amh_group" in gdf.columns:
-        gdf.expect_column_values_to_not_be_null("amh_group")
-        gdf.expect_column_distinct_values_to_be_in_set(
-            "amh_group", ["low", "normal", "high"]
-        )
+def validate_streaming(workers: int, chunk_size: int) -> dict:
+    """Validate daily Parquet partitions in parallel (or the CSV in chunks) with flat memory"""
+    paths = list_partitions(PARTITIONS_DIR) or [CSV_PATH]
+    print(f"Streaming validation over {len(paths)} file(s), chunk size {chunk_size}")
+    suite = build_suite(read_columns(paths[0]))
+    return validate_partitions(paths, suite, max_workers=workers, chunk_size=chunk_size)
 
-    if "follicle_size_band" in gdf.columns:
-        gdf.expect_column_values_to_not_be_null("follicle_size_band")
-        gdf.expect_column_distinct_values_to_be_in_set(
-            "follicle_size_band", ["<12", "12-19", ">=20"]
-        )
 
-    for col in ["high_response_proxy", "ohss_risk_proxy"]:
-        if col in gdf.columns:
-            gdf.expect_column_values_to_be_in_set(col, [0, 1])
+def main(engine: str = "native", stream: bool = False, workers: int = None,
+         chunk_size: int = DEFAULT_CHUNK_SIZE):
+    if stream:
+        result_dict = validate_streaming(workers, chunk_size)
+    else:
+        df = pd.read_csv(CSV_PATH)
 
-    # ---------- Validate and save result ----------
-    result = gdf.validate()
-    print("Validation success:", result["success"])
+        # Suite lives in src/validation/suite.py: table checks, schema/non-null,
+        # clinical ranges, target encoding, engineered categoricals (if present)
+        suite = build_suite(df.columns)
 
-    # Convert to JSON‑serializable dict
-    result_dict = result.to_json_dict()
+        if engine == "ge":
+            result_dict = validate_with_ge(df, suite)
+        else:
+            result_dict = validate(df, suite)
+    print("Validation success:", result_dict["success"])
 
     os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
@@ -87,4 +63,14 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Validate the preprocessed IVF dataset")
+    parser.add_argument("--engine", choices=["native", "ge"], default="native",
+                        help="native single-pass validator (default) or Great Expectations")
+    parser.add_argument("--stream", action="store_true",
+                        help="validate partitions/chunks with mergeable summary state")
+    parser.add_argument("--workers", type=int, default=None, help="parallel partition workers")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    if args.stream and args.engine == "ge":
+        parser.error("--stream uses the native validator; drop --engine ge")
+    main(engine=args.engine, stream=args.stream, workers=args.workers, chunk_size=args.chunk_size)
@@ -1,107 +1,133 @@
-import pandas as pd
-from feast import FeatureStore
+import argparse
+import json
 import os
-from datetime import datetime
+import sys
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
-# Initialize FEAST
-FEAST_REPO_PATH = os.path.join(os.path.dirname(__file__), "feast", "feature_repo")
-fs = FeatureStore(repo_path=FEAST_REPO_PATH)
-
-# Materialize features BEFORE registering model
-print("🔄 Materializing FEAST before model registration...")
-fs.materialize_incremental(end_date=datetime.now())
-print("✅ FEAST materialized!")
-
-# Then continue with your existing registration code...
-
-
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import (
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    roc_auc_score,
+from src.pipeline.stage_cache import SKIP_EXIT_CODE, has_pending, record_stage
+from src.training.candidates import (
+    BATCH_TAG,
+    CANDIDATES,
+    build_model,
+    get_candidate,
+    task_args,
+    task_env,
+    write_winner,
 )
-from sklearn.preprocessing import LabelEncoder
 
-import mlflow
-import mlflow.sklearn
+if TYPE_CHECKING:
+    from src.training.profiling import StageProfiler
+
+# pandas, sklearn, mlflow and Feast are imported inside the functions that
+# use them: importing this module has no side effects, and cheap commands
+# (--list-candidates) don't pay for the training stack
 
 # -------------------------------------------------------------------
 # CONFIG
 # -------------------------------------------------------------------
+EXPERIMENT_NAME = "IVF_Trigger_Prediction"
 DATA_PATH = r"data/processed/ivf_trigger_preprocessed.csv"
 TARGET_COL = "trigger_recommended"
+# "csv": processed dataset - the incrementally preprocessed Parquet parts when
+# there are any (the DAG's preprocess stage), else the CSV;
+# "feast": point-in-time training set from the Feast offline store
+TRAINING_SOURCE = os.environ.get("IVF_TRAINING_SOURCE", "csv")
 
 
 # -------------------------------------------------------------------
 # DATA LOADING + PREPROCESSING
 # -------------------------------------------------------------------
-def load_data():
-    df = pd.read_csv(DATA_PATH)
+def load_data(profiler: "StageProfiler" = None, with_raw: bool = False):
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+
+    from src.training.profiling import StageProfiler
+
+    profiler = profiler or StageProfiler(cprofile=False)
+
+    if TRAINING_SOURCE == "feast":
+        with profiler.stage("read_feast"):
+            from src.training.feast_dataset import TIMESTAMP_COL, load_training_set
+
+            df = load_training_set().drop(columns=[TIMESTAMP_COL])
+    else:
+        with profiler.stage("read_csv"):
+            from src.preprocessing.incremental_preprocess import WATERMARK_COL, read_dataset
+
+            # Same precedence as streaming validation: parts first, else the CSV
+            df = read_dataset()
+            if df is None:
+                df = pd.read_csv(DATA_PATH)
+            df = df.drop(columns=[WATERMARK_COL], errors="ignore")
 
     # Target
     y = df[TARGET_COL]
     X = df.drop(columns=[TARGET_COL])
+    # Unencoded features, as the API receives them, for the drift reference
+    X_raw = X.copy() if with_raw else None
 
-    # Encode categorical columns
-    cat_cols = X.select_dtypes(include="object").columns
-    for col in cat_cols:
-        le = LabelEncoder()
-        X[col] = le.fit_transform(X[col].astype(str))
+    with profiler.stage("encode"):
+        # Encode categorical columns
+        cat_cols = X.select_dtypes(include="object").columns
+        for col in cat_cols:
+            le = LabelEncoder()
+            X[col] = le.fit_transform(X[col].astype(str))
 
-    # Handle missing values
-    X = X.fillna(X.mean(numeric_only=True))
+        # Handle missing values
+        X = X.fillna(X.mean(numeric_only=True))
 
+    if with_raw:
+        return X, y, X_raw
     return X, y
 
 
 # -------------------------------------------------------------------
 # TRAIN + LOG TO MLFLOW
 # -------------------------------------------------------------------
-def train_and_log():
-    # Create / use experiment
-    mlflow.set_experiment("IVF_Trigger_Prediction")
-
-    X, y = load_data()
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=0.2,
-        random_state=42,
-        stratify=y,
+def train_candidates(client, experiment_id, models, X_train, X_test, y_train, y_test,
+                     pipeline_profiler: "StageProfiler", reference_profile: dict = None,
+                     batch_id: str = None):
+    """Fit every candidate in its own run; returns the run ids"""
+    from sklearn.metrics import (
+        accuracy_score,
+        precision_score,
+        recall_score,
+        f1_score,
+        roc_auc_score,
     )
 
-    models = {
-        "LogisticRegression": LogisticRegression(max_iter=1000, random_state=42),
-        "RandomForest": RandomForestClassifier(
-            n_estimators=200,
-            max_depth=8,
-            random_state=42,
-            n_jobs=-1,
-        ),
-        "GradientBoosting": GradientBoostingClassifier(
-            n_estimators=200,
-            max_depth=3,
-            random_state=42,
-        ),
-    }
+    from src.monitoring.drift import PREDICTION_EDGES, REFERENCE_PROFILE_ARTIFACT, numeric_profile
+    from src.training.mlflow_logging import BatchedRunLogger, BackgroundUploader, finish_run
+    from src.training.profiling import StageProfiler
+
+    uploader = BackgroundUploader()
+    run_ids = []
 
     for name, model in models.items():
-        with mlflow.start_run(run_name=name):
+        run = client.create_run(experiment_id, run_name=name)
+        run_ids.append(run.info.run_id)
+        logger = BatchedRunLogger(run.info.run_id, client=client)
+
+        # Each run carries the shared load timings plus its own stages so
+        # regressions show up side by side in the MLflow UI
+        run_profiler = StageProfiler(cprofile=pipeline_profiler.cprofile)
+        run_profiler.merge(pipeline_profiler)
+
+        try:
             # Log parameters
-            mlflow.log_params(model.get_params())
+            logger.log_params(model.get_params())
+            if batch_id is not None:
+                logger.set_tags({BATCH_TAG: batch_id})
 
             # Train
-            model.fit(X_train, y_train)
+            with run_profiler.stage("fit"):
+                model.fit(X_train, y_train)
 
             # Predictions
-            y_pred = model.predict(X_test)
-            y_proba = model.predict_proba(X_test)[:, 1]
+            with run_profiler.stage("predict"):
+                y_pred = model.predict(X_test)
+                y_proba = model.predict_proba(X_test)[:, 1]
 
             # Metrics
             metrics = {
@@ -111,35 +137,170 @@ def train_and_log():
                 "f1": f1_score(y_test, y_pred, zero_division=0),
                 "roc_auc": roc_auc_score(y_test, y_proba),
             }
+            logger.log_metrics(metrics)
+
+            # Training-distribution histograms (plus this model's test-set
+            # scores) that the API's drift monitor compares live traffic to
+            if reference_profile is not None:
+                profile = dict(reference_profile, prediction=numeric_profile(y_proba, edges=PREDICTION_EDGES))
+                uploader.submit(client.log_dict, run.info.run_id, profile, REFERENCE_PROFILE_ARTIFACT)
+        except Exception:
+            # Keep the params/tags buffered so far: they explain the failure
+            try:
+                logger.flush()
+            except Exception as flush_error:
+                print(f"⚠️  Could not flush logged values of failed run {name}: {flush_error}")
+            client.set_terminated(run.info.run_id, status="FAILED")
+            raise
+
+        # Flush params/metrics in one log_batch call and log the model in the
+        # background so the next candidate starts training right away
+        uploader.submit(finish_run, logger, model, "model", run_profiler)
+
+    # Barrier: every run must be flushed before the best one is selected
+    uploader.shutdown()
+    return run_ids
 
-            for k, v in metrics.items():
-                mlflow.log_metric(k, v)
 
-            # Log model
-            mlflow.sklearn.log_model(model, artifact_path="model")
+def train_and_log(candidate_names: list = None, batch_id: str = None):
+    """
+    Train the named candidates (all by default) and tag their runs with
+    batch_id. The DAG calls this once per candidate; run without arguments
+    it trains everything in-process and also picks the winner.
+    """
+    import mlflow
+    from sklearn.model_selection import train_test_split
+
+    from src.data.materialize_features import require_fresh
+    from src.monitoring.drift import build_reference_profile
+    from src.training.profiling import StageProfiler, log_profile
+
+    # Materialization is its own job (src/data/materialize_features.py);
+    # training only checks that the online store is current
+    require_fresh("training")
+
+    batch_id = batch_id or f"local-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}"
+    names = candidate_names or [c["name"] for c in CANDIDATES]
+
+    # Create / use experiment
+    experiment = mlflow.set_experiment(EXPERIMENT_NAME)
+    client = mlflow.tracking.MlflowClient()
+    pipeline_profiler = StageProfiler()
+
+    with pipeline_profiler.stage("train_and_log", cprofile=False):
+        with pipeline_profiler.stage("load_data", cprofile=False):
+            X, y, X_raw = load_data(profiler=pipeline_profiler, with_raw=True)
+
+        # Fixed seed: every candidate task gets the same split
+        X_train, X_test, y_train, y_test = train_test_split(
+            X,
+            y,
+            test_size=0.2,
+            random_state=42,
+            stratify=y,
+        )
+
+        models = {name: build_model(get_candidate(name)) for name in names}
+
+        reference_profile = build_reference_profile(X_raw.loc[X_train.index])
+
+        run_ids = train_candidates(
+            client, experiment.experiment_id, models,
+            X_train, X_test, y_train, y_test, pipeline_profiler,
+            reference_profile=reference_profile,
+            batch_id=batch_id,
+        )
+
+    # End-to-end time is only known once every upload has finished
+    for run_id in run_ids:
+        log_profile(client, run_id, pipeline_profiler, stages=["train_and_log"])
+    print("Stage timings:", pipeline_profiler.stages)
+
+    if candidate_names is None:
+        select_winner(batch_id)
+    return run_ids
+
+
+def select_winner(batch_id: str) -> dict:
+    """
+    Reduce step: best finished run of this batch by ROC AUC, written to
+    WINNER_PATH for register_best_model.py.
+    """
+    import mlflow
 
-                # ---------------------------------------------------------
-    # Choose best model by ROC AUC
-    # ---------------------------------------------------------
     client = mlflow.tracking.MlflowClient()
-    experiment = client.get_experiment_by_name("IVF_Trigger_Prediction")
+    experiment = client.get_experiment_by_name(EXPERIMENT_NAME)
+    if experiment is None:
+        raise RuntimeError(f"Experiment '{EXPERIMENT_NAME}' not found")
+
     runs = client.search_runs(
         experiment_ids=[experiment.experiment_id],
+        filter_string=f"tags.`{BATCH_TAG}` = '{batch_id}' and attributes.status = 'FINISHED'",
         order_by=["metrics.roc_auc DESC"],
-        max_results=1,
     )
+    if not runs:
+        print(f"⏭️  No finished runs for training batch '{batch_id}'")
+        return None
 
     best_run = runs[0]
-    best_run_id = best_run.info.run_id
-    best_roc_auc = best_run.data.metrics["roc_auc"]
+    names = {run.info.run_name for run in runs}
+    result = {
+        "batch_id": batch_id,
+        "complete": all(c["name"] in names for c in CANDIDATES),
+        "run_ids": [run.info.run_id for run in runs],
+        "winner_run_id": best_run.info.run_id,
+        "winner_name": best_run.info.run_name,
+        "winner_roc_auc": best_run.data.metrics["roc_auc"],
+    }
+    write_winner(result)
+
+    for run in runs:
+        print(f"   {run.info.run_name:<20} roc_auc={run.data.metrics['roc_auc']:.4f}")
+    print("Best run_id:", result["winner_run_id"])
+    print("Best roc_auc:", result["winner_roc_auc"])
+    return result
+
 
-    print("Best run_id:", best_run_id)
-    print("Best roc_auc:", best_roc_auc)
+def list_candidates() -> list:
+    """Candidates and their task resources, for the DAG's fan-out"""
+    return [{"name": c["name"], "env": task_env(c), "task": task_args(c)} for c in CANDIDATES]
 
 
+def close_batch(batch_id: str) -> int:
+    """DAG reduce task: select the winner and close the train gate; returns an exit code"""
+    result = select_winner(batch_id)
+    if result is None:
+        if has_pending("train"):
+            # The gate opened but every candidate failed: fail the task so
+            # registration and mark_trained don't run on nothing
+            raise RuntimeError(f"Training batch '{batch_id}' has no finished runs - every candidate failed")
+        # Nothing trained in this batch (the train gate skipped it)
+        return SKIP_EXIT_CODE
+    if has_pending("train"):
+        # A partial batch stays uncached so it is retried
+        return record_stage("train", cache=result["complete"])
+    return 0
+
 
 # -------------------------------------------------------------------
 # MAIN
 # -------------------------------------------------------------------
 if __name__ == "__main__":
-    train_and_log()
+    parser = argparse.ArgumentParser(description="Train IVF trigger candidates and log them to MLflow")
+    parser.add_argument("--candidate", action="append",
+                        help="train only this candidate (repeatable); default: all of them")
+    parser.add_argument("--batch", help="training batch id shared by one DAG run's candidate tasks")
+    parser.add_argument("--select-winner", action="store_true",
+                        help="reduce step: pick the batch's best run, write it for registration")
+    parser.add_argument("--list-candidates", action="store_true",
+                        help="print the candidates and their task resources as JSON")
+    args = parser.parse_args()
+
+    if args.list_candidates:
+        print(json.dumps(list_candidates()))
+    elif args.select_winner:
+        if not args.batch:
+            parser.error("--select-winner needs --batch")
+        sys.exit(close_batch(args.batch))
+    else:
+        train_and_log(candidate_names=args.candidate, batch_id=args.batch)
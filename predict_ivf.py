@@ -1,9 +1,10 @@
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-import mlflow
-from feast import FeatureStore
-import os
-from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas, sklearn and mlflow are imported inside the functions that use
+# them, so importing this module (or the CLI) costs nothing up front
 
 # ===================================================================
 # CONFIG
@@ -12,14 +13,13 @@ DATA_PATH = r"data/processed/ivf_trigger_preprocessed.csv"
 TARGET_COL = "trigger_recommended"
 BEST_RUN_ID = "287c1645058940a097ec282b5eef181d"  # Update with your best run ID
 
-FEAST_REPO_PATH = os.path.join(os.path.dirname(__file__), "feast", "feature_repo")
-fs = FeatureStore(repo_path=FEAST_REPO_PATH)
 
-
-def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess(df: "pd.DataFrame") -> "pd.DataFrame":
     """
     Apply same preprocessing as in mlflow_training.py without touching target
     """
+    from sklearn.preprocessing import LabelEncoder
+
     if TARGET_COL in df.columns:
         df = df.drop(columns=[TARGET_COL])
     
@@ -39,6 +39,8 @@ def load_best_model():
     """
     Load the best model from MLflow using the run ID
     """
+    import mlflow.sklearn
+
     model_uri = f"runs/{BEST_RUN_ID}/model"
     model = mlflow.sklearn.load_model(model_uri)
     return model
@@ -48,17 +50,18 @@ def predict_on_csv(input_path: str):
     """
     Predict on CSV file and save results with FEAST info
     """
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+
+    from src.data.materialize_features import require_fresh
+
     print("\n" + "="*70)
     print("📊 BATCH PREDICTION WITH FEAST")
     print("="*70)
     
-    # Materialize FEAST features
-    print("🔄 Materializing FEAST features...")
-    try:
-        fs.materialize_incremental(end_date=datetime.now())
-        print("✅ FEAST features materialized!")
-    except Exception as e:
-        print(f"⚠️  FEAST: {e}")
+    # Check FEAST freshness (src/data/materialize_features.py materializes)
+    print("🔄 Checking FEAST online store freshness...")
+    if not require_fresh("batch prediction"):
         print("   Continuing with batch prediction...")
     
     print(f"\n📥 Loading data from {input_path}...")
@@ -1,36 +1,95 @@
-import mlflow
-from mlflow.tracking import MlflowClient
-from feast import FeatureStore
-import os
-from datetime import datetime
+from typing import TYPE_CHECKING
+
+from src.training.candidates import BATCH_TAG, read_winner
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from mlflow.tracking import MlflowClient
+
+    from src.training.promotion import PromotionPolicy
+
+# mlflow, pandas, sklearn and the promotion helpers are imported inside the
+# functions that use them, so importing this module (or the CLI) is cheap
 
 # ===================================================================
 # CONFIG
 # ===================================================================
 EXPERIMENT_NAME = "IVF_Trigger_Prediction"
 MODEL_NAME = "ivf_trigger_model"
-FEAST_REPO_PATH = os.path.join(os.path.dirname(__file__), "feast", "feature_repo")
+DATA_PATH = r"data/processed/ivf_trigger_preprocessed.csv"
+TARGET_COL = "trigger_recommended"
+MAX_CANDIDATES = 5  # top runs by roc_auc that get benchmarked
 
-# ===================================================================
-# INITIALIZE FEAST
-# ===================================================================
-fs = FeatureStore(repo_path=FEAST_REPO_PATH)
+
+def load_benchmark_sample() -> "pd.DataFrame":
+    """Feature frame encoded the same way as in mlflow_training.py"""
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+
+    X = pd.read_csv(DATA_PATH).drop(columns=[TARGET_COL])
+    cat_cols = X.select_dtypes(include="object").columns
+    for col in cat_cols:
+        le = LabelEncoder()
+        X[col] = le.fit_transform(X[col].astype(str))
+    return X.fillna(X.mean(numeric_only=True))
+
+
+def get_champion_auc(client: "MlflowClient"):
+    """roc_auc of the newest registered version, or None if nothing is registered"""
+    versions = client.search_model_versions(f"name='{MODEL_NAME}'")
+    if not versions:
+        return None, None
+    latest = max(versions, key=lambda v: int(v.version))
+    run = client.get_run(latest.run_id)
+    return latest, run.data.metrics.get("roc_auc")
+
+
+def select_candidate(client: "MlflowClient", runs, policy: "PromotionPolicy"):
+    """Benchmark runs (best roc_auc first); return the first within budget"""
+    from src.training.promotion import TAG_PREFIX as BENCH_TAG_PREFIX, benchmark_model
+
+    X_sample = load_benchmark_sample()
+
+    for run in runs:
+        run_id = run.info.run_id
+        try:
+            bench = benchmark_model(f"runs:/{run_id}/model", X_sample)
+        except Exception as e:
+            print(f"   ⚠️  {run.info.run_name}: benchmark failed ({e}) - skipping")
+            continue
+        violations = policy.budget_violations(bench)
+        for key, value in bench.items():
+            client.set_tag(run_id, f"{BENCH_TAG_PREFIX}{key}", f"{value:.6g}")
+
+        print(
+            f"   {run.info.run_name:<20} roc_auc={run.data.metrics['roc_auc']:.4f} "
+            f"p50={bench['p50_latency_ms']:.2f}ms p99={bench['p99_latency_ms']:.2f}ms "
+            f"batch={bench['batch_rows_per_s']:.0f} rows/s "
+            f"size={bench['model_size_mb']:.2f}MB load={bench['load_time_s']:.3f}s"
+        )
+        if violations:
+            print(f"   ⛔ Rejected: {'; '.join(violations)}")
+            continue
+        return run, bench
+
+    return None, None
 
 
 def main():
     """Find best model and register with FEAST integration"""
+    import mlflow
+    from mlflow.tracking import MlflowClient
+
+    from src.data.materialize_features import require_fresh
+    from src.training.promotion import PromotionPolicy, tag_model_version
     
     # ===================================================================
-    # MATERIALIZE FEAST FEATURES BEFORE REGISTRATION
+    # CHECK FEAST FRESHNESS (materialization runs as its own DAG task)
     # ===================================================================
     print("\n" + "="*70)
-    print("🔄 FEAST: Materializing features to online store...")
+    print("🔄 FEAST: Checking online store freshness...")
     print("="*70)
-    try:
-        fs.materialize_incremental(end_date=datetime.now())
-        print("✅ FEAST: Features materialized successfully!")
-    except Exception as e:
-        print(f"⚠️  FEAST: {e}")
+    if not require_fresh("model registration"):
         print("   Continuing with model registration...")
     
     # ===================================================================
@@ -47,17 +106,37 @@ def main():
         print(f"❌ Experiment '{EXPERIMENT_NAME}' not found!")
         return
     
+    # Only the latest training batch competes when the DAG's reduce step
+    # recorded one (winner first); otherwise any finished run in the experiment
+    filter_string = "attributes.status = 'FINISHED'"
+    winner = read_winner()
+    if winner is not None:
+        filter_string += f" and tags.`{BATCH_TAG}` = '{winner['batch_id']}'"
+        print(f"🏁 Training batch {winner['batch_id']}: winner {winner['winner_name']} "
+              f"(roc_auc={winner['winner_roc_auc']:.4f}) of {len(winner['run_ids'])} runs")
+    
     runs = client.search_runs(
         experiment_ids=[experiment.experiment_id],
+        filter_string=filter_string,
         order_by=["metrics.roc_auc DESC"],
-        max_results=1,
+        max_results=MAX_CANDIDATES,
     )
     
     if not runs:
         print(f"❌ No runs found in experiment '{EXPERIMENT_NAME}'")
         return
     
-    best_run = runs[0]
+    # ===================================================================
+    # BENCHMARK CANDIDATES AGAINST THE PROMOTION POLICY
+    # ===================================================================
+    policy = PromotionPolicy.from_env()
+    print(f"⏱️  Benchmarking top {len(runs)} runs, policy: {policy.to_dict()}")
+    
+    best_run, bench = select_candidate(client, runs, policy)
+    if best_run is None:
+        print("❌ No candidate meets the latency / size budget - nothing registered")
+        return
+    
     best_run_id = best_run.info.run_id
     best_model_name = best_run.info.run_name
     best_roc_auc = best_run.data.metrics["roc_auc"]
@@ -66,6 +145,17 @@ def main():
     print(f"✅ Best Model: {best_model_name}")
     print(f"✅ Best ROC_AUC: {best_roc_auc:.4f}")
     
+    champion, champion_auc = get_champion_auc(client)
+    if champion is not None and champion.run_id == best_run_id:
+        print(f"ℹ️  Run already registered as version {champion.version} - skipping")
+        return
+    if not policy.auc_gain_ok(best_roc_auc, champion_auc):
+        print(
+            f"⛔ AUC gain {best_roc_auc - champion_auc:+.4f} over version "
+            f"{champion.version} is below {policy.min_auc_gain} - not promoting"
+        )
+        return
+    
     # ===================================================================
     # REGISTER MODEL WITH FEAST METADATA
     # ===================================================================
@@ -73,7 +163,7 @@ def main():
     print("📝 Registering model with FEAST integration...")
     print("="*70)
     
-    model_uri = f"runs/{best_run_id}/{best_model_name}"
+    model_uri = f"runs:/{best_run_id}/model"
     
     try:
         result = mlflow.register_model(
@@ -81,7 +171,7 @@ def main():
             name=MODEL_NAME
         )
         
-        print(f"✅ Model registered!")
+        print("✅ Model registered!")
         print(f"   Name: {result.name}")
         print(f"   Version: {result.version}")
         
@@ -98,6 +188,12 @@ def main():
         except Exception as e:
             print(f"⚠️  Model update: {e}")
         
+        try:
+            tag_model_version(client, MODEL_NAME, result.version, bench)
+            print("✅ Benchmark results stored as model version tags")
+        except Exception as e:
+            print(f"⚠️  Benchmark tags: {e}")
+        
         print("\n" + "="*70)
         print("✅ MODEL REGISTRATION COMPLETE!")
         print("="*70)
@@ -105,8 +201,9 @@ def main():
         print(f"Version: {result.version}")
         print(f"Algorithm: {best_model_name}")
         print(f"ROC_AUC: {best_roc_auc:.4f}")
-        print(f"FEAST Integration: YES ✓")
-        print(f"Status: Ready for deployment")
+        print(f"p99 latency: {bench['p99_latency_ms']:.2f} ms")
+        print("FEAST Integration: YES ✓")
+        print("Status: Ready for deployment")
         print("="*70 + "\n")
         
     except Exception as e:
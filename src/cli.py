@@ -0,0 +1,240 @@
+"""
+One command-line entry point for the whole pipeline.
+
+    python -m src.cli <command> [options]
+
+Every command imports its module only when it runs, so `src.cli` itself
+loads nothing heavy and no command pays for another's dependencies
+(validate never imports mlflow, list-candidates never imports sklearn).
+The same commands are callable in-process with run(argv), which is what
+the Airflow DAG does instead of starting a fresh interpreter per task;
+run() returns (exit code, result) and SKIP_EXIT_CODE means "skipped".
+
+`stage <name> -- <command ...>` wraps a command in the stage cache
+(src/pipeline/stage_cache.py) and runs it in the same process.
+
+All relative data paths resolve from the project root, whatever the
+caller's working directory.
+"""
+import argparse
+import json
+import os
+import sys
+
+try:
+    from src.pipeline.stage_cache import SKIP_EXIT_CODE
+except ImportError:  # run as a script: python src/cli.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from src.pipeline.stage_cache import SKIP_EXIT_CODE
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ===================================================================
+# COMMANDS (each returns (exit code, result))
+# ===================================================================
+def cmd_pull(args):
+    from src.data.pull_mysql_to_csv import main
+
+    main()
+    return 0, None
+
+
+def cmd_preprocess(args):
+    from src.preprocessing.incremental_preprocess import RAW_PARTS_DIR, main
+
+    main(full_rebuild=args.full_rebuild, raw_dir=args.raw_dir or RAW_PARTS_DIR)
+    return 0, None
+
+
+def cmd_validate(args):
+    from ge_validate_ivf_preprocessed import main
+    from src.validation.streaming import DEFAULT_CHUNK_SIZE
+
+    main(engine=args.engine, stream=args.stream, workers=args.workers,
+         chunk_size=args.chunk_size or DEFAULT_CHUNK_SIZE)
+    return 0, None
+
+
+def cmd_materialize(args):
+    from src.data.materialize_features import WORKERS, WRITE_CHUNK_ROWS, materialize
+
+    stats = materialize(force=args.force, workers=args.workers or WORKERS,
+                        chunk_rows=args.chunk_rows or WRITE_CHUNK_ROWS)
+    return (SKIP_EXIT_CODE if stats["skipped"] else 0), stats
+
+
+def cmd_list_candidates(args):
+    from mlflow_training import list_candidates
+
+    return 0, list_candidates()
+
+
+def cmd_train(args):
+    if not args.candidate or len(args.candidate) != 1:
+        from mlflow_training import train_and_log
+
+        return 0, train_and_log(candidate_names=args.candidate, batch_id=args.batch)
+
+    from threadpoolctl import threadpool_limits
+
+    from src.training.candidates import get_candidate, task_env
+
+    env = task_env(get_candidate(args.candidate[0]))
+    # The env reaches pools not loaded yet (and the estimator's n_jobs);
+    # threadpool_limits caps the ones this process already loaded
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    from mlflow_training import train_and_log
+
+    with threadpool_limits(limits=int(os.environ["IVF_TRAIN_N_JOBS"])):
+        return 0, train_and_log(candidate_names=args.candidate, batch_id=args.batch)
+
+
+def cmd_select_winner(args):
+    from mlflow_training import close_batch
+
+    return close_batch(args.batch), None
+
+
+def cmd_register(args):
+    from register_best_model import main
+
+    main()
+    return 0, None
+
+
+def cmd_predict(args):
+    from predict_ivf import predict_on_csv
+
+    predict_on_csv(args.input_path)
+    return 0, None
+
+
+def cmd_retrain_check(args):
+    from src.pipeline.retrain_trigger import check_retrain
+
+    return 0, check_retrain()
+
+
+def cmd_mark_trained(args):
+    from src.pipeline.retrain_trigger import mark_trained
+
+    state = mark_trained()
+    # Still pending: training did not run in this DAG run
+    return (SKIP_EXIT_CODE if "pending" in state else 0), None
+
+
+def cmd_stage(args):
+    from src.pipeline import stage_cache
+
+    if args.status:
+        stage_cache.print_status()
+        return 0, None
+    if args.check:
+        return stage_cache.check_stage(args.stage, force=args.force), None
+    if args.record:
+        return stage_cache.record_stage(args.stage), None
+    if not args.stage_command:
+        raise SystemExit("stage: give --check, --record or -- <command ...>")
+    command = args.stage_command
+    return stage_cache.run_stage(args.stage, command, force=args.force,
+                                 runner=lambda: run(command)[0]), None
+
+
+def cmd_serve(args):
+    import uvicorn
+
+    uvicorn.run("api.main:app", host=args.host, port=args.port, workers=args.workers)
+    return 0, None
+
+
+# ===================================================================
+# PARSER
+# ===================================================================
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="IVF trigger pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("pull", help="export new MySQL rows to Parquet parts").set_defaults(func=cmd_pull)
+
+    p = sub.add_parser("preprocess", help="preprocess pulled rows not seen before into the parts dataset")
+    p.add_argument("--raw-dir", default=None, help="exported Parquet parts (default: the pull's)")
+    p.add_argument("--full-rebuild", action="store_true")
+    p.set_defaults(func=cmd_preprocess)
+
+    p = sub.add_parser("validate", help="validate the preprocessed dataset")
+    p.add_argument("--engine", choices=["native", "ge"], default="native")
+    p.add_argument("--stream", action="store_true")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--chunk-size", type=int, default=None)
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("materialize", help="materialize Feast features (skips when current)")
+    p.add_argument("--force", action="store_true")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--chunk-rows", type=int, default=None)
+    p.set_defaults(func=cmd_materialize)
+
+    sub.add_parser("list-candidates", help="candidate models and their task resources") \
+        .set_defaults(func=cmd_list_candidates)
+
+    p = sub.add_parser("train", help="train candidates and log them to MLflow")
+    p.add_argument("--candidate", action="append", help="only this candidate (repeatable)")
+    p.add_argument("--batch", help="training batch id (the DAG run id)")
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("select-winner", help="pick the batch's best run and close the train gate")
+    p.add_argument("--batch", required=True)
+    p.set_defaults(func=cmd_select_winner)
+
+    sub.add_parser("register", help="benchmark and register the best run").set_defaults(func=cmd_register)
+
+    p = sub.add_parser("predict", help="batch prediction on a CSV file")
+    p.add_argument("input_path")
+    p.set_defaults(func=cmd_predict)
+
+    sub.add_parser("retrain-check", help="decide whether retraining is needed") \
+        .set_defaults(func=cmd_retrain_check)
+    sub.add_parser("mark-trained", help="advance the trained watermark").set_defaults(func=cmd_mark_trained)
+
+    p = sub.add_parser("stage", help="run a command through the stage cache")
+    p.add_argument("stage", nargs="?")
+    p.add_argument("--force", action="store_true")
+    p.add_argument("--status", action="store_true")
+    p.add_argument("--check", action="store_true")
+    p.add_argument("--record", action="store_true")
+    p.set_defaults(func=cmd_stage)
+
+    p = sub.add_parser("serve", help="run the prediction API")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=1)
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def run(argv: list) -> tuple:
+    """Run one command in this process; returns (exit code, result)"""
+    # Everything after "--" belongs to the wrapped command of `stage`
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = build_parser().parse_args(argv[:split])
+    args.stage_command = argv[split + 1:]
+
+    os.chdir(PROJECT_ROOT)
+    if PROJECT_ROOT not in sys.path:
+        # Top-level scripts (mlflow_training, register_best_model, ...)
+        sys.path.insert(0, PROJECT_ROOT)
+    return args.func(args)
+
+
+def main(argv: list = None) -> int:
+    code, result = run(sys.argv[1:] if argv is None else argv)
+    if result is not None:
+        # Last stdout line: machine-readable result (BashOperator XCom)
+        print(json.dumps(result, default=str))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Shared bulk ingestion for the IVF tables.
+
+Three write modes, all sending rows in fixed-size batches through one
+executemany() call per batch (one prepared statement, DBAPI-level
+batching) instead of pandas' default to_sql path:
+
+    append  - plain inserts
+    upsert  - idempotent insert-or-update on a natural key, e.g.
+              (patient_id, day): MySQL ON DUPLICATE KEY UPDATE,
+              SQLite/PostgreSQL ON CONFLICT DO UPDATE
+    swap    - load into <table>__staging, then swap it with the live
+              table in one transaction (no window with an empty table);
+              rows are deduplicated on the natural key like upserts
+
+Upsert and swap collapse input rows sharing a natural key to the last
+one; how many were collapsed is returned as duplicate_key_rows.
+
+A MySQL table range-partitioned on ingested_at (schema.partition_by_month)
+cannot have a unique key on the natural key alone, so ON DUPLICATE KEY
+UPDATE would never match. Upserts into such a table fall back to
+delete + insert of the changed keys inside the load's transaction; rows
+identical to what is stored are left alone, keeping their ingested_at.
+
+Works against MySQL in production and SQLite as a local stand-in.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+DEFAULT_BATCH_SIZE = 5_000
+NATURAL_KEY = ("patient_id", "day")
+KEY_STRING_LENGTH = 64  # MySQL cannot index TEXT key columns without a length
+STAGING_SUFFIX = "__staging"
+OLD_SUFFIX = "__old"
+# Server-stamped on insert and re-stamped when an upsert changes the row, so
+# corrected rows show up in incremental pulls and new-row counts
+REFRESH_ON_UPDATE = ("ingested_at",)
+
+
+def _records(df: pd.DataFrame) -> list:
+    """DataFrame rows as dicts of Python scalars with NaN/NaT turned into NULL"""
+    columns = list(df.columns)
+    arrays = []
+    for col in columns:
+        values = df[col].to_numpy(dtype=object)
+        missing = df[col].isna().to_numpy()
+        if missing.any():
+            values[missing] = None
+        arrays.append(values)
+    return [dict(zip(columns, row)) for row in zip(*arrays)]
+
+
+def _key_dtypes(df: pd.DataFrame, key_cols) -> dict:
+    return {
+        col: sa.String(KEY_STRING_LENGTH)
+        for col in key_cols
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])
+    }
+
+
+def _create_table_from_frame(conn, df: pd.DataFrame, table_name: str, key_cols=()):
+    """Create an empty table with pandas' type mapping (bounded key strings)"""
+    df.head(0).to_sql(
+        name=table_name, con=conn, index=False, dtype=_key_dtypes(df, key_cols)
+    )
+
+
+def ensure_natural_key(conn, table_name: str, key_cols=NATURAL_KEY):
+    """Upserts need a unique index on the natural key; add it if missing"""
+    inspector = sa.inspect(conn)
+    key_cols = list(key_cols)
+    if inspector.get_pk_constraint(table_name).get("constrained_columns") == key_cols:
+        return
+    for index in inspector.get_indexes(table_name):
+        if index.get("unique") and index["column_names"] == key_cols:
+            return
+    for constraint in inspector.get_unique_constraints(table_name):
+        if constraint["column_names"] == key_cols:
+            return
+
+    table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+    sa.Index(f"uq_{table_name}_natural_key", *[table.c[c] for c in key_cols], unique=True).create(conn)
+
+
+def is_partitioned(conn, table_name: str) -> bool:
+    """True for a partitioned MySQL table (no unique key without the partition column)"""
+    if conn.dialect.name != "mysql":
+        return False
+    return bool(conn.execute(sa.text(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+    ), {"table": table_name}).scalar())
+
+
+def _same_values(new: pd.Series, old: pd.Series) -> np.ndarray:
+    """Element-wise equality with NULL == NULL; floats within FLOAT column precision"""
+    if pd.api.types.is_numeric_dtype(new) and pd.api.types.is_numeric_dtype(old):
+        return np.isclose(new.to_numpy(dtype=float), old.to_numpy(dtype=float), rtol=1e-6, equal_nan=True)
+    return ((new == old) | (new.isna() & old.isna())).to_numpy()
+
+
+def _replace_batches(conn, table: sa.Table, df: pd.DataFrame, key_cols, batch_size: int) -> tuple:
+    """
+    Upsert without a unique natural key: per batch, delete the stored rows
+    of every changed or new key (all copies) and insert the incoming ones.
+    Returns (batches written, unchanged rows skipped).
+    """
+    key = sa.tuple_(*[table.c[c] for c in key_cols])
+    value_cols = [c for c in df.columns if c not in key_cols]
+    batches = unchanged = 0
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        keys = list(batch[key_cols].itertuples(index=False, name=None))
+        stored = pd.read_sql(sa.select(*[table.c[c] for c in df.columns]).where(key.in_(keys)), conn)
+        if not stored.empty:
+            # Several stored copies of a key (an earlier plain insert) are replaced too
+            copies = stored.groupby(key_cols).size().rename("__copies").reset_index()
+            stored = stored.drop_duplicates(subset=key_cols, keep="last").merge(copies, on=key_cols)
+            merged = batch.merge(stored, on=key_cols, how="left", suffixes=("", "__stored"), indicator=True)
+            same = (merged["_merge"].eq("both") & merged["__copies"].eq(1)).to_numpy()
+            for col in value_cols:
+                same &= _same_values(merged[col], merged[col + "__stored"])
+            unchanged += int(same.sum())
+            batch = batch[~same]
+        if batch.empty:
+            continue
+        keys = list(batch[key_cols].itertuples(index=False, name=None))
+        conn.execute(table.delete().where(key.in_(keys)))
+        conn.execute(table.insert(), _records(batch))
+        batches += 1
+    return batches, unchanged
+
+
+def _refresh_values(table: sa.Table, update_cols, incoming) -> list:
+    """
+    (column, expression) pairs that re-stamp REFRESH_ON_UPDATE columns, but
+    only when the incoming row changes a value: reloading identical rows
+    must not make them look new to incremental pulls
+    """
+    refresh_cols = [c for c in REFRESH_ON_UPDATE if c in table.c and c not in update_cols]
+    if not refresh_cols or not update_cols:
+        return []
+    unchanged = sa.and_(*[table.c[c].is_not_distinct_from(incoming[c]) for c in update_cols])
+    return [(c, sa.case((unchanged, table.c[c]), else_=sa.func.current_timestamp())) for c in refresh_cols]
+
+
+def _upsert_statement(conn, table: sa.Table, key_cols, update_cols):
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table)
+        # ingested_at is re-stamped by the column's ON UPDATE CURRENT_TIMESTAMP
+        # (schema migration 2), which MySQL applies only when a value changes
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_cols})
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_cols),
+            set_={c: stmt.excluded[c] for c in update_cols} | dict(_refresh_values(table, update_cols, stmt.excluded)),
+        )
+    raise NotImplementedError(f"upsert is not implemented for dialect '{dialect}'")
+
+
+def _insert_batches(conn, stmt, df: pd.DataFrame, batch_size: int) -> int:
+    batches = 0
+    for start in range(0, len(df), batch_size):
+        conn.execute(stmt, _records(df.iloc[start:start + batch_size]))
+        batches += 1
+    return batches
+
+
+def _swap_in_staging(conn, table_name: str, staging_name: str):
+    """Replace table_name with staging_name, keeping the live table's indexes"""
+    inspector = sa.inspect(conn)
+    if not inspector.has_table(table_name):
+        conn.execute(sa.text(f"ALTER TABLE {staging_name} RENAME TO {table_name}"))
+        return
+
+    indexes = inspector.get_indexes(table_name)
+    old_name = table_name + OLD_SUFFIX
+    if conn.dialect.name == "mysql":
+        # Atomic for readers: both renames happen in one statement
+        conn.execute(sa.text(
+            f"RENAME TABLE {table_name} TO {old_name}, {staging_name} TO {table_name}"
+        ))
+    else:
+        conn.execute(sa.text(f"ALTER TABLE {table_name} RENAME TO {old_name}"))
+        conn.execute(sa.text(f"ALTER TABLE {staging_name} RENAME TO {table_name}"))
+    conn.execute(sa.text(f"DROP TABLE {old_name}"))
+
+    # Index names are database-global in SQLite, so they can only be
+    # recreated once the old table is gone
+    new_table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+    existing = {ix["name"] for ix in sa.inspect(conn).get_indexes(table_name)}
+    for index in indexes:
+        if index["name"] not in existing:
+            sa.Index(
+                index["name"],
+                *[new_table.c[c] for c in index["column_names"]],
+                unique=bool(index.get("unique")),
+            ).create(conn)
+
+
+def bulk_load(
+    df: pd.DataFrame,
+    engine,
+    table_name: str,
+    mode: str = "upsert",
+    key_cols=NATURAL_KEY,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """
+    Write df to table_name with the given mode ("append", "upsert", "swap").
+    Returns load stats including rows/s.
+    """
+    if mode not in ("append", "upsert", "swap"):
+        raise ValueError(f"Unknown mode '{mode}'")
+
+    start = time.perf_counter()
+    stats = {"table": table_name, "mode": mode, "input_rows": len(df), "skipped_null_key": 0,
+             "duplicate_key_rows": 0}
+
+    if mode in ("upsert", "swap") and key_cols:
+        key_cols = list(key_cols)
+        null_key = df[key_cols].isna().any(axis=1)
+        stats["skipped_null_key"] = int(null_key.sum())
+        # Last occurrence wins, same as a sequence of single-row upserts;
+        # a swap into a keyed table would otherwise fail on the duplicates
+        keyed = df[~null_key]
+        df = keyed.drop_duplicates(subset=key_cols, keep="last")
+        stats["duplicate_key_rows"] = len(keyed) - len(df)
+
+    with engine.begin() as conn:
+        inspector = sa.inspect(conn)
+
+        if mode == "swap":
+            target_name = table_name + STAGING_SUFFIX
+            conn.execute(sa.text(f"DROP TABLE IF EXISTS {target_name}"))
+            if inspector.has_table(table_name):
+                # Same columns, types and primary key as the live table
+                live = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+                staging = live.to_metadata(sa.MetaData(), name=target_name)
+                staging.indexes.clear()
+                staging.create(conn)
+            else:
+                _create_table_from_frame(conn, df, target_name, key_cols)
+        else:
+            target_name = table_name
+            if not inspector.has_table(table_name):
+                _create_table_from_frame(conn, df, table_name, key_cols)
+
+        table = sa.Table(target_name, sa.MetaData(), autoload_with=conn)
+        df = df[[c for c in df.columns if c in table.c]]
+
+        if mode == "upsert" and is_partitioned(conn, table_name):
+            stats["batches"], stats["unchanged_rows"] = _replace_batches(conn, table, df, key_cols, batch_size)
+        else:
+            if mode == "upsert":
+                ensure_natural_key(conn, table_name, key_cols)
+                update_cols = [c for c in df.columns if c not in key_cols]
+                stmt = _upsert_statement(conn, table, key_cols, update_cols)
+            else:
+                stmt = table.insert()
+            stats["batches"] = _insert_batches(conn, stmt, df, batch_size)
+
+        if mode == "swap":
+            _swap_in_staging(conn, table_name, target_name)
+
+    elapsed = time.perf_counter() - start
+    stats["rows"] = len(df)
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_s"] = round(len(df) / elapsed, 1) if elapsed > 0 else float(np.inf)
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    return (
+        f"{stats['mode']} {stats['rows']} rows into {stats['table']} in "
+        f"{stats['seconds']}s ({stats['rows_per_s']} rows/s, {stats['batches']} batches"
+        + (f", {stats['skipped_null_key']} rows without a natural key skipped" if stats["skipped_null_key"] else "")
+        + (f", {stats['duplicate_key_rows']} duplicate-key rows collapsed" if stats["duplicate_key_rows"] else "")
+        + ")"
+    )
@@ -0,0 +1,163 @@
+"""
+Shared database access for loaders, exports and the retraining trigger.
+
+One pooled SQLAlchemy engine per process, configured from IVF_DB_*
+environment variables (host/user defaults match the local MySQL setup;
+the password has no default and must come from IVF_DB_PASSWORD, or the
+whole URL from IVF_DB_URL). read_tables_parallel() runs several reads at
+once on separate pooled connections. pool_stats() reports pool usage and
+checkout latency for the loaders' run summaries; the same numbers are
+Prometheus metrics when prometheus_client is installed.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.pool import QueuePool
+
+try:
+    from prometheus_client import Gauge, Histogram
+except ImportError:  # metrics are optional outside the API
+    Gauge = Histogram = None
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+# pymysql: mysqlconnector has no server-side cursors, which the export streams through
+DB_DRIVER = os.environ.get("IVF_DB_DRIVER", "mysql+pymysql")
+DB_HOST = os.environ.get("IVF_DB_HOST", "localhost")
+DB_PORT = int(os.environ.get("IVF_DB_PORT", "3306"))
+DB_NAME = os.environ.get("IVF_DB_NAME", "ivf_trigger_db")
+DB_USER = os.environ.get("IVF_DB_USER", "root")
+DB_PASSWORD = os.environ.get("IVF_DB_PASSWORD")
+
+POOL_SIZE = int(os.environ.get("IVF_DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.environ.get("IVF_DB_MAX_OVERFLOW", "5"))
+POOL_RECYCLE_S = int(os.environ.get("IVF_DB_POOL_RECYCLE_S", "1800"))
+POOL_TIMEOUT_S = int(os.environ.get("IVF_DB_POOL_TIMEOUT_S", "30"))
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+_checkout_stats = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+_stats_lock = threading.Lock()  # checkouts happen on many threads at once
+
+if Histogram is not None:
+    POOL_CHECKOUT_SECONDS = Histogram(
+        "ivf_db_pool_checkout_seconds",
+        "Time spent waiting for a pooled database connection",
+        buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+    )
+    POOL_IN_USE = Gauge("ivf_db_pool_in_use", "Pooled connections currently checked out")
+    POOL_IDLE = Gauge("ivf_db_pool_idle", "Pooled connections open and idle")
+else:
+    POOL_CHECKOUT_SECONDS = POOL_IN_USE = POOL_IDLE = None
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            with _stats_lock:
+                _checkout_stats["count"] += 1
+                _checkout_stats["total_s"] += elapsed
+                _checkout_stats["max_s"] = max(_checkout_stats["max_s"], elapsed)
+            if POOL_CHECKOUT_SECONDS is not None:
+                POOL_CHECKOUT_SECONDS.observe(elapsed)
+
+
+def database_url() -> str:
+    """IVF_DB_URL wins (e.g. sqlite:///local.db); otherwise built from parts"""
+    url = os.environ.get("IVF_DB_URL")
+    if url:
+        return url
+    if not DB_PASSWORD:
+        raise RuntimeError("IVF_DB_PASSWORD is not set (or set IVF_DB_URL to the full database URL)")
+    return (
+        f"{DB_DRIVER}://{DB_USER}:{quote_plus(DB_PASSWORD)}"
+        f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
+
+
+def get_engine() -> sa.engine.Engine:
+    """The process-wide pooled engine, created on first use"""
+    global _engine, _engine_pid
+    # A forked worker must not reuse the parent's sockets
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+
+    with _engine_lock:
+        if _engine is not None and _engine_pid == os.getpid():
+            return _engine
+        if _engine is not None:
+            _engine.dispose(close=False)
+
+        url = sa.engine.make_url(database_url())
+        kwargs = {"pool_pre_ping": True}
+        if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+            kwargs.update(
+                poolclass=TimedQueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_recycle=POOL_RECYCLE_S,
+                pool_timeout=POOL_TIMEOUT_S,
+            )
+        _engine = sa.create_engine(url, **kwargs)
+        _engine_pid = os.getpid()
+        if POOL_IN_USE is not None and isinstance(_engine.pool, QueuePool):
+            POOL_IN_USE.set_function(_engine.pool.checkedout)
+            POOL_IDLE.set_function(_engine.pool.checkedin)
+        return _engine
+
+
+def pool_stats() -> dict:
+    """Snapshot of pool usage for logs and health endpoints"""
+    engine = get_engine()
+    stats = {"status": engine.pool.status()}
+    if isinstance(engine.pool, QueuePool):
+        stats.update(
+            size=engine.pool.size(),
+            checked_out=engine.pool.checkedout(),
+            idle=engine.pool.checkedin(),
+            overflow=engine.pool.overflow(),
+        )
+    with _stats_lock:
+        count, total_s, max_s = _checkout_stats["count"], _checkout_stats["total_s"], _checkout_stats["max_s"]
+    stats["checkouts"] = count
+    stats["avg_checkout_ms"] = round(total_s / count * 1000, 3) if count else 0.0
+    stats["max_checkout_ms"] = round(max_s * 1000, 3)
+    return stats
+
+
+
+def read_sql(query, params: dict = None) -> pd.DataFrame:
+    """pd.read_sql over a pooled connection"""
+    if isinstance(query, str):
+        query = sa.text(query)
+    with get_engine().connect() as conn:
+        return pd.read_sql(query, conn, params=params)
+
+
+def read_tables_parallel(queries: dict, max_workers: int = None) -> dict:
+    """
+    Run several queries at once, each on its own pooled connection.
+    queries maps a name to SQL text (or a bare table name).
+    """
+    def run(sql):
+        if " " not in sql.strip():
+            sql = f"SELECT * FROM {sql}"
+        return read_sql(sql)
+
+    max_workers = max_workers or min(len(queries), POOL_SIZE) or 1
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ivf-db") as executor:
+        futures = {name: executor.submit(run, sql) for name, sql in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -1,25 +1,23 @@
 import os
+import sys
 import pandas as pd
-from sqlalchemy import create_engine
-from urllib.parse import quote_plus
 
-DB_HOST = "localhost"
-DB_PORT = 3306
-DB_NAME = "ivf_trigger_db"
-DB_USER = "root"
-DB_PASSWORD = "Chaithu@143"
+try:
+    from src.data.bulk_load import bulk_load, format_stats
+    from src.data.db import DB_NAME, get_engine, pool_stats
+except ImportError:  # run as a script: python src/data/load_ivf_csv_to_mysql.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.data.bulk_load import bulk_load, format_stats
+    from src.data.db import DB_NAME, get_engine, pool_stats
 
 PROJECT_ROOT = r"C:\AI_IVF_Trigger_day"
 CSV_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "Trigger_day_prediction.csv")
 TABLE_NAME = "ivf_trigger_data"
+BATCH_SIZE = 5000
 
 
 def main():
-    encoded_password = quote_plus(DB_PASSWORD)
-    connection_url = (
-        f"mysql+mysqlconnector://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    )
-    engine = create_engine(connection_url)
+    engine = get_engine()
 
     df = pd.read_csv(CSV_PATH)
 
@@ -50,15 +48,11 @@ def main():
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    with engine.begin() as conn:
-        df.to_sql(
-            name=TABLE_NAME,
-            con=conn,
-            if_exists="append",
-            index=False,
-        )
-
-    print(f"Loaded {len(df)} rows into {DB_NAME}.{TABLE_NAME}")
+    # Idempotent: re-running with the same CSV updates rows on (patient_id, day)
+    stats = bulk_load(df, engine, TABLE_NAME, mode="upsert", batch_size=BATCH_SIZE)
+    print(format_stats(stats))
+    print(f"DB pool: {pool_stats()}")
+    print(f"Loaded {stats['rows']} rows into {DB_NAME}.{TABLE_NAME}")
 
 
 if __name__ == "__main__":
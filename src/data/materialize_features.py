@@ -0,0 +1,237 @@
+"""
+The single Feast materialization job.
+
+check_freshness() compares the last materialization marker with the
+offline source (latest event timestamp from Parquet statistics, newest
+file mtime), so callers can skip work without touching the online store.
+
+When the store is stale, the source's event_date partitions are split
+into one contiguous group per worker process, balanced by row count from
+the Parquet footers (event times cluster in a few days, so equal slices
+of wall-clock time would leave most workers empty). Each worker reads
+only its partitions and keeps the latest row per patient. The parent merges the slices and writes the online store in
+fixed-size chunks from a single process, which avoids SQLite lock fights,
+then records the interval in the registry and rewrites the marker that
+online feature caches watch.
+
+Run from the project root:
+    python -m src.data.materialize_features [--force] [--workers 4]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    from src.pipeline.stage_cache import SKIP_EXIT_CODE
+    from src.serving.feature_cache import MATERIALIZATION_MARKER, write_materialization_marker
+    from src.training.feast_dataset import (
+        ENTITY_KEY,
+        FEAST_REPO_PATH,
+        OFFLINE_SOURCE_DIR,
+        PARTITION_COL,
+        TIMESTAMP_COL,
+    )
+except ImportError:  # run as a script: python src/data/materialize_features.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.pipeline.stage_cache import SKIP_EXIT_CODE
+    from src.serving.feature_cache import MATERIALIZATION_MARKER, write_materialization_marker
+    from src.training.feast_dataset import (
+        ENTITY_KEY,
+        FEAST_REPO_PATH,
+        OFFLINE_SOURCE_DIR,
+        PARTITION_COL,
+        TIMESTAMP_COL,
+    )
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+FEATURE_VIEW = "ivf_trigger_features"
+WORKERS = int(os.environ.get("IVF_MATERIALIZE_WORKERS", str(min(4, os.cpu_count() or 1))))
+WRITE_CHUNK_ROWS = int(os.environ.get("IVF_MATERIALIZE_CHUNK_ROWS", "10000"))
+
+
+# ===================================================================
+# FRESHNESS
+# ===================================================================
+def _source_files(source_dir: str) -> list:
+    return [
+        os.path.join(root, f)
+        for root, _, files in os.walk(source_dir)
+        for f in files if f.endswith(".parquet")
+    ]
+
+
+def source_state(source_dir: str = OFFLINE_SOURCE_DIR) -> dict:
+    """Event-time range and last write time of the offline source, from metadata only"""
+    files = _source_files(source_dir)
+    if not files:
+        raise FileNotFoundError(f"No Parquet files under {source_dir}")
+    lows, highs = [], []
+    for path in files:
+        meta = pq.ParquetFile(path).metadata
+        col = meta.schema.to_arrow_schema().get_field_index(TIMESTAMP_COL)
+        for rg in range(meta.num_row_groups):
+            stats = meta.row_group(rg).column(col).statistics
+            if stats is not None and stats.has_min_max:
+                lows.append(pd.Timestamp(stats.min))
+                highs.append(pd.Timestamp(stats.max))
+    to_utc = lambda ts: ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return {
+        "min_event_ts": to_utc(min(lows)),
+        "max_event_ts": to_utc(max(highs)),
+        "modified_at": datetime.fromtimestamp(max(os.path.getmtime(f) for f in files), timezone.utc),
+    }
+
+
+def read_marker(marker_path: str = MATERIALIZATION_MARKER):
+    if not os.path.exists(marker_path):
+        return None
+    with open(marker_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_freshness(source_dir: str = OFFLINE_SOURCE_DIR, marker_path: str = MATERIALIZATION_MARKER):
+    """(fresh, detail): fresh when the last run covers every event and postdates the source"""
+    marker = read_marker(marker_path)
+    state = source_state(source_dir)
+    detail = {**state, "marker": marker}
+    if marker is None:
+        return False, detail
+    end_date = pd.Timestamp(marker["end_date"])
+    finished_at = pd.Timestamp(marker["finished_at"])
+    fresh = end_date > state["max_event_ts"] and finished_at >= state["modified_at"]
+    return fresh, detail
+
+
+# ===================================================================
+# MATERIALIZATION
+# ===================================================================
+def partition_rows(source_dir: str) -> dict:
+    """Rows per event_date partition, from the Parquet footers only"""
+    rows = {}
+    prefix = f"{PARTITION_COL}="
+    for path in _source_files(source_dir):
+        parent = os.path.basename(os.path.dirname(path))
+        if parent.startswith(prefix):
+            day = parent[len(prefix):]
+            rows[day] = rows.get(day, 0) + pq.ParquetFile(path).metadata.num_rows
+    return dict(sorted(rows.items()))
+
+
+def split_partitions(rows: dict, parts: int) -> list:
+    """Contiguous groups of partitions (in date order) with about equal rows each"""
+    days = list(rows)
+    parts = max(1, min(parts, len(days)))
+    total = sum(rows.values())
+    groups, current, seen = [], [], 0
+    for i, day in enumerate(days):
+        current.append(day)
+        seen += rows[day]
+        remaining_days = len(days) - i - 1
+        remaining_groups = parts - len(groups) - 1
+        # Close the group at its share of the rows, leaving a day for each later group
+        if remaining_groups and (seen >= total * (len(groups) + 1) / parts or remaining_days == remaining_groups):
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
+
+
+def latest_rows(source_dir: str, days: list, columns: list) -> pd.DataFrame:
+    """Latest row per patient within the given event_date partitions (worker process)"""
+    dataset = ds.dataset(source_dir, format="parquet", partitioning="hive")
+    expr = ds.field(PARTITION_COL).isin(days)
+    df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+    df = df.sort_values(TIMESTAMP_COL, kind="stable")
+    return df.drop_duplicates(ENTITY_KEY, keep="last")
+
+
+def materialize(force: bool = False, workers: int = WORKERS, chunk_rows: int = WRITE_CHUNK_ROWS,
+                store=None, source_dir: str = OFFLINE_SOURCE_DIR,
+                marker_path: str = MATERIALIZATION_MARKER) -> dict:
+    fresh, detail = check_freshness(source_dir, marker_path)
+    if fresh and not force:
+        print(f"✅ Online store is current (materialized up to {detail['marker']['end_date']}); skipping")
+        return {"skipped": True, "rows": 0}
+
+    if store is None:
+        from feast import FeatureStore
+
+        store = FeatureStore(repo_path=FEAST_REPO_PATH)
+    view = store.get_feature_view(FEATURE_VIEW)
+    columns = [ENTITY_KEY, TIMESTAMP_COL] + [f.name for f in view.features]
+
+    start_time = time.perf_counter()
+    # The whole source range: scans may be (re)written with old event times
+    start = detail["min_event_ts"].to_pydatetime()
+    end = datetime.now(timezone.utc)
+    intervals = split_partitions(partition_rows(source_dir), max(workers, 1))
+
+    if workers > 1 and len(intervals) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(intervals))) as pool:
+            frames = list(pool.map(
+                latest_rows,
+                [source_dir] * len(intervals),
+                intervals,
+                [columns] * len(intervals),
+            ))
+    else:
+        frames = [latest_rows(source_dir, days, columns) for days in intervals]
+    read_s = time.perf_counter() - start_time
+
+    # Later partitions win, so the result is the latest row per patient overall
+    latest = pd.concat(frames, ignore_index=True).drop_duplicates(ENTITY_KEY, keep="last")
+    for i in range(0, len(latest), chunk_rows):
+        store.write_to_online_store(FEATURE_VIEW, latest.iloc[i:i + chunk_rows])
+    store.registry.apply_materialization(view, store.project, start, end)
+    elapsed = time.perf_counter() - start_time
+
+    stats = {
+        "skipped": False,
+        "rows": len(latest),
+        "intervals": len(intervals),
+        "read_s": round(read_s, 3),
+        "total_s": round(elapsed, 3),
+        "rows_per_s": round(len(latest) / elapsed, 1) if elapsed else None,
+    }
+    write_materialization_marker(end, marker_path, **stats)
+    print(f"✅ Materialized {stats['rows']} rows over {stats['intervals']} intervals "
+          f"in {stats['total_s']}s ({stats['rows_per_s']} rows/s)")
+    return stats
+
+
+def require_fresh(context: str = "") -> bool:
+    """For scripts that only need the online store to be current: report, never materialize"""
+    try:
+        fresh, detail = check_freshness()
+    except FileNotFoundError as e:
+        print(f"⚠️  FEAST: {e}")
+        return False
+    if fresh:
+        print(f"✅ FEAST: online store is current (materialized up to {detail['marker']['end_date']})")
+    else:
+        print("⚠️  FEAST: online store is stale - run python -m src.data.materialize_features"
+              + (f" before {context}" if context else ""))
+    return fresh
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize IVF features to the Feast online store")
+    parser.add_argument("--force", action="store_true", help="materialize even if the store is current")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--chunk-rows", type=int, default=WRITE_CHUNK_ROWS)
+    args = parser.parse_args()
+    stats = materialize(force=args.force, workers=args.workers, chunk_rows=args.chunk_rows)
+    if stats["skipped"]:
+        # Shown as "skipped" in Airflow rather than a no-op success
+        sys.exit(SKIP_EXIT_CODE)
@@ -1,29 +1,171 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
 import pandas as pd
 import sqlalchemy as sa
-from urllib.parse import quote_plus
-import os
 
-DB_HOST = "localhost"
-DB_PORT = 3306
-DB_NAME = "ivf_trigger_db"
-DB_USER = "root"
-DB_PASSWORD = "Chaithu@143"
+try:
+    from src.data.bulk_load import NATURAL_KEY
+    from src.data.db import get_engine
+except ImportError:  # run as a script: python src/data/pull_mysql_to_csv.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.data.bulk_load import NATURAL_KEY
+    from src.data.db import get_engine
 
 TABLE_NAME = "ivf_trigger_data"  # <== change if your table name is different
 
-RAW_PATH = os.path.join("data", "raw", "ivf_from_mysql.csv")
+# Each run fetches rows with last cutoff - SAFETY_LAG_S <= WATERMARK_COL <
+# this run's cutoff, the database clock when the run starts; a row stamped
+# in the same second as a cutoff is therefore exported by the next run, not
+# skipped. The lag re-reads the tail of the previous window, where a
+# transaction that stamped its rows before the cutoff but committed after
+# it lands; re-read rows already exported (same (patient_id, day) and
+# ingested_at, remembered in the state) are dropped.
+# Without that column the whole table is exported every run and replaces
+# the previous parts, so readers never see two copies of a row.
+#
+# The parts are an append-only change log: a row changed by an upsert gets
+# a new ingested_at and is exported again by a later run. Readers keep the
+# latest copy per (patient_id, day) by ingested_at (latest wins), as
+# src/preprocessing/incremental_preprocess.read_dataset() does
+WATERMARK_COL = os.environ.get("IVF_PULL_WATERMARK_COL", "ingested_at")
+SAFETY_LAG_S = int(os.environ.get("IVF_PULL_SAFETY_LAG_S", "60"))
+CHUNK_SIZE = 50_000
 
+EXPORT_DIR = os.path.join("data", "raw", "ivf_from_mysql")
+STATE_PATH = os.path.join("data", "raw", "ivf_from_mysql_state.json")
+
+
+def load_state() -> dict:
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: dict):
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, default=str)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def overlap_start(cutoff):
+    """Start of the window the run after `cutoff` re-reads"""
+    return (pd.Timestamp(cutoff) - pd.Timedelta(seconds=SAFETY_LAG_S)).to_pydatetime()
+
+
+def row_keys(chunk: pd.DataFrame) -> tuple:
+    """("patient_id|day|ingested_at" per row, ingested_at per row)"""
+    stamps = pd.to_datetime(chunk[WATERMARK_COL], format="ISO8601")
+    keys = chunk[NATURAL_KEY[0]].astype(str)
+    for col in NATURAL_KEY[1:]:
+        keys = keys + "|" + pd.to_numeric(chunk[col]).astype("int64").astype(str)
+    keys = keys + "|" + stamps.dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return keys, stamps
 
-def main():
-    url = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    engine = sa.create_engine(url)
 
-    query = f"SELECT * FROM {ivf_trigger_data};"
-    df = pd.read_sql(query, engine)
+def build_query(conn, state: dict):
+    """
+    SELECT for this run and its exclusive upper bound (None: full export).
+    The bound is the database clock, fixed before reading, so rows inserted
+    during the export or later in the same second land in the next run.
+    """
+    columns = {c["name"] for c in sa.inspect(conn).get_columns(TABLE_NAME)}
+    if WATERMARK_COL not in columns:
+        print(f"⚠️  {TABLE_NAME} has no '{WATERMARK_COL}' column - exporting the full table")
+        return sa.text(f"SELECT * FROM {TABLE_NAME}"), {}, None
 
-    os.makedirs(os.path.dirname(RAW_PATH), exist_ok=True)
-    df.to_csv(RAW_PATH, index=False)
-    print(f"Wrote {len(df)} rows to {RAW_PATH}")
+    cutoff = conn.execute(sa.text("SELECT CURRENT_TIMESTAMP")).scalar()
+    where = f"{WATERMARK_COL} < :cutoff"
+    params = {"cutoff": cutoff}
+    if state.get("exported_before") is not None:
+        where = f"{WATERMARK_COL} >= :overlap_start AND " + where
+        params["overlap_start"] = overlap_start(state["exported_before"])
+    elif state.get("high_water_mark") is not None:
+        # State from before cutoffs: everything up to and including the old max was exported
+        where = f"{WATERMARK_COL} > :last_mark AND " + where
+        params["last_mark"] = state["high_water_mark"]
+    query = sa.text(f"SELECT * FROM {TABLE_NAME} WHERE {where} ORDER BY {WATERMARK_COL}")
+    return query, params, cutoff
+
+
+def write_part(chunk: pd.DataFrame, run_id: str, part: int) -> str:
+    # Same numeric dtype in every part: a chunk with NULLs would be float64,
+    # one without would be int64, and the parts could not be read together
+    numeric = chunk.select_dtypes(include="number").columns
+    chunk = chunk.astype({col: "float64" for col in numeric})
+    path = os.path.join(EXPORT_DIR, f"part-{run_id}-{part:05d}.parquet")
+    chunk.to_parquet(path, index=False)
+    return path
+
+
+def remove_previous_parts(keep: list) -> int:
+    """Delete part files not written by this run; returns how many were removed"""
+    keep = {os.path.abspath(p) for p in keep}
+    removed = 0
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.abspath(os.path.join(EXPORT_DIR, name))
+        if name.startswith("part-") and name.endswith(".parquet") and path not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def export_new_rows(engine) -> dict:
+    state = load_state()
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+
+    rows = 0
+    reread = 0
+    parts = []
+    exported = set(state.get("overlap_keys", []))
+    overlap_keys = []
+    # stream_results -> server-side cursor, so only one chunk is in memory
+    with engine.connect().execution_options(stream_results=True) as conn:
+        query, params, cutoff = build_query(conn, state)
+        next_start = overlap_start(cutoff) if cutoff is not None else None
+        for part, chunk in enumerate(pd.read_sql(query, conn, params=params, chunksize=CHUNK_SIZE)):
+            if cutoff is not None and not chunk.empty:
+                keys, stamps = row_keys(chunk)
+                fresh = ~keys.isin(exported).to_numpy()
+                reread += int((~fresh).sum())
+                chunk = chunk[fresh]
+                # Due to be re-read by the next run: remember them to drop then
+                overlap_keys.extend(keys[fresh & (stamps >= next_start).to_numpy()])
+            if chunk.empty:
+                continue
+            parts.append(write_part(chunk, run_id, part))
+            rows += len(chunk)
+
+    replaced = 0
+    if cutoff is None:
+        # Full export: the new parts are the whole table, drop the old copy
+        replaced = remove_previous_parts(keep=parts)
+        state.pop("overlap_keys", None)
+    else:
+        state.pop("high_water_mark", None)
+        state["exported_before"] = cutoff
+        # Rows exported earlier can still fall inside the next overlap
+        carried = [k for k in exported if pd.Timestamp(k.rsplit("|", 1)[1]) >= next_start]
+        state["overlap_keys"] = sorted(set(carried).union(overlap_keys))
+    state["last_run"] = run_id
+    state["last_run_rows"] = rows
+    save_state(state)
+    return {"rows": rows, "parts": parts, "replaced_parts": replaced, "reread_rows": reread,
+            "exported_before": state.get("exported_before")}
+
+
+def main():
+    result = export_new_rows(get_engine())
+    print(
+        f"Wrote {result['rows']} new rows in {len(result['parts'])} part files to {EXPORT_DIR} "
+        f"(exported before: {result['exported_before']}, replaced parts: {result['replaced_parts']}, "
+        f"already exported in the overlap: {result['reread_rows']})"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+"""
+Managed, versioned schema for the IVF MySQL tables.
+
+Replaces the layout pandas' to_sql inferred (TEXT / DOUBLE / BIGINT, no
+keys) with compact typed columns, a (patient_id, day) primary key and an
+index on ingested_at for incremental pulls. Migrations are applied in
+order and recorded in ivf_schema_version.
+
+Run from the project root:
+    python -m src.data.schema status
+    python -m src.data.schema migrate
+    python -m src.data.schema partition --table ivf_trigger_data   (MySQL only)
+"""
+import argparse
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from src.data.bulk_load import bulk_load
+from src.data.db import get_engine
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+RAW_TABLE = "ivf_trigger_data"
+CLEAN_TABLE = "ivf_trigger_data_clean"
+VERSION_TABLE = "ivf_schema_version"
+LEGACY_SUFFIX = "__legacy"
+MIGRATION_CHUNK_SIZE = 50_000
+
+# Compact types on MySQL, portable equivalents elsewhere (SQLite stand-in)
+TINYINT = sa.SmallInteger().with_variant(mysql.TINYINT(), "mysql")
+SMALLINT = sa.SmallInteger()
+REAL = sa.Float().with_variant(mysql.FLOAT(), "mysql")
+BAND = sa.String(8)
+
+
+def _measurement_columns():
+    return [
+        sa.Column("patient_id", sa.String(16), primary_key=True),
+        sa.Column("day", TINYINT, primary_key=True),
+        sa.Column("age", SMALLINT),
+        sa.Column("amh_ng_ml", REAL),
+        sa.Column("avg_follicle_size_mm", REAL),
+        sa.Column("follicle_count", SMALLINT),
+        sa.Column("estradiol_pg_ml", REAL),
+        sa.Column("progesterone_ng_ml", REAL),
+        sa.Column("trigger_recommended", TINYINT),
+        # Re-stamped when an upsert changes the row (MySQL: ON UPDATE, added by
+        # migration 2; elsewhere bulk_load's upsert sets it), so corrected rows
+        # reach incremental pulls and the retrain trigger's new-row count
+        sa.Column(
+            "ingested_at", sa.DateTime, nullable=False, server_default=sa.func.current_timestamp()
+        ),
+    ]
+
+
+metadata = sa.MetaData()
+
+raw_table = sa.Table(
+    RAW_TABLE,
+    metadata,
+    *_measurement_columns(),
+    sa.Index(f"ix_{RAW_TABLE}_ingested_at", "ingested_at"),
+)
+
+clean_table = sa.Table(
+    CLEAN_TABLE,
+    metadata,
+    *_measurement_columns(),
+    sa.Column("age_group", BAND),
+    sa.Column("amh_group", BAND),
+    sa.Column("follicle_size_band", BAND),
+    sa.Column("follicle_size_12_19", TINYINT),
+    sa.Column("high_follicle_count", TINYINT),
+    sa.Column("high_e2", TINYINT),
+    sa.Column("high_p4", TINYINT),
+    sa.Column("late_cycle", TINYINT),
+    sa.Index(f"ix_{CLEAN_TABLE}_ingested_at", "ingested_at"),
+)
+
+version_table = sa.Table(
+    VERSION_TABLE,
+    metadata,
+    sa.Column("version", sa.Integer, primary_key=True),
+    sa.Column("description", sa.String(255), nullable=False),
+    sa.Column("applied_at", sa.DateTime, nullable=False),
+)
+
+
+# ===================================================================
+# MIGRATIONS
+# ===================================================================
+def _has_primary_key(conn, table_name: str) -> bool:
+    return bool(sa.inspect(conn).get_pk_constraint(table_name).get("constrained_columns"))
+
+
+def _migrate_table(engine, table: sa.Table):
+    """
+    Create `table` in the managed layout. A legacy to_sql table with the
+    same name is kept as <name>__legacy and its rows are copied across in
+    chunks; duplicate (patient_id, day) rows collapse to the last one.
+    """
+    with engine.begin() as conn:
+        inspector = sa.inspect(conn)
+        if not inspector.has_table(table.name):
+            table.create(conn)
+            print(f"   created {table.name}")
+            return
+        if _has_primary_key(conn, table.name):
+            print(f"   {table.name} already managed")
+            return
+        legacy_name = table.name + LEGACY_SUFFIX
+        conn.execute(sa.text(f"ALTER TABLE {table.name} RENAME TO {legacy_name}"))
+        table.create(conn)
+
+    copied = 0
+    legacy_cols = {c["name"] for c in sa.inspect(engine).get_columns(legacy_name)}
+    select_cols = ", ".join(c.name for c in table.columns if c.name in legacy_cols)
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(
+            sa.text(f"SELECT {select_cols} FROM {legacy_name}"), conn, chunksize=MIGRATION_CHUNK_SIZE
+        ):
+            copied += bulk_load(chunk, engine, table.name, mode="upsert")["rows"]
+    print(f"   migrated {copied} rows {legacy_name} -> {table.name} (legacy table kept)")
+
+
+def migration_1_managed_tables(engine):
+    for table in (raw_table, clean_table):
+        _migrate_table(engine, table)
+
+
+def migration_2_restamp_on_update(engine):
+    if engine.dialect.name != "mysql":
+        print("   nothing to alter: bulk_load's upsert re-stamps ingested_at on this database")
+        return
+    with engine.begin() as conn:
+        for table in (raw_table, clean_table):
+            # MySQL compares the stored values, so an identical reload keeps the old stamp
+            conn.execute(sa.text(
+                f"ALTER TABLE {table.name} MODIFY ingested_at DATETIME NOT NULL "
+                f"DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+            ))
+            print(f"   {table.name}.ingested_at now refreshed on update")
+
+
+MIGRATIONS = [
+    (1, "typed columns, (patient_id, day) primary key, ingested_at index", migration_1_managed_tables),
+    (2, "re-stamp ingested_at when an upsert changes a row", migration_2_restamp_on_update),
+]
+
+
+def current_version(engine) -> int:
+    with engine.connect() as conn:
+        if not sa.inspect(conn).has_table(VERSION_TABLE):
+            return 0
+        return conn.execute(sa.select(sa.func.max(version_table.c.version))).scalar() or 0
+
+
+def migrate(engine=None) -> int:
+    """Apply pending migrations in order; returns the resulting version"""
+    engine = engine or get_engine()
+    version_table.create(engine, checkfirst=True)
+    version = current_version(engine)
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Applying schema migration {number}: {description}")
+        apply(engine)
+        with engine.begin() as conn:
+            conn.execute(version_table.insert().values(
+                version=number,
+                description=description,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            ))
+        version = number
+    print(f"Schema at version {version}")
+    return version
+
+
+# ===================================================================
+# OPTIONAL RANGE PARTITIONING (MySQL)
+# ===================================================================
+def partition_by_month(engine, table_name: str, first_month: date, months: int = 24):
+    """
+    Range-partition a managed table by month of ingested_at.
+
+    MySQL requires the partitioning column in every unique key, so the
+    primary key becomes (patient_id, day, ingested_at) and no unique key on
+    (patient_id, day) can exist; ON DUPLICATE KEY UPDATE would then insert
+    a second copy of every reloaded row. bulk_load detects the partitioned
+    table and upserts by deleting and re-inserting the changed keys in one
+    transaction instead, which costs an extra read and delete per batch:
+    only partition tables large enough for pruning to pay for that.
+    """
+    if engine.dialect.name != "mysql":
+        raise NotImplementedError("Range partitioning is only supported on MySQL")
+
+    bounds = []
+    year, month = first_month.year, first_month.month
+    for _ in range(months):
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+        bounds.append(date(year, month, 1))
+
+    partitions = ",\n".join(
+        f"  PARTITION p{bound:%Y%m} VALUES LESS THAN (TO_DAYS('{bound:%Y-%m-%d}'))"
+        for bound in bounds
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            f"ALTER TABLE {table_name} DROP PRIMARY KEY, "
+            f"ADD PRIMARY KEY (patient_id, day, ingested_at)"
+        ))
+        conn.execute(sa.text(
+            f"ALTER TABLE {table_name} PARTITION BY RANGE (TO_DAYS(ingested_at)) (\n"
+            f"{partitions},\n  PARTITION pmax VALUES LESS THAN MAXVALUE\n)"
+        ))
+    print(f"Partitioned {table_name} into {months} monthly ranges from {first_month:%Y-%m}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the IVF table schema")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    sub.add_parser("migrate")
+    part = sub.add_parser("partition")
+    part.add_argument("--table", default=RAW_TABLE)
+    part.add_argument("--first-month", default=date.today().replace(day=1).isoformat())
+    part.add_argument("--months", type=int, default=24)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "status":
+        print(f"Schema version {current_version(engine)} (latest {MIGRATIONS[-1][0]})")
+    elif args.command == "migrate":
+        migrate(engine)
+    else:
+        partition_by_month(engine, args.table, date.fromisoformat(args.first_month), args.months)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Streaming feature-drift monitor.
+
+At training time build_reference_profile() fixes bin edges per feature
+(training-set quantiles for numeric columns, the seen categories for
+categorical ones) and records the reference counts; mlflow_training.py
+logs it with every run as drift/reference_profile.json.
+
+In the API a DriftMonitor holds one integer count array per feature and
+adds each served row to it with a binary search over a handful of edges,
+so updates cost O(1) per row and no raw inputs are kept. PSI and a binned
+KS statistic against the reference are only computed when Prometheus
+scrapes the gauges.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from prometheus_client import Gauge, Histogram
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+REFERENCE_PROFILE_ARTIFACT = "drift/reference_profile.json"
+PROFILE_VERSION = 1
+N_BINS = 10
+PREDICTION_EDGES = [i / 10 for i in range(1, 10)]
+OTHER_CATEGORY = "__other__"
+EXCLUDED_COLUMNS = {"patient_id"}
+PSI_EPSILON = 1e-4  # smoothing for empty bins
+
+# Window for "current" traffic; the previous window is kept so the
+# statistics never start from an empty histogram right after a rotation
+WINDOW_S = int(os.environ.get("IVF_DRIFT_WINDOW_S", "3600"))
+MIN_ROWS = int(os.environ.get("IVF_DRIFT_MIN_ROWS", "50"))
+
+FEATURE_PSI = Gauge(
+    "ivf_feature_drift_psi",
+    "Population stability index of served inputs vs the training profile",
+    ["feature"],
+)
+FEATURE_KS = Gauge(
+    "ivf_feature_drift_ks",
+    "Binned Kolmogorov-Smirnov distance of served inputs vs the training profile",
+    ["feature"],
+)
+DRIFT_ROWS = Gauge(
+    "ivf_drift_window_rows",
+    "Served rows in the current drift comparison window",
+)
+PREDICTION_PROBABILITY = Histogram(
+    "ivf_prediction_probability",
+    "Predicted trigger probability of served rows",
+    ["model_version"],
+    buckets=PREDICTION_EDGES + [1.0],
+)
+
+
+# ===================================================================
+# REFERENCE PROFILE (training time)
+# ===================================================================
+def numeric_profile(values, n_bins: int = N_BINS, edges: list = None) -> dict:
+    values = pd.to_numeric(pd.Series(values), errors="coerce").dropna().to_numpy("float64")
+    if edges is None:
+        inner = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]) if len(values) else []
+        edges = sorted(set(float(e) for e in inner))
+    # len(edges) + 1 bins: (-inf, e0), [e0, e1), ..., [e_last, inf)
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return {"type": "numeric", "edges": list(edges), "counts": counts.tolist()}
+
+
+def categorical_profile(values) -> dict:
+    counts = pd.Series(values).dropna().astype(str).value_counts()
+    categories = sorted(counts.index)
+    return {
+        "type": "categorical",
+        "categories": categories,
+        "counts": [int(counts[c]) for c in categories] + [0],  # last bin: unseen categories
+    }
+
+
+def build_reference_profile(X: pd.DataFrame, proba=None, n_bins: int = N_BINS) -> dict:
+    """Fixed-bin reference histograms of the raw training features (and scores)"""
+    features = {}
+    for col in X.columns:
+        if col in EXCLUDED_COLUMNS:
+            continue
+        if pd.api.types.is_numeric_dtype(X[col]):
+            features[col] = numeric_profile(X[col], n_bins)
+        else:
+            features[col] = categorical_profile(X[col])
+    profile = {"version": PROFILE_VERSION, "n_rows": len(X), "features": features}
+    if proba is not None:
+        profile["prediction"] = numeric_profile(proba, edges=PREDICTION_EDGES)
+    return profile
+
+
+# ===================================================================
+# STATISTICS
+# ===================================================================
+def psi(reference, current) -> float:
+    ref = np.asarray(reference, dtype="float64")
+    cur = np.asarray(current, dtype="float64")
+    ref = np.clip(ref / max(ref.sum(), 1), PSI_EPSILON, None)
+    cur = np.clip(cur / max(cur.sum(), 1), PSI_EPSILON, None)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def binned_ks(reference, current) -> float:
+    """Max CDF gap over the shared bins (a lower bound on the exact KS statistic)"""
+    ref = np.cumsum(reference, dtype="float64")
+    cur = np.cumsum(current, dtype="float64")
+    if not ref[-1] or not cur[-1]:
+        return float("nan")
+    return float(np.max(np.abs(ref / ref[-1] - cur / cur[-1])))
+
+
+# ===================================================================
+# ONLINE MONITOR (serving time)
+# ===================================================================
+def observe_predictions(proba, model_version):
+    """Add served scores to the prediction-probability histogram"""
+    child = PREDICTION_PROBABILITY.labels(model_version=str(model_version))
+    for p in np.atleast_1d(proba):
+        child.observe(float(p))
+
+
+class DriftMonitor:
+    """Windowed fixed-bin histograms of served inputs, compared to a reference profile"""
+
+    def __init__(self, profile: dict, window_s: int = WINDOW_S, min_rows: int = MIN_ROWS):
+        self.profile = profile
+        self.window_s = window_s
+        self.min_rows = min_rows
+        self.features = profile.get("features", {})
+        self._category_index = {
+            col: {c: i for i, c in enumerate(spec["categories"])}
+            for col, spec in self.features.items() if spec["type"] == "categorical"
+        }
+        self._lock = threading.Lock()
+        self._previous = self._empty()
+        self._current = self._empty()
+        self._window_start = time.monotonic()
+
+    def _empty(self) -> dict:
+        counts = {col: np.zeros(len(spec["counts"]), dtype=np.int64) for col, spec in self.features.items()}
+        counts["__rows__"] = 0
+        return counts
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self._window_start >= self.window_s:
+            self._previous, self._current = self._current, self._empty()
+            self._window_start = now
+
+    # ---------------------------------------------------------------
+    # Updates
+    # ---------------------------------------------------------------
+    def update_record(self, record: dict):
+        """Add one served row; one bisect (or dict lookup) per feature"""
+        with self._lock:
+            self._rotate()
+            current = self._current
+            current["__rows__"] += 1
+            for col, spec in self.features.items():
+                value = record.get(col)
+                if value is None or (isinstance(value, float) and math.isnan(value)):
+                    continue
+                if spec["type"] == "numeric":
+                    try:
+                        current[col][bisect.bisect_right(spec["edges"], float(value))] += 1
+                    except (TypeError, ValueError):
+                        continue
+                else:
+                    index = self._category_index[col]
+                    current[col][index.get(str(value), len(index))] += 1
+
+    def update_frame(self, df: pd.DataFrame):
+        """Add a batch of served rows with one vectorized binning per feature"""
+        binned = {}
+        for col, spec in self.features.items():
+            if col not in df.columns:
+                continue
+            if spec["type"] == "numeric":
+                values = pd.to_numeric(df[col], errors="coerce").to_numpy("float64")
+                values = values[~np.isnan(values)]
+                bins = np.searchsorted(spec["edges"], values, side="right")
+            else:
+                index = self._category_index[col]
+                values = df[col].dropna().astype(str)
+                bins = values.map(index).fillna(len(index)).to_numpy(np.int64)
+            binned[col] = np.bincount(bins, minlength=len(spec["counts"]))
+        with self._lock:
+            self._rotate()
+            self._current["__rows__"] += len(df)
+            for col, counts in binned.items():
+                self._current[col] += counts
+
+    # ---------------------------------------------------------------
+    # Statistics (computed on scrape)
+    # ---------------------------------------------------------------
+    def window_counts(self, col: str) -> np.ndarray:
+        with self._lock:
+            return self._previous[col] + self._current[col]
+
+    def window_rows(self) -> int:
+        with self._lock:
+            return self._previous["__rows__"] + self._current["__rows__"]
+
+    def feature_psi(self, col: str) -> float:
+        counts = self.window_counts(col)
+        if counts.sum() < self.min_rows:
+            return float("nan")
+        return psi(self.features[col]["counts"], counts)
+
+    def feature_ks(self, col: str) -> float:
+        counts = self.window_counts(col)
+        if counts.sum() < self.min_rows:
+            return float("nan")
+        return binned_ks(self.features[col]["counts"], counts)
+
+    def summary(self) -> dict:
+        return {
+            col: {"psi": self.feature_psi(col), "ks": self.feature_ks(col)}
+            for col in self.features
+        }
+
+    def bind_metrics(self):
+        """Point the Prometheus gauges at this monitor (evaluated lazily on scrape)"""
+        for col in self.features:
+            FEATURE_PSI.labels(feature=col).set_function(lambda col=col: self.feature_psi(col))
+            FEATURE_KS.labels(feature=col).set_function(lambda col=col: self.feature_ks(col))
+        DRIFT_ROWS.set_function(self.window_rows)
+        return self
@@ -0,0 +1,254 @@
+"""
+Online model quality from delayed outcome labels.
+
+True trigger outcomes arrive days after the prediction. PredictionIndex
+keeps the latest logged prediction per (patient_id, day), built
+incrementally from completed prediction-log files (only files it has not
+read yet are scanned). QualityTracker joins each incoming label to its
+prediction and updates, per model version, confusion-matrix counts and
+positive/negative score histograms in daily buckets, kept sorted by day
+and expired by wall clock once they fall out of the rolling window. ROC AUC over the
+rolling window is computed from the histograms on scrape, so a label
+costs O(1) and nothing is ever rescanned.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pyarrow.parquet as pq
+from prometheus_client import Counter, Gauge
+
+from src.serving.prediction_log import LOG_DIR, list_log_files
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+SCORE_BINS = 100
+THRESHOLD = 0.5                  # same cut-off the API uses for pred_trigger_recommended
+WINDOW_DAYS = int(os.environ.get("IVF_QUALITY_WINDOW_DAYS", "30"))
+RETENTION_DAYS = int(os.environ.get("IVF_OUTCOME_RETENTION_DAYS", "60"))
+BUCKET_S = 86400
+CELLS = ("tp", "fp", "tn", "fn")
+
+OUTCOME_LABELS = Counter(
+    "ivf_outcome_labels_total",
+    "Delayed outcome labels received",
+    ["result"],  # joined | unmatched | duplicate
+)
+QUALITY_CONFUSION = Gauge(
+    "ivf_model_quality_confusion",
+    "Confusion-matrix counts over the rolling outcome window",
+    ["model_version", "cell"],
+)
+QUALITY_ROC_AUC = Gauge(
+    "ivf_model_quality_roc_auc",
+    "Binned ROC AUC over the rolling outcome window",
+    ["model_version"],
+)
+QUALITY_ACCURACY = Gauge(
+    "ivf_model_quality_accuracy",
+    "Accuracy over the rolling outcome window",
+    ["model_version"],
+)
+QUALITY_LABELED = Gauge(
+    "ivf_model_quality_labeled_rows",
+    "Labeled predictions in the rolling outcome window",
+    ["model_version"],
+)
+
+
+def binned_auc(pos_hist: np.ndarray, neg_hist: np.ndarray) -> float:
+    """P(score_pos > score_neg), ties within a bin counted as 1/2"""
+    n_pos, n_neg = pos_hist.sum(), neg_hist.sum()
+    if not n_pos or not n_neg:
+        return float("nan")
+    neg_below = np.cumsum(neg_hist) - neg_hist
+    wins = np.sum(pos_hist * neg_below) + 0.5 * np.sum(pos_hist * neg_hist)
+    return float(wins / (n_pos * n_neg))
+
+
+def _or_nan(value):
+    return float("nan") if value is None else value
+
+
+class PredictionIndex:
+    """Latest logged prediction per (patient_id, day), loaded file by file"""
+
+    def __init__(self, log_dir: str = LOG_DIR, retention_days: int = RETENTION_DAYS):
+        self.log_dir = log_dir
+        self.retention_s = retention_days * 86400
+        self._entries = OrderedDict()   # key -> (logged_at_s, model_version, proba)
+        self._labeled = OrderedDict()   # key -> logged_at_s of predictions already labeled
+        self._seen_files = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def refresh(self) -> int:
+        """Read completed log files not seen before; returns rows indexed"""
+        added = 0
+        for path in list_log_files(self.log_dir):
+            if path in self._seen_files:
+                continue
+            table = pq.read_table(path, columns=[
+                "logged_at", "patient_id", "day", "model_version", "pred_trigger_probability",
+            ]).to_pydict()
+            for logged_at, patient_id, day, version, proba in zip(
+                table["logged_at"], table["patient_id"], table["day"],
+                table["model_version"], table["pred_trigger_probability"],
+            ):
+                if proba is None or patient_id is None or day is None:
+                    continue
+                key = (str(patient_id), int(day))
+                self._entries.pop(key, None)
+                self._entries[key] = (logged_at.timestamp(), version, float(proba))
+                added += 1
+            self._seen_files.add(path)
+        if added:
+            self._prune()
+        return added
+
+    def _prune(self):
+        # Files are read oldest first, so the OrderedDict is roughly time-ordered
+        cutoff = time.time() - self.retention_s
+        while self._entries:
+            key, (logged_at, _, _) = next(iter(self._entries.items()))
+            if logged_at >= cutoff:
+                break
+            self._entries.popitem(last=False)
+        while self._labeled and next(iter(self._labeled.values())) < cutoff:
+            self._labeled.popitem(last=False)
+
+    def pop(self, patient_id, day):
+        """Remove and return (logged_at_s, model_version, proba) so a label is only counted once"""
+        key = (str(patient_id), int(day))
+        hit = self._entries.pop(key, None)
+        if hit is not None:
+            self._labeled[key] = hit[0]
+        return hit
+
+    def was_labeled(self, patient_id, day) -> bool:
+        return (str(patient_id), int(day)) in self._labeled
+
+
+class _Bucket:
+    __slots__ = ("start", "confusion", "pos", "neg")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.confusion = dict.fromkeys(CELLS, 0)
+        self.pos = np.zeros(SCORE_BINS, dtype=np.int64)
+        self.neg = np.zeros(SCORE_BINS, dtype=np.int64)
+
+
+class QualityTracker:
+    """Streaming confusion matrix and binned ROC AUC per model version"""
+
+    def __init__(self, index: PredictionIndex = None, window_days: int = WINDOW_DAYS):
+        self.index = index or PredictionIndex()
+        self.window_s = window_days * BUCKET_S
+        self._buckets = {}                # model_version -> list of _Bucket, sorted by start
+        self._lock = threading.Lock()
+
+    def ingest(self, outcomes: list) -> dict:
+        """Join [{patient_id, day, trigger_outcome}, ...] to logged predictions"""
+        summary = {"joined": 0, "unmatched": 0, "duplicate": 0}
+        with self._lock:
+            pending = []
+            for outcome in outcomes:
+                hit = self.index.pop(outcome["patient_id"], outcome["day"])
+                if hit is None:
+                    pending.append(outcome)
+                else:
+                    self._add(hit, int(outcome["trigger_outcome"]))
+                    summary["joined"] += 1
+            # Only go to disk when something did not match the in-memory index
+            if pending and self.index.refresh():
+                still = []
+                for outcome in pending:
+                    hit = self.index.pop(outcome["patient_id"], outcome["day"])
+                    if hit is None:
+                        still.append(outcome)
+                    else:
+                        self._add(hit, int(outcome["trigger_outcome"]))
+                        summary["joined"] += 1
+                pending = still
+            duplicates = sum(self.index.was_labeled(o["patient_id"], o["day"]) for o in pending)
+            summary["duplicate"] = duplicates
+            summary["unmatched"] = len(pending) - duplicates
+        for result, count in summary.items():
+            if count:
+                OUTCOME_LABELS.labels(result=result).inc(count)
+        return summary
+
+    def _add(self, hit, label: int):
+        logged_at, version, proba = hit
+        version = str(version)
+        start = int(logged_at // BUCKET_S) * BUCKET_S
+        if version not in self._buckets:
+            self._buckets[version] = []
+            self._bind_metrics(version)
+        buckets = self._buckets[version]
+        self._evict(buckets)
+        if start + BUCKET_S <= time.time() - self.window_s:
+            return  # predicted before the window; its bucket would expire at once
+        # Late labels for an older day land in that day's bucket, created in place if needed
+        i = bisect.bisect_left(buckets, start, key=lambda b: b.start)
+        if i == len(buckets) or buckets[i].start != start:
+            buckets.insert(i, _Bucket(start))
+        bucket = buckets[i]
+
+        pred = proba > THRESHOLD
+        cell = ("tp" if pred else "fn") if label else ("fp" if pred else "tn")
+        bucket.confusion[cell] += 1
+        score_bin = min(int(proba * SCORE_BINS), SCORE_BINS - 1)
+        (bucket.pos if label else bucket.neg)[score_bin] += 1
+
+    def _evict(self, buckets: list):
+        """Drop days that ended before the rolling window, by wall clock"""
+        cutoff = time.time() - self.window_s
+        expired = 0
+        while expired < len(buckets) and buckets[expired].start + BUCKET_S <= cutoff:
+            expired += 1
+        del buckets[:expired]
+
+    # ---------------------------------------------------------------
+    # Window statistics (computed on scrape)
+    # ---------------------------------------------------------------
+    def window(self, version: str) -> dict:
+        with self._lock:
+            buckets = self._buckets.get(str(version), [])
+            self._evict(buckets)
+            buckets = list(buckets)
+        confusion = dict.fromkeys(CELLS, 0)
+        pos = np.zeros(SCORE_BINS, dtype=np.int64)
+        neg = np.zeros(SCORE_BINS, dtype=np.int64)
+        for b in buckets:
+            for cell in CELLS:
+                confusion[cell] += b.confusion[cell]
+            pos += b.pos
+            neg += b.neg
+        total = sum(confusion.values())
+        auc = binned_auc(pos, neg)
+        return {
+            "confusion": confusion,
+            "labeled": total,
+            "accuracy": (confusion["tp"] + confusion["tn"]) / total if total else None,
+            "roc_auc": None if np.isnan(auc) else auc,
+        }
+
+    def versions(self) -> list:
+        with self._lock:
+            return sorted(self._buckets, key=lambda v: int(v) if v.isdigit() else v)
+
+    def _bind_metrics(self, version: str):
+        for cell in CELLS:
+            QUALITY_CONFUSION.labels(model_version=version, cell=cell).set_function(
+                lambda cell=cell: self.window(version)["confusion"][cell]
+            )
+        QUALITY_ROC_AUC.labels(model_version=version).set_function(lambda: _or_nan(self.window(version)["roc_auc"]))
+        QUALITY_ACCURACY.labels(model_version=version).set_function(lambda: _or_nan(self.window(version)["accuracy"]))
+        QUALITY_LABELED.labels(model_version=version).set_function(lambda: self.window(version)["labeled"])
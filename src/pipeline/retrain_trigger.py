@@ -0,0 +1,259 @@
+"""
+Decide whether the retraining DAG should run at all.
+
+The DAG is scheduled often and starts with check_retrain(), which is
+cheap: one indexed COUNT(*) over ivf_trigger_data rows newer than the
+watermark of the last training, and one scrape of the API's drift gauges.
+Retraining starts only when
+
+  - at least MIN_NEW_ROWS rows arrived since the last training, or
+  - any feature's PSI / binned KS in the current drift window crosses
+    PSI_THRESHOLD / KS_THRESHOLD, or
+  - the last training is older than MAX_STALENESS_H (fallback), or
+  - nothing has been trained yet.
+
+Drift alone only counts when the window holds at least
+DRIFT_MIN_WINDOW_ROWS rows, the last training is at least
+DRIFT_COOLDOWN_H old, and the served model version is not the one a
+previous drift-triggered training already reacted to. Otherwise a model
+that registration rejects (or a window that stops rotating for lack of
+traffic) would retrain every hour.
+
+The watermark seen by the check is kept as "pending" and only becomes the
+trained watermark when mark_trained() runs at the end of a DAG run in
+which the train stage actually ran. A failed run, or one whose train stage
+was skipped (the rows had not reached the processed dataset yet), leaves
+it pending, so the same rows trigger the next run.
+
+Run from the project root:
+    python -m src.pipeline.retrain_trigger check   # last stdout line: JSON decision
+    python -m src.pipeline.retrain_trigger mark-trained
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import urllib.request
+from datetime import datetime, timezone
+
+try:
+    from src.pipeline.stage_cache import ARTIFACT_DIR, read_ref
+except ImportError:  # run as a script: python src/pipeline/retrain_trigger.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.pipeline.stage_cache import ARTIFACT_DIR, read_ref
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+STATE_PATH = os.path.join(ARTIFACT_DIR, "retrain_state.json")
+MIN_NEW_ROWS = int(os.environ.get("IVF_RETRAIN_MIN_NEW_ROWS", "500"))
+PSI_THRESHOLD = float(os.environ.get("IVF_RETRAIN_PSI", "0.2"))
+KS_THRESHOLD = float(os.environ.get("IVF_RETRAIN_KS", "0.2"))
+MAX_STALENESS_H = float(os.environ.get("IVF_RETRAIN_MAX_STALENESS_H", "168"))
+DRIFT_MIN_WINDOW_ROWS = int(os.environ.get("IVF_RETRAIN_DRIFT_MIN_ROWS", "200"))
+DRIFT_COOLDOWN_H = float(os.environ.get("IVF_RETRAIN_DRIFT_COOLDOWN_H", "24"))
+# Same target Prometheus scrapes (monitoring/prometheus.yml)
+DRIFT_METRICS_URL = os.environ.get("IVF_DRIFT_METRICS_URL", "http://host.docker.internal:8000/metrics")
+METRICS_TIMEOUT_S = 5
+
+
+def load_state() -> dict:
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: dict):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, default=str)
+    os.replace(tmp_path, STATE_PATH)
+
+
+# ===================================================================
+# SIGNALS
+# ===================================================================
+def count_new_rows(engine, since) -> tuple:
+    """(rows newer than since, newest watermark) in the source table"""
+    import sqlalchemy as sa
+
+    from src.data.pull_mysql_to_csv import TABLE_NAME, WATERMARK_COL
+
+    with engine.connect() as conn:
+        columns = {c["name"] for c in sa.inspect(conn).get_columns(TABLE_NAME)}
+        if WATERMARK_COL not in columns:
+            # No watermark column: compare total row counts instead
+            total = conn.execute(sa.text(f"SELECT COUNT(*) FROM {TABLE_NAME}")).scalar()
+            return total - int(since or 0), total
+        query = f"SELECT COUNT(*), MAX({WATERMARK_COL}) FROM {TABLE_NAME}"
+        params = {}
+        if since is not None:
+            query += f" WHERE {WATERMARK_COL} > :since"
+            params["since"] = since
+        rows, high_mark = conn.execute(sa.text(query), params).one()
+    return rows, high_mark if high_mark is not None else since
+
+
+def fetch_drift(url: str = DRIFT_METRICS_URL) -> dict:
+    """Latest PSI/KS per feature, window size and served model version from the API's /metrics"""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    with urllib.request.urlopen(url, timeout=METRICS_TIMEOUT_S) as response:
+        text = response.read().decode("utf-8")
+
+    drift = {"psi": {}, "ks": {}, "window_rows": 0, "model_version": None}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "ivf_feature_drift_psi":
+                drift["psi"][sample.labels["feature"]] = sample.value
+            elif sample.name == "ivf_feature_drift_ks":
+                drift["ks"][sample.labels["feature"]] = sample.value
+            elif sample.name == "ivf_drift_window_rows":
+                drift["window_rows"] = int(sample.value)
+            elif sample.name == "ivf_model_loaded_version":
+                drift["model_version"] = int(sample.value)
+    return drift
+
+
+def evaluate(state: dict, new_rows: int, drift, now: datetime) -> dict:
+    """Pure threshold logic; returns {"retrain": bool, "reasons": [...], ...}"""
+    reasons = []
+    last = state.get("last_trained")
+    staleness_h = None
+    if last is None:
+        reasons.append("no previous training recorded")
+    else:
+        staleness_h = (now - datetime.fromisoformat(last["trained_at"])).total_seconds() / 3600
+        if staleness_h >= MAX_STALENESS_H:
+            reasons.append(f"last training {staleness_h:.1f}h ago >= {MAX_STALENESS_H}h")
+
+    if new_rows >= MIN_NEW_ROWS:
+        reasons.append(f"{new_rows} new rows >= {MIN_NEW_ROWS}")
+
+    drifted = {}
+    drift_ignored = None
+    if drift is not None:
+        # NaN gauges mean the window is still too small to compare
+        for stat, threshold in (("psi", PSI_THRESHOLD), ("ks", KS_THRESHOLD)):
+            for feature, value in drift[stat].items():
+                if not math.isnan(value) and value >= threshold:
+                    drifted[f"{feature}:{stat}"] = round(value, 4)
+        if drifted:
+            reacted_to = (last or {}).get("drift_model_version")
+            if drift["window_rows"] < DRIFT_MIN_WINDOW_ROWS:
+                drift_ignored = f"window has {drift['window_rows']} rows < {DRIFT_MIN_WINDOW_ROWS}"
+            elif staleness_h is not None and staleness_h < DRIFT_COOLDOWN_H:
+                drift_ignored = f"last training {staleness_h:.1f}h ago < {DRIFT_COOLDOWN_H}h cooldown"
+            elif reacted_to is not None and drift["model_version"] == reacted_to:
+                # Still the model the last drift retrain started from: it was
+                # not replaced, so retraining again would repeat the same work
+                drift_ignored = f"model v{reacted_to} already retrained for drift"
+            else:
+                reasons.append(f"drift over threshold: {drifted}")
+
+    return {
+        "retrain": bool(reasons),
+        "reasons": reasons,
+        "new_rows": new_rows,
+        "drifted": drifted,
+        "drift_ignored": drift_ignored,
+        "drift_model_version": drift["model_version"] if drifted and drift_ignored is None else None,
+        "drift_available": drift is not None,
+        "staleness_h": None if staleness_h is None else round(staleness_h, 2),
+    }
+
+
+# ===================================================================
+# ENTRY POINTS
+# ===================================================================
+def check_retrain(engine=None, metrics_url: str = DRIFT_METRICS_URL, now: datetime = None) -> dict:
+    """Evaluate the thresholds and remember the watermark this decision saw"""
+    from src.data.db import get_engine
+
+    now = now or datetime.now(timezone.utc)
+    state = load_state()
+    since = (state.get("last_trained") or {}).get("watermark")
+    new_rows, high_mark = count_new_rows(engine or get_engine(), since)
+
+    try:
+        drift = fetch_drift(metrics_url)
+    except Exception as e:
+        # The API being down must not block (or force) retraining
+        print(f"⚠️  Drift metrics unavailable from {metrics_url}: {e}")
+        drift = None
+
+    decision = evaluate(state, new_rows, drift, now)
+    if decision["retrain"]:
+        state["pending"] = {
+            "watermark": high_mark,
+            "decided_at": now.isoformat(),
+            "reasons": decision["reasons"],
+            "drift_model_version": decision["drift_model_version"],
+        }
+    state["last_check"] = dict(decision, checked_at=now.isoformat())
+    save_state(state)
+
+    if decision["retrain"]:
+        print(f"▶️  Retraining: {'; '.join(decision['reasons'])}")
+    else:
+        drift_note = f"drift ignored ({decision['drift_ignored']})" if decision["drift_ignored"] \
+            else "no drift over threshold"
+        print(f"⏭️  No retraining: {new_rows} new rows, {drift_note}, "
+              f"last training {decision['staleness_h']}h ago")
+    return decision
+
+
+def train_ran_since(decided_at: str) -> bool:
+    """Whether the train stage ran (not skipped as cached) after the decision"""
+    ref = read_ref("train")
+    return (
+        ref is not None
+        and ref["result"] == "ran"
+        and datetime.fromisoformat(ref["updated_at"]) >= datetime.fromisoformat(decided_at)
+    )
+
+
+def mark_trained(now: datetime = None) -> dict:
+    """Promote the pending watermark once the DAG run has actually trained"""
+    state = load_state()
+    pending = state.get("pending")
+    if pending is None:
+        print("⚠️  No pending retraining decision - nothing to mark")
+        return state
+    now = now or datetime.now(timezone.utc)
+    if not train_ran_since(pending["decided_at"]):
+        state["last_skipped"] = {
+            "watermark": pending["watermark"],
+            "skipped_at": now.isoformat(),
+            "reasons": pending["reasons"],
+        }
+        save_state(state)
+        print(f"⏭️  Train stage did not run since {pending['decided_at']} - "
+              f"watermark {pending['watermark']} stays pending")
+        return state
+    del state["pending"]
+    state["last_trained"] = {
+        "watermark": pending["watermark"],
+        "trained_at": now.isoformat(),
+        "reasons": pending["reasons"],
+        "drift_model_version": pending.get("drift_model_version"),
+    }
+    save_state(state)
+    print(f"✅ Training watermark advanced to {pending['watermark']}")
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event-driven retraining trigger")
+    parser.add_argument("command", choices=["check", "mark-trained"])
+    args = parser.parse_args()
+
+    if args.command == "check":
+        decision = check_retrain()
+        # Last stdout line is the BashOperator's XCom value
+        print(json.dumps(decision, default=str))
+    else:
+        mark_trained()
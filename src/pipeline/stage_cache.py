@@ -0,0 +1,425 @@
+"""
+Fingerprint-and-skip wrapper for the retraining DAG stages.
+
+Each stage in STAGES declares the data it reads, its own source files,
+the environment settings that change its result, the upstream stages it
+consumes and the files it produces. Before the command runs, the stage
+fingerprint is computed as
+
+    sha256(stage, command, params, input/code file digests, upstream refs)
+
+If the artifact directory already holds a manifest for that fingerprint,
+the recorded outputs are restored from the content-addressed object store
+(objects/<sha256[:2]>/<sha256>) and the wrapper exits with SKIP_EXIT_CODE,
+which Airflow's BashOperator reports as a skipped task. Otherwise the
+command runs, its outputs are copied into the object store and a manifest
+is written. refs/<stage>.json always points at the latest outputs, so the
+next stage fingerprints exactly what it is handed.
+
+A stage that runs as several tasks (train: one per candidate) is gated
+with --check before the fan-out and closed with --record after the
+reduce task, using the fingerprint taken at the gate.
+
+Stages whose input cannot be known up front (pull: new rows in MySQL) use
+check="after": the command always runs and the stage is reported skipped
+when its outputs hash the same as the previous run.
+
+File digests are memoised on (size, mtime) so unchanged inputs are not
+re-read on every run.
+
+Run from the project root:
+    python -m src.pipeline.stage_cache <stage> [--force] -- <command ...>
+    python -m src.pipeline.stage_cache <stage> --check   # gate a fanned-out stage
+    python -m src.pipeline.stage_cache <stage> --record  # ... after its last task
+    python -m src.pipeline.stage_cache --status
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+ARTIFACT_DIR = os.environ.get("IVF_ARTIFACT_DIR", os.path.join("data", "artifacts"))
+CACHE_ENABLED = os.environ.get("IVF_STAGE_CACHE", "on") != "off"
+SKIP_EXIT_CODE = 99  # BashOperator's default skip_on_exit_code
+BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class StageSpec:
+    name: str
+    inputs: list = field(default_factory=list)    # data globs
+    code: list = field(default_factory=list)      # source globs; a code change invalidates the stage
+    params: list = field(default_factory=list)    # environment variables that change the result
+    upstream: list = field(default_factory=list)  # stages whose recorded outputs this one reads
+    outputs: list = field(default_factory=list)   # globs of produced files
+    check: str = "before"                         # "after": always run, skip if outputs are unchanged
+    store: bool = True                            # keep output bytes in the object store
+
+
+PROCESSED_CSV = "data/processed/ivf_trigger_preprocessed.csv"
+PROCESSED_PARTS = "data/processed/ivf_trigger_preprocessed_parts/**/*.parquet"
+FEAST_SOURCE = "feast/feature_repo/data/trigger_day_prediction/**/*.parquet"
+
+STAGES = {
+    spec.name: spec
+    for spec in [
+        # Raw parts are immutable and uniquely named, so they are hashed, not copied
+        StageSpec(
+            "pull",
+            code=["src/data/pull_mysql_to_csv.py", "src/data/db.py"],
+            outputs=["data/raw/ivf_from_mysql/*.parquet"],
+            check="after",
+            store=False,
+        ),
+        # New pulled rows become new processed parts, which is what lets
+        # validate and train see them; parts are append-only like the raw ones
+        StageSpec(
+            "preprocess",
+            code=["src/preprocessing/*.py", "src/validation/suite.py"],
+            upstream=["pull"],
+            outputs=[PROCESSED_PARTS],
+            store=False,
+        ),
+        StageSpec(
+            "validate",
+            inputs=[PROCESSED_CSV, PROCESSED_PARTS],
+            code=["ge_validate_ivf_preprocessed.py", "src/validation/*.py"],
+            upstream=["preprocess"],
+            outputs=["data/quality/ivf_trigger_ge_validation.json"],
+        ),
+        StageSpec(
+            "train",
+            inputs=[PROCESSED_CSV, PROCESSED_PARTS, FEAST_SOURCE],
+            code=["mlflow_training.py", "src/training/*.py", "src/monitoring/drift.py"],
+            params=["IVF_TRAINING_SOURCE", "MLFLOW_TRACKING_URI"],
+            upstream=["validate"],
+            outputs=["data/processed/training_winner.json"],
+        ),
+        StageSpec(
+            "register",
+            code=["register_best_model.py", "src/training/promotion.py"],
+            params=[
+                "MLFLOW_TRACKING_URI",
+                "IVF_MAX_P99_LATENCY_MS",
+                "IVF_MAX_MODEL_SIZE_MB",
+                "IVF_MAX_LOAD_TIME_S",
+                "IVF_MIN_AUC_GAIN",
+            ],
+            upstream=["train"],
+        ),
+    ]
+}
+
+
+# ===================================================================
+# HASHING
+# ===================================================================
+def _write_json(path: str, payload: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DigestCache:
+    """sha256 per path, reused while the file's size and mtime are unchanged"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(ARTIFACT_DIR, "digests.json")
+        self.entries = _read_json(self.path) or {}
+        self.dirty = False
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        entry = self.entries.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = file_sha256(path)
+        self.entries[path] = [st.st_size, st.st_mtime_ns, digest]
+        self.dirty = True
+        return digest
+
+    def save(self):
+        if self.dirty:
+            _write_json(self.path, self.entries)
+            self.dirty = False
+
+
+def expand(patterns: list) -> list:
+    paths = set()
+    for pattern in patterns:
+        paths.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(p.replace(os.sep, "/") for p in paths)
+
+
+def digest_files(patterns: list, digests: DigestCache) -> dict:
+    return {path: digests.digest(path) for path in expand(patterns)}
+
+
+# ===================================================================
+# ARTIFACT STORE
+# ===================================================================
+def object_path(digest: str) -> str:
+    return os.path.join(ARTIFACT_DIR, "objects", digest[:2], digest)
+
+
+def manifest_path(stage: str, fp: str) -> str:
+    return os.path.join(ARTIFACT_DIR, "stages", stage, f"{fp}.json")
+
+
+def ref_path(stage: str) -> str:
+    return os.path.join(ARTIFACT_DIR, "refs", f"{stage}.json")
+
+
+def read_ref(stage: str):
+    return _read_json(ref_path(stage))
+
+
+def put_object(path: str, digest: str):
+    target = object_path(digest)
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + ".tmp"
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def restore_outputs(outputs: dict, digests: DigestCache) -> bool:
+    """Put recorded outputs back in place; False if any can't be restored"""
+    for path, digest in outputs.items():
+        if os.path.exists(path) and digests.digest(path) == digest:
+            continue
+        source = object_path(digest)
+        if not os.path.exists(source):
+            return False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+        print(f"   ↩️  restored {path} from {digest[:12]}")
+    return True
+
+
+def fingerprint(spec: StageSpec, command: list, files: dict) -> tuple:
+    upstream = {}
+    for name in spec.upstream:
+        ref = read_ref(name)
+        upstream[name] = ref and {"fingerprint": ref["fingerprint"], "outputs": ref["outputs"]}
+    payload = {
+        "stage": spec.name,
+        "command": command,
+        "params": {name: os.environ.get(name) for name in spec.params},
+        "files": files,
+        "upstream": upstream,
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest(), payload
+
+
+def record(spec: StageSpec, fp: str, payload: dict, outputs: dict, result: str, duration_s: float,
+           cache: bool = True):
+    """Point refs/<stage> at the outputs; cache=False leaves no manifest, so the next run re-runs"""
+    now = datetime.now(timezone.utc).isoformat()
+    if result == "ran" and cache:
+        _write_json(manifest_path(spec.name, fp), {
+            "stage": spec.name,
+            "fingerprint": fp,
+            "created_at": now,
+            "duration_s": round(duration_s, 3),
+            "inputs": payload,
+            "outputs": outputs,
+        })
+    _write_json(ref_path(spec.name), {
+        "fingerprint": fp,
+        "outputs": outputs,
+        "result": result,
+        "updated_at": now,
+    })
+
+
+# ===================================================================
+# RUN
+# ===================================================================
+def pending_path(stage: str) -> str:
+    return os.path.join(ARTIFACT_DIR, "refs", f"{stage}.pending.json")
+
+
+def _check(spec: StageSpec, command: list, digests: DigestCache, use_cache: bool):
+    """(fingerprint, payload, skipped) for a check="before" stage"""
+    fp, payload = fingerprint(spec, command, digest_files(spec.inputs + spec.code, digests))
+    manifest = _read_json(manifest_path(spec.name, fp)) if use_cache else None
+    if manifest is not None and restore_outputs(manifest["outputs"], digests):
+        record(spec, fp, payload, manifest["outputs"], "skipped", 0.0)
+        print(f"⏭️  {spec.name}: inputs unchanged (fingerprint {fp[:12]}, produced "
+              f"{manifest['created_at']} in {manifest['duration_s']}s) - skipping")
+        return fp, payload, True
+    return fp, payload, False
+
+
+def _collect(spec: StageSpec, digests: DigestCache) -> dict:
+    outputs = digest_files(spec.outputs, digests)
+    if spec.store:
+        for path, digest in outputs.items():
+            put_object(path, digest)
+    return outputs
+
+
+def run_stage(name: str, command: list, force: bool = False, runner=None) -> int:
+    """
+    Run (or skip) one stage; returns the process exit code for the DAG task.
+    runner() runs the command in-process instead of as a subprocess (src/cli.py).
+    """
+    spec = STAGES[name]
+    digests = DigestCache()
+    use_cache = CACHE_ENABLED and not force
+
+    try:
+        if spec.check == "before":
+            fp, payload, skipped = _check(spec, command, digests, use_cache)
+            if skipped:
+                return SKIP_EXIT_CODE
+            print(f"▶️  {name}: fingerprint {fp[:12]} not cached - running {' '.join(command)}")
+
+        start = time.perf_counter()
+        returncode = runner() if runner is not None else subprocess.call(command)
+        duration_s = time.perf_counter() - start
+        if returncode != 0:
+            print(f"❌ {name}: exited with {returncode} - nothing recorded")
+            return returncode
+
+        outputs = _collect(spec, digests)
+        if spec.check == "after":
+            fp, payload = fingerprint(spec, command, dict(digest_files(spec.code, digests), **outputs))
+            previous = read_ref(name)
+            if use_cache and previous is not None and previous["fingerprint"] == fp:
+                record(spec, fp, payload, outputs, "skipped", duration_s)
+                print(f"⏭️  {name}: outputs unchanged (fingerprint {fp[:12]}) - marking skipped")
+                return SKIP_EXIT_CODE
+
+        record(spec, fp, payload, outputs, "ran", duration_s)
+        print(f"✅ {name}: recorded {len(outputs)} output(s) under {fp[:12]} ({duration_s:.1f}s)")
+        return 0
+    finally:
+        digests.save()
+
+
+def check_stage(name: str, force: bool = False) -> int:
+    """
+    Gate for a stage that runs as several DAG tasks (train fans out per
+    candidate): skip if cached, else remember the fingerprint for record_stage()
+    """
+    spec = STAGES[name]
+    digests = DigestCache()
+    try:
+        fp, payload, skipped = _check(spec, [], digests, CACHE_ENABLED and not force)
+        if skipped:
+            # A gate left open by an earlier failed run no longer applies
+            if has_pending(name):
+                os.remove(pending_path(name))
+            return SKIP_EXIT_CODE
+        # Fingerprint of the inputs as the tasks saw them, not as they are at the end
+        _write_json(pending_path(name), {
+            "fingerprint": fp,
+            "payload": payload,
+            "started_at": time.time(),
+        })
+        print(f"▶️  {name}: fingerprint {fp[:12]} not cached - running the stage's tasks")
+        return 0
+    finally:
+        digests.save()
+
+
+def has_pending(name: str) -> bool:
+    return os.path.exists(pending_path(name))
+
+
+def record_stage(name: str, cache: bool = True) -> int:
+    """
+    Close a check_stage() gate after the stage's reduce task. cache=False
+    (some fanned-out tasks failed) still hands the outputs downstream but
+    does not mark the fingerprint as done.
+    """
+    spec = STAGES[name]
+    pending = _read_json(pending_path(name))
+    if pending is None:
+        print(f"❌ {name}: no pending fingerprint - run --check first")
+        return 1
+    digests = DigestCache()
+    try:
+        outputs = _collect(spec, digests)
+        duration_s = time.time() - pending["started_at"]
+        record(spec, pending["fingerprint"], pending["payload"], outputs, "ran", duration_s, cache=cache)
+        os.remove(pending_path(name))
+        if not cache:
+            print(f"⚠️  {name}: incomplete - outputs handed on, fingerprint {pending['fingerprint'][:12]} "
+                  f"left uncached so the next run retries")
+            return 0
+        print(f"✅ {name}: recorded {len(outputs)} output(s) under {pending['fingerprint'][:12]} "
+              f"({duration_s:.1f}s)")
+        return 0
+    finally:
+        digests.save()
+
+
+def print_status():
+    for name in STAGES:
+        ref = read_ref(name)
+        if ref is None:
+            print(f"{name:<10} never run")
+            continue
+        print(f"{name:<10} {ref['result']:<8} {ref['fingerprint'][:12]}  "
+              f"{len(ref['outputs'])} output(s)  {ref['updated_at']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a retraining stage unless its inputs are unchanged")
+    parser.add_argument("stage", nargs="?", choices=list(STAGES))
+    parser.add_argument("--force", action="store_true", help="run even if the fingerprint is cached")
+    parser.add_argument("--status", action="store_true", help="show the latest fingerprint per stage")
+    parser.add_argument("--check", action="store_true",
+                        help="only gate: exit 99 if cached, else remember the fingerprint")
+    parser.add_argument("--record", action="store_true",
+                        help="record the fingerprint remembered by --check with the current outputs")
+    # Everything after "--" is the stage's command, options included
+    argv = sys.argv[1:]
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    command = argv[split + 1:]
+
+    if args.status:
+        print_status()
+        sys.exit(0)
+    if args.stage is not None and args.check:
+        sys.exit(check_stage(args.stage, force=args.force))
+    if args.stage is not None and args.record:
+        sys.exit(record_stage(args.stage))
+    if args.stage is None or not command:
+        parser.error("usage: <stage> [--check | --record | -- <command ...>]")
+    sys.exit(run_stage(args.stage, command, force=args.force))
@@ -0,0 +1,130 @@
+"""
+Longitudinal per-patient cycle features (follicle growth, estradiol slope,
+short rolling means) computed from consecutive scans of the same patient.
+
+Offline: add_cycle_features() sorts once and uses vectorized groupby/shift,
+so cost is O(n log n) for the sort and O(n) for everything else.
+Serving: CycleFeatureState.update() keeps a tiny per-patient state and
+returns the same features for a new scan with O(1) work.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+PATIENT_COL = "patient_id"
+DAY_COL = "day"
+ROLL_WINDOW = 3
+
+# source column -> short name used in the feature names
+TRACKED = {
+    "avg_follicle_size_mm": "follicle_size",
+    "estradiol_pg_ml": "estradiol",
+    "follicle_count": "follicle_count",
+}
+
+CYCLE_FEATURE_COLS = (
+    ["scan_index", "days_since_prev_scan"]
+    + [f"{short}_delta" for short in TRACKED.values()]
+    + [f"{short}_rate_per_day" for short in TRACKED.values()]
+    + [f"{short}_roll{ROLL_WINDOW}" for short in TRACKED.values()]
+)
+
+
+def add_cycle_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add lag/delta/rolling features per patient. Scans are ordered by day
+    (ties keep file order); the returned frame keeps the input row order.
+    """
+    df = df.copy()
+    # Sort on integer codes: far cheaper than comparing patient id strings
+    codes = pd.factorize(df[PATIENT_COL])[0]
+    order = np.lexsort((df[DAY_COL].to_numpy(), codes))
+    s = df.iloc[order]
+
+    patient = codes[order]
+    # Start of each patient's run of rows in sorted order
+    new_patient = np.r_[True, patient[1:] != patient[:-1]]
+    group_id = np.cumsum(new_patient) - 1
+    start = np.flatnonzero(new_patient)[group_id]
+    pos = np.arange(len(s)) - start
+
+    out = {"scan_index": pos}
+
+    day = s[DAY_COL].to_numpy(dtype="float64")
+    prev_day = np.where(pos > 0, np.roll(day, 1), np.nan)
+    days_since = day - prev_day
+    out["days_since_prev_scan"] = days_since
+    # Same-day repeat scans have no defined rate
+    safe_days = np.where(days_since > 0, days_since, np.nan)
+
+    window = np.minimum(pos + 1, ROLL_WINDOW)
+    for col, short in TRACKED.items():
+        x = s[col].to_numpy(dtype="float64")
+        prev = np.where(pos > 0, np.roll(x, 1), np.nan)
+        delta = x - prev
+        out[f"{short}_delta"] = delta
+        out[f"{short}_rate_per_day"] = delta / safe_days
+
+        # Rolling mean over the last ROLL_WINDOW scans: sum of shifted copies
+        # masked to the patient's own rows (window is tiny, so O(n * w))
+        total = x.copy()
+        for k in range(1, ROLL_WINDOW):
+            total += np.where(pos >= k, np.roll(x, k), 0.0)
+        out[f"{short}_roll{ROLL_WINDOW}"] = total / window
+
+    features = pd.DataFrame(out, index=s.index)
+    for col in CYCLE_FEATURE_COLS:
+        df[col] = features[col]
+    return df
+
+
+class CycleFeatureState:
+    """
+    Per-patient running state for serving. update() must see a patient's
+    scans in day order (as they arrive in clinic) and returns the same
+    values add_cycle_features() would produce for that row.
+    """
+
+    def __init__(self):
+        self._patients = {}
+
+    def __len__(self):
+        return len(self._patients)
+
+    def update(self, patient_id: str, scan: dict) -> dict:
+        state = self._patients.get(patient_id)
+        if state is None:
+            state = {
+                "count": 0,
+                "day": None,
+                "last": {},
+                "window": {col: deque(maxlen=ROLL_WINDOW) for col in TRACKED},
+            }
+            self._patients[patient_id] = state
+
+        day = float(scan[DAY_COL])
+        features = {"scan_index": state["count"]}
+        days_since = day - state["day"] if state["day"] is not None else np.nan
+        features["days_since_prev_scan"] = days_since
+        safe_days = days_since if days_since > 0 else np.nan
+
+        for col, short in TRACKED.items():
+            x = float(scan[col])
+            prev = state["last"].get(col, np.nan)
+            delta = x - prev
+            features[f"{short}_delta"] = delta
+            features[f"{short}_rate_per_day"] = delta / safe_days
+
+            window = state["window"][col]
+            window.append(x)
+            features[f"{short}_roll{ROLL_WINDOW}"] = sum(window) / len(window)
+
+            state["last"][col] = x
+
+        state["count"] += 1
+        state["day"] = day
+        return features
@@ -0,0 +1,207 @@
+"""
+Incremental preprocessing: only raw rows not seen by a previous run are
+pushed through the preprocessing stages and appended to a date-partitioned
+Parquet dataset.
+
+The raw rows come from the raw CSV, or with --raw-dir from the Parquet
+parts the MySQL pull exports (data/raw/ivf_from_mysql), which is how the
+retraining DAG's preprocess stage runs it.
+
+Run from the project root:
+    python -m src.preprocessing.incremental_preprocess [--raw-dir data/raw/ivf_from_mysql]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.data.bulk_load import NATURAL_KEY
+from src.data.pull_mysql_to_csv import SAFETY_LAG_S
+from src.preprocessing.preprocess_ivf_trigger_data import (
+    FEATURE_SPEC_VERSION,
+    FLOAT_COLS,
+    RAW_PATH,
+    add_feature_engineering,
+    drop_impossible_values,
+    handle_missing,
+    standardize_columns,
+)
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+# Repo root (C:\AI_IVF_Trigger_day on the dev box); the DAG stage cache uses the same paths
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+RAW_PARTS_DIR = os.path.join(PROJECT_ROOT, "data", "raw", "ivf_from_mysql")
+DATASET_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocessed_parts")
+STATE_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocess_state.json")
+HASHES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocess_hashes.npy")
+
+# Used as the watermark when the raw export carries it (see the managed
+# MySQL schema); otherwise the row-hash set alone decides what is new
+WATERMARK_COL = "ingested_at"
+PARTITION_COL = "ingest_date"
+
+
+def load_state() -> dict:
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state["row_hashes"] = np.load(HASHES_PATH) if os.path.exists(HASHES_PATH) else np.array([], dtype=np.uint64)
+    return state
+
+
+def save_state(state: dict):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    np.save(HASHES_PATH, np.sort(state["row_hashes"]))
+    meta = {k: v for k, v in state.items() if k != "row_hashes"}
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def read_raw_parts(raw_dir: str) -> pd.DataFrame:
+    """
+    Every exported part as strings, like the CSV read. Each part is converted
+    on its own, so a part's values always hash the same whatever dtypes the
+    other parts were written with.
+    """
+    parts = []
+    for path in sorted(glob.glob(os.path.join(raw_dir, "*.parquet"))):
+        part = pd.read_parquet(path)
+        parts.append(part.astype(str).mask(part.isna()))
+    if not parts:
+        raise FileNotFoundError(f"No exported Parquet parts under {raw_dir}")
+    return pd.concat(parts, ignore_index=True)
+
+
+def hash_rows(raw: pd.DataFrame) -> np.ndarray:
+    """
+    Stable per-row hash of the raw values. Rows are read as strings so dtype
+    inference on a later export cannot change the hash of an old row, and
+    identical rows are numbered so genuine duplicates are not collapsed.
+    """
+    values = pd.util.hash_pandas_object(raw, index=False).to_numpy(dtype=np.uint64)
+    occurrence = pd.Series(values).groupby(values).cumcount().to_numpy(dtype=np.uint64)
+    keyed = pd.DataFrame({"value": values, "occurrence": occurrence})
+    return pd.util.hash_pandas_object(keyed, index=False).to_numpy(dtype=np.uint64)
+
+
+def select_new_rows(raw: pd.DataFrame, hashes: np.ndarray, state: dict) -> np.ndarray:
+    """Boolean mask of raw rows that still need processing"""
+    is_new = ~np.isin(hashes, state.get("row_hashes", np.array([], dtype=np.uint64)))
+
+    watermark = state.get("watermark")
+    if watermark is not None and WATERMARK_COL in raw.columns:
+        # Rows older than the watermark were settled by an earlier run, except
+        # within the pull's safety lag, where late-committed rows still arrive;
+        # the hash set dedupes rows sharing that window
+        ts = pd.to_datetime(raw[WATERMARK_COL], errors="coerce", utc=True)
+        settled_before = pd.Timestamp(watermark) - pd.Timedelta(seconds=SAFETY_LAG_S)
+        is_new &= ~(ts < settled_before).to_numpy()
+    return is_new
+
+
+def write_partitions(df: pd.DataFrame, run_id: str) -> int:
+    """Append one part file per ingest date under DATASET_DIR"""
+    if df.empty:
+        return 0
+    if WATERMARK_COL in df.columns:
+        dates = pd.to_datetime(df[WATERMARK_COL], errors="coerce", utc=True).dt.strftime("%Y-%m-%d")
+        df[PARTITION_COL] = dates.fillna(run_id[:10])
+    else:
+        df[PARTITION_COL] = run_id[:10]
+
+    for date, part in df.groupby(PARTITION_COL, sort=True):
+        part_dir = os.path.join(DATASET_DIR, f"{PARTITION_COL}={date}")
+        os.makedirs(part_dir, exist_ok=True)
+        part.drop(columns=[PARTITION_COL]).to_parquet(
+            os.path.join(part_dir, f"part-{run_id}.parquet"), index=False
+        )
+    return len(df)
+
+
+def read_dataset(dataset_dir: str = DATASET_DIR):
+    """
+    All processed parts as one frame, the engineered bands as plain strings
+    like the processed CSV has them; None when nothing was written yet.
+    A row the pull exported again after an upsert is in the parts twice:
+    the copy with the latest ingested_at wins.
+    """
+    paths = sorted(glob.glob(os.path.join(dataset_dir, "**", "*.parquet"), recursive=True))
+    if not paths:
+        return None
+    df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    if WATERMARK_COL in df.columns:
+        stamps = pd.to_datetime(df[WATERMARK_COL], format="ISO8601", errors="coerce", utc=True)
+        by_stamp = stamps.sort_values(kind="stable", na_position="first").index
+        df = df.loc[by_stamp].drop_duplicates(subset=list(NATURAL_KEY), keep="last")
+        df = df.sort_index().reset_index(drop=True)
+    band_cols = df.select_dtypes(include="category").columns
+    df[band_cols] = df[band_cols].astype(object)
+    return df
+
+
+def main(full_rebuild: bool = False, raw_dir: str = None):
+    state = load_state()
+    if full_rebuild or state.get("feature_spec_version") != FEATURE_SPEC_VERSION:
+        if state:
+            print(
+                f"Feature spec {state.get('feature_spec_version')} -> {FEATURE_SPEC_VERSION}; "
+                "rebuilding processed dataset"
+            )
+        shutil.rmtree(DATASET_DIR, ignore_errors=True)
+        state = {}
+
+    raw = read_raw_parts(raw_dir) if raw_dir else pd.read_csv(RAW_PATH, dtype=str)
+    hashes = hash_rows(raw)
+    is_new = select_new_rows(raw, hashes, state)
+    new_raw = raw[is_new]
+    carried_over = len(raw) - len(new_raw)
+
+    df = standardize_columns(new_raw.copy())
+    df = handle_missing(df)
+    df = drop_impossible_values(df)
+    df = add_feature_engineering(df)
+    df[FLOAT_COLS] = df[FLOAT_COLS].astype("float64")
+
+    run_id = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%S")
+    written = write_partitions(df, run_id)
+
+    watermark = state.get("watermark")
+    if WATERMARK_COL in new_raw.columns:
+        latest = pd.to_datetime(new_raw[WATERMARK_COL], errors="coerce", utc=True).max()
+        if pd.notna(latest) and (watermark is None or latest > pd.Timestamp(watermark)):
+            watermark = latest.isoformat()
+
+    row_hashes = np.union1d(state.get("row_hashes", np.array([], dtype=np.uint64)), hashes[is_new])
+    save_state({
+        "feature_spec_version": FEATURE_SPEC_VERSION,
+        "watermark": watermark,
+        "last_run": run_id,
+        "rows_seen": int(len(row_hashes)),
+        "row_hashes": row_hashes,
+    })
+
+    print(
+        f"Incremental preprocessing: processed {len(new_raw)} new raw rows "
+        f"({written} kept), carried over {carried_over} previously processed rows"
+    )
+    print(f"Processed dataset: {DATASET_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally preprocess new raw IVF rows")
+    parser.add_argument(
+        "--full-rebuild", action="store_true", help="ignore saved state and reprocess everything"
+    )
+    parser.add_argument("--raw-dir", help="read the Parquet parts exported by the MySQL pull from here")
+    args = parser.parse_args()
+    main(full_rebuild=args.full_rebuild, raw_dir=args.raw_dir)
@@ -1,42 +1,43 @@
 import os
+import sys
 import pandas as pd
-from sqlalchemy import create_engine
-from urllib.parse import quote_plus
+
+try:
+    from src.data.bulk_load import bulk_load, format_stats
+    from src.data.db import DB_NAME, get_engine, pool_stats, read_tables_parallel
+except ImportError:  # run as a script: python src/preprocessing/load_ivf_preprocessed_to_mysql.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.data.bulk_load import bulk_load, format_stats
+    from src.data.db import DB_NAME, get_engine, pool_stats, read_tables_parallel
 
 PROJECT_ROOT = r"C:\AI_IVF_Trigger_day"
 
 # processed CSV from previous step
 CSV_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocessed.csv")
 
-# DB config – same as before
-DB_HOST = "localhost"   # so Docker containers can reach Windows MySQL
-DB_PORT = 3306
-DB_NAME = "ivf_trigger_db"
-DB_USER = "root"
-DB_PASSWORD = "Chaithu@143"
-
 TABLE_NAME = "ivf_trigger_data_clean"
+RAW_TABLE_NAME = "ivf_trigger_data"
+BATCH_SIZE = 5000
 
 
 def main():
-    encoded_password = quote_plus(DB_PASSWORD)
-    connection_url = (
-        f"mysql+mysqlconnector://{DB_USER}:{encoded_password}"
-        f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    )
-    engine = create_engine(connection_url)
+    engine = get_engine()
 
     df = pd.read_csv(CSV_PATH)
 
-    with engine.begin() as conn:
-        df.to_sql(
-            name=TABLE_NAME,
-            con=conn,
-            if_exists="replace",   # overwrite clean table each time
-            index=False,
-        )
-
-    print(f"Loaded {len(df)} rows into {DB_NAME}.{TABLE_NAME}")
+    # Load into a staging table and swap it in, instead of drop + recreate
+    stats = bulk_load(df, engine, TABLE_NAME, mode="swap", batch_size=BATCH_SIZE)
+    print(format_stats(stats))
+
+    # Read back both tables at once, on separate pooled connections
+    counts = read_tables_parallel({
+        name: f"SELECT COUNT(*) AS n FROM {name}" for name in (RAW_TABLE_NAME, TABLE_NAME)
+    })
+    raw_rows, clean_rows = (int(counts[name]["n"].iloc[0]) for name in (RAW_TABLE_NAME, TABLE_NAME))
+    if clean_rows != len(df):
+        raise RuntimeError(f"{TABLE_NAME} holds {clean_rows} rows after the swap, expected {len(df)}")
+    print(f"DB pool: {pool_stats()}")
+    print(f"Loaded {len(df)} rows into {DB_NAME}.{TABLE_NAME} ({raw_rows} raw rows in {RAW_TABLE_NAME})")
 
 
 if __name__ == "__main__":
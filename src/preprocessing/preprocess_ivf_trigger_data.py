@@ -1,11 +1,41 @@
+import argparse
 import os
+import sys
 import pandas as pd
 import numpy as np
 
+try:
+    from src.preprocessing.cycle_features import add_cycle_features
+    from src.validation.suite import CLINICAL_RANGES
+except ImportError:  # run as a script: python src/preprocessing/preprocess_ivf_trigger_data.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.preprocessing.cycle_features import add_cycle_features
+    from src.validation.suite import CLINICAL_RANGES
+
 PROJECT_ROOT = r"C:\AI_IVF_Trigger_day"
 
 RAW_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "Trigger_day_prediction.csv")
 PROCESSED_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocessed.csv")
+PROCESSED_PARQUET_PATH = os.path.join(
+    PROJECT_ROOT, "data", "processed", "ivf_trigger_preprocessed.parquet"
+)
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Bump whenever standardize_columns / drop rules / add_feature_engineering
+# change; incremental runs rebuild the processed dataset on a new version
+FEATURE_SPEC_VERSION = "2"
+
+# Measurements written as float64 in streaming mode so every chunk has the
+# same Parquet schema (a chunk without decimals would otherwise be int64)
+FLOAT_COLS = [
+    "age",
+    "amh_ng_ml",
+    "day",
+    "avg_follicle_size_mm",
+    "follicle_count",
+    "estradiol_pg_ml",
+    "progesterone_ng_ml",
+]
 
 
 def load_raw():
@@ -45,7 +75,7 @@ def standardize_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def handle_missing(df: pd.DataFrame) -> pd.DataFrame:
+def handle_missing(df: pd.DataFrame, stats: dict = None) -> pd.DataFrame:
     # Drop rows where key clinical fields are missing
     required = [
         "age",
@@ -60,24 +90,28 @@ def handle_missing(df: pd.DataFrame) -> pd.DataFrame:
     before = len(df)
     df = df.dropna(subset=required)
     after = len(df)
-    print(f"Dropped {before - after} rows due to critical NaNs; remaining {after}")
+    if stats is None:
+        print(f"Dropped {before - after} rows due to critical NaNs; remaining {after}")
+    else:
+        stats["dropped_critical_nans"] += before - after
+        stats["after_missing"] += after
     return df
 
 
-def drop_impossible_values(df: pd.DataFrame) -> pd.DataFrame:
+def drop_impossible_values(df: pd.DataFrame, stats: dict = None) -> pd.DataFrame:
     before = len(df)
 
-    cond = (
-        (df["age"].between(18, 50))
-        & (df["amh_ng_ml"].between(0.1, 15))
-        & (df["avg_follicle_size_mm"].between(8, 30))
-        & (df["follicle_count"].between(1, 60))
-        & (df["estradiol_pg_ml"].between(20, 6000))
-        & (df["progesterone_ng_ml"].between(0.1, 5))
-    )
+    # Same inclusive bounds the offline suite and the API's online checks use
+    cond = pd.Series(True, index=df.index)
+    for col, (low, high) in CLINICAL_RANGES.items():
+        cond &= df[col].between(low, high)
     df = df[cond].copy()
     after = len(df)
-    print(f"Dropped {before - after} rows due to impossible clinical ranges; remaining {after}")
+    if stats is None:
+        print(f"Dropped {before - after} rows due to impossible clinical ranges; remaining {after}")
+    else:
+        stats["dropped_impossible_values"] += before - after
+        stats["after_impossible_values"] += after
     return df
 
 
@@ -122,7 +156,7 @@ def add_feature_engineering(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def main():
+def main(cycle_features: bool = False):
     df = load_raw()
     print(f"Loaded raw rows: {len(df)}")
 
@@ -130,11 +164,102 @@ def main():
     df = handle_missing(df)
     df = drop_impossible_values(df)
     df = add_feature_engineering(df)
+    if cycle_features:
+        df = add_cycle_features(df)
 
     os.makedirs(os.path.dirname(PROCESSED_PATH), exist_ok=True)
     df.to_csv(PROCESSED_PATH, index=False)
     print(f"Saved preprocessed data to {PROCESSED_PATH} with {len(df)} rows and {df.shape[1]} columns")
 
 
+def main_streaming(chunk_size: int = DEFAULT_CHUNK_SIZE, output_path: str = PROCESSED_PARQUET_PATH):
+    """
+    Same stages as main(), applied to fixed-size chunks of the raw CSV and
+    appended to one Parquet file (one row group per chunk). Drop counters
+    are accumulated across chunks so the summary lines match main().
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stats = {
+        "loaded": 0,
+        "dropped_critical_nans": 0,
+        "after_missing": 0,
+        "dropped_impossible_values": 0,
+        "after_impossible_values": 0,
+    }
+    n_columns = 0
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    writer = None
+    try:
+        reader = pd.read_csv(RAW_PATH, chunksize=chunk_size, dtype={"Patient_ID": str})
+        for chunk in reader:
+            stats["loaded"] += len(chunk)
+
+            chunk = standardize_columns(chunk)
+            chunk = handle_missing(chunk, stats)
+            chunk = drop_impossible_values(chunk, stats)
+            chunk = add_feature_engineering(chunk)
+            chunk[FLOAT_COLS] = chunk[FLOAT_COLS].astype("float64")
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            n_columns = table.num_columns
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        print(f"No rows in {RAW_PATH}; nothing written")
+        return stats
+    # Only replace the previous output once every chunk succeeded
+    os.replace(tmp_path, output_path)
+
+    print(f"Loaded raw rows: {stats['loaded']}")
+    print(
+        f"Dropped {stats['dropped_critical_nans']} rows due to critical NaNs; "
+        f"remaining {stats['after_missing']}"
+    )
+    print(
+        f"Dropped {stats['dropped_impossible_values']} rows due to impossible clinical ranges; "
+        f"remaining {stats['after_impossible_values']}"
+    )
+    print(
+        f"Saved preprocessed data to {output_path} with "
+        f"{stats['after_impossible_values']} rows and {n_columns} columns"
+    )
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preprocess raw IVF trigger data")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="process the raw CSV in chunks and write appended Parquet output",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", default=PROCESSED_PARQUET_PATH)
+    parser.add_argument(
+        "--cycle-features",
+        action="store_true",
+        help="add per-patient lag/delta/rolling features (needs whole patients, not chunks)",
+    )
+    args = parser.parse_args()
+    if args.stream and args.cycle_features:
+        parser.error("--cycle-features needs every scan of a patient; not supported with --stream")
+    return args
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.stream:
+        main_streaming(chunk_size=args.chunk_size, output_path=args.output)
+    else:
+        main(cycle_features=args.cycle_features)
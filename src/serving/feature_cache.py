@@ -0,0 +1,204 @@
+"""
+Read-through in-process cache in front of the Feast online store.
+
+Lookups go through ivf_trigger_service_v1, which returns the measurements
+plus the on-demand derived bands/flags, i.e. the full model input vector.
+Entries are keyed by Patient_ID and live for the feature view's ttl (or
+less, via IVF_FEATURE_CACHE_TTL_S). Misses from a multi-patient request
+are fetched with a single batched get_online_features() call. Every
+materialization run rewrites a small marker file; the cache checks its
+mtime at most every IVF_FEATURE_CACHE_CHECK_S seconds and drops all
+entries when it changes, so freshly materialized values are never masked.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+FEAST_REPO_PATH = os.path.join(PROJECT_ROOT, "feast", "feature_repo")
+MATERIALIZATION_MARKER = os.path.join(FEAST_REPO_PATH, "data", "last_materialization.json")
+FEATURE_VIEW = "ivf_trigger_features"
+FEATURE_SERVICE = "ivf_trigger_service_v1"
+ENTITY_KEY = "Patient_ID"
+MAX_ENTRIES = int(os.environ.get("IVF_FEATURE_CACHE_MAX_ENTRIES", "100000"))
+TTL_OVERRIDE_S = os.environ.get("IVF_FEATURE_CACHE_TTL_S")  # capped at the view's ttl
+CHECK_INTERVAL_S = float(os.environ.get("IVF_FEATURE_CACHE_CHECK_S", "5"))
+
+# Feast feature names -> the API's DATA_COLUMNS names (derived ones already match)
+MODEL_COLUMN_NAMES = {
+    "Age": "age",
+    "AMH (ng/mL)": "amh_ng_ml",
+    "Day": "day",
+    "Avg_Follicle_Size_mm": "avg_follicle_size_mm",
+    "Follicle_Count": "follicle_count",
+    "Estradiol_pg_mL": "estradiol_pg_ml",
+    "Progesterone_ng_mL": "progesterone_ng_ml",
+}
+
+CACHE_LOOKUPS = Counter(
+    "ivf_feature_cache_lookups_total",
+    "Online feature lookups by cache result",
+    ["result"],  # hit | miss
+)
+CACHE_ENTRIES = Gauge(
+    "ivf_feature_cache_entries",
+    "Patients currently held in the online feature cache",
+)
+CACHE_INVALIDATIONS = Counter(
+    "ivf_feature_cache_invalidations_total",
+    "Cache flushes triggered by a new materialization run",
+)
+FEAST_FETCH_SECONDS = Histogram(
+    "ivf_feature_cache_feast_fetch_seconds",
+    "Time of one batched get_online_features call for cache misses",
+)
+
+
+def write_materialization_marker(end_date: datetime, marker_path: str = MATERIALIZATION_MARKER, **extra):
+    """Record a finished materialization run (read by caches and freshness checks)"""
+    os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+    payload = {
+        "end_date": end_date.astimezone(timezone.utc).isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        **extra,
+    }
+    tmp_path = marker_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, marker_path)
+
+
+class OnlineFeatureCache:
+    """TTL read-through cache of the feature service's online values per patient"""
+
+    def __init__(self, store=None, feature_service: str = FEATURE_SERVICE,
+                 feature_view: str = FEATURE_VIEW, max_entries: int = MAX_ENTRIES,
+                 marker_path: str = MATERIALIZATION_MARKER,
+                 check_interval_s: float = CHECK_INTERVAL_S):
+        if store is None:
+            from feast import FeatureStore
+
+            store = FeatureStore(repo_path=FEAST_REPO_PATH)
+        self.store = store
+        # Resolved once here instead of on every request
+        self.features = store.get_feature_service(feature_service)
+        self.feature_names = [
+            f.name for projection in self.features.feature_view_projections for f in projection.features
+        ]
+        # Entries expire with the materialized view the values come from
+        view = store.get_feature_view(feature_view)
+        ttl_s = view.ttl.total_seconds() if view.ttl else float("inf")
+        if TTL_OVERRIDE_S:
+            ttl_s = min(ttl_s, float(TTL_OVERRIDE_S))
+        self.ttl_s = ttl_s
+
+        self.max_entries = max_entries
+        self.marker_path = marker_path
+        self.check_interval_s = check_interval_s
+        self._entries = OrderedDict()     # patient_id -> (expires_at, features or None)
+        self._lock = threading.Lock()
+        self._marker_mtime = self._read_marker_mtime()
+        self._next_check = time.monotonic() + check_interval_s
+
+    # ---------------------------------------------------------------
+    # Invalidation
+    # ---------------------------------------------------------------
+    def _read_marker_mtime(self):
+        try:
+            return os.stat(self.marker_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _check_marker(self, now: float):
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval_s
+        mtime = self._read_marker_mtime()
+        if mtime != self._marker_mtime:
+            self._marker_mtime = mtime
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+        CACHE_INVALIDATIONS.inc()
+        CACHE_ENTRIES.set(0)
+
+    # ---------------------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------------------
+    def get(self, patient_id: str):
+        return self.get_many([patient_id])[patient_id]
+
+    def get_many(self, patient_ids: list) -> dict:
+        """{patient_id: {feature: value} or None if the store has no row}"""
+        now = time.monotonic()
+        self._check_marker(now)
+        # Counted per requested id, repeats included; each missing id is fetched once
+        found, missing, misses = {}, set(), 0
+        with self._lock:
+            for pid in patient_ids:
+                entry = self._entries.get(pid)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(pid)
+                    found[pid] = entry[1]
+                else:
+                    misses += 1
+                    missing.add(pid)
+        CACHE_LOOKUPS.labels(result="hit").inc(len(patient_ids) - misses)
+        if missing:
+            CACHE_LOOKUPS.labels(result="miss").inc(misses)
+            found.update(self._fetch(list(missing)))
+        return {pid: found[pid] for pid in patient_ids}
+
+    def _fetch(self, patient_ids: list) -> dict:
+        """One batched online-store read for all misses"""
+        start = time.perf_counter()
+        response = self.store.get_online_features(
+            features=self.features,
+            entity_rows=[{ENTITY_KEY: pid} for pid in patient_ids],
+        ).to_dict()
+        FEAST_FETCH_SECONDS.observe(time.perf_counter() - start)
+
+        fetched = {}
+        for i, pid in enumerate(patient_ids):
+            values = {name: response[name][i] for name in self.feature_names}
+            # Unknown patients are cached as None too, so they don't hit SQLite every time
+            raw = [values[name] for name in MODEL_COLUMN_NAMES]
+            fetched[pid] = values if any(v is not None for v in raw) else None
+
+        expires_at = time.monotonic() + self.ttl_s
+        with self._lock:
+            for pid, values in fetched.items():
+                self._entries[pid] = (expires_at, values)
+                self._entries.move_to_end(pid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES.set(len(self._entries))
+        return fetched
+
+    def get_model_input(self, patient_id: str):
+        """Full model input row (DATA_COLUMNS names) for one patient, or None"""
+        values = self.get(patient_id)
+        if values is None:
+            return None
+        row = {MODEL_COLUMN_NAMES.get(name, name): value for name, value in values.items()}
+        row["patient_id"] = patient_id
+        return row
+
+    def stats(self) -> dict:
+        hits = CACHE_LOOKUPS.labels(result="hit")._value.get()
+        misses = CACHE_LOOKUPS.labels(result="miss")._value.get()
+        return {
+            "entries": len(self._entries),
+            "ttl_s": self.ttl_s,
+            "hit_rate": hits / (hits + misses) if hits + misses else None,
+        }
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from src.monitoring.drift import REFERENCE_PROFILE_ARTIFACT
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_CACHE_DIR = os.environ.get(
+    "IVF_MODEL_CACHE_DIR", os.path.join(PROJECT_ROOT, "data", "model_cache")
+)
+KEEP_VERSIONS = 3  # registry versions kept on disk per model
+
+
+class ModelCache:
+    """
+    Local content-addressed cache of registered models.
+
+    Layout:
+        objects/<sha256>.pkl   pickled, ready-to-load model (name = digest)
+        index.json             {model_name: {"current": version,
+                                             "versions": {version: {...}}}}
+
+    Starting from the cache never touches the MLflow registry; refresh()
+    is the only method that talks to the tracking server.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, keep_versions: int = KEEP_VERSIONS):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.keep_versions = keep_versions
+
+    # ---------------------------------------------------------------
+    # Index
+    # ---------------------------------------------------------------
+    def _read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_index(self, index: dict):
+        # Write-then-rename so a crash never leaves a half-written index
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def current_version(self, name: str):
+        return self._read_index().get(name, {}).get("current")
+
+    # ---------------------------------------------------------------
+    # Read path
+    # ---------------------------------------------------------------
+    def load(self, name: str, version: str = None):
+        """Return (model, version) from disk, or None on a miss / corrupt entry"""
+        entry = self._read_index().get(name)
+        if not entry:
+            return None
+        version = str(version or entry["current"])
+        meta = entry["versions"].get(version)
+        if meta is None:
+            return None
+
+        path = os.path.join(self.objects_dir, f"{meta['digest']}.pkl")
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        if hashlib.sha256(payload).hexdigest() != meta["digest"]:
+            return None
+        return pickle.loads(payload), version
+
+    # ---------------------------------------------------------------
+    # Write path
+    # ---------------------------------------------------------------
+    def reference_profile(self, name: str, version: str = None):
+        """Training-distribution profile stored with a cached version, or None"""
+        entry = self._read_index().get(name)
+        if not entry:
+            return None
+        meta = entry["versions"].get(str(version or entry["current"]), {})
+        return meta.get("reference_profile")
+
+    def put(self, name: str, version: str, model, source_uri: str = None,
+            reference_profile: dict = None) -> str:
+        """Store a model under its content digest and make it current"""
+        payload = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(payload).hexdigest()
+        path = os.path.join(self.objects_dir, f"{digest}.pkl")
+
+        if not os.path.exists(path):
+            # Created on first write, so constructing the cache has no side effects
+            os.makedirs(self.objects_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+        index = self._read_index()
+        entry = index.setdefault(name, {"current": None, "versions": {}})
+        entry["versions"][str(version)] = {
+            "digest": digest,
+            "source_uri": source_uri,
+            "cached_at": time.time(),
+            "size_bytes": len(payload),
+            "reference_profile": reference_profile,
+        }
+        entry["current"] = str(version)
+        self._evict(index, name)
+        self._write_index(index)
+        return digest
+
+    def _evict(self, index: dict, name: str):
+        """Keep the newest keep_versions entries and drop unreferenced objects"""
+        versions = index[name]["versions"]
+        ordered = sorted(versions, key=int, reverse=True)
+        for old in ordered[self.keep_versions:]:
+            if old != index[name]["current"]:
+                del versions[old]
+
+        referenced = {
+            meta["digest"]
+            for entry in index.values()
+            for meta in entry["versions"].values()
+        }
+        for filename in os.listdir(self.objects_dir):
+            digest, ext = os.path.splitext(filename)
+            if ext == ".pkl" and digest not in referenced:
+                os.remove(os.path.join(self.objects_dir, filename))
+
+    def refresh(self, name: str, client=None) -> str:
+        """
+        Ask the registry for the latest version and cache it if it is new.
+        Returns the latest version; the download only happens on a change.
+        """
+        import mlflow.artifacts
+        import mlflow.sklearn
+        from mlflow.tracking import MlflowClient
+
+        client = client or MlflowClient()
+        versions = client.search_model_versions(f"name='{name}'")
+        if not versions:
+            raise LookupError(f"No registered versions for model '{name}'")
+        latest_mv = max(versions, key=lambda v: int(v.version))
+        latest = str(latest_mv.version)
+
+        index = self._read_index()
+        if latest in index.get(name, {}).get("versions", {}):
+            if index[name]["current"] != latest:
+                index[name]["current"] = latest
+                self._write_index(index)
+            return latest
+
+        model_uri = f"models:/{name}/{latest}"
+        download_dir = tempfile.mkdtemp(prefix="ivf_model_")
+        try:
+            model = mlflow.sklearn.load_model(model_uri, dst_path=download_dir)
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+        # Runs trained before drift profiles existed simply have none
+        try:
+            profile = mlflow.artifacts.load_dict(f"runs:/{latest_mv.run_id}/{REFERENCE_PROFILE_ARTIFACT}")
+        except Exception:
+            profile = None
+        self.put(name, latest, model, source_uri=model_uri, reference_profile=profile)
+        return latest
@@ -0,0 +1,272 @@
+"""
+Non-blocking prediction log.
+
+Request handlers call PredictionLogger.log(), which only appends a dict to
+a bounded in-memory buffer under a lock. A background flusher thread
+swaps the buffer out once flush_rows records are buffered or
+flush_interval_s has passed since its last write, serializes it and
+appends it as a row group to the current Parquet file, rotating files by
+size and age. Files being written
+carry an ".inprogress" suffix and are renamed when closed, so readers
+(e.g. the outcome join) only ever see complete files.
+
+When the buffer is full the backpressure policy decides:
+    drop   - the record is discarded and counted (default; never slows requests)
+    block  - the caller waits up to block_timeout_s for room, and the wait
+             is measured; the record is dropped only if the wait times out
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from prometheus_client import Counter, Gauge, Histogram
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+LOG_DIR = os.environ.get(
+    "IVF_PREDICTION_LOG_DIR", os.path.join(PROJECT_ROOT, "data", "prediction_log")
+)
+BUFFER_CAPACITY = int(os.environ.get("IVF_PREDICTION_LOG_CAPACITY", "20000"))
+FLUSH_INTERVAL_S = float(os.environ.get("IVF_PREDICTION_LOG_FLUSH_S", "2"))
+# Batch size that triggers a write before the interval is up; larger
+# batches mean fewer, bigger Parquet row groups
+FLUSH_ROWS = int(os.environ.get("IVF_PREDICTION_LOG_FLUSH_ROWS", "5000"))
+ROTATE_BYTES = int(os.environ.get("IVF_PREDICTION_LOG_ROTATE_MB", "64")) * 1024 * 1024
+ROTATE_S = int(os.environ.get("IVF_PREDICTION_LOG_ROTATE_S", "3600"))
+BACKPRESSURE = os.environ.get("IVF_PREDICTION_LOG_BACKPRESSURE", "drop")  # drop | block
+BLOCK_TIMEOUT_S = float(os.environ.get("IVF_PREDICTION_LOG_BLOCK_TIMEOUT_S", "0.05"))
+INPROGRESS_SUFFIX = ".inprogress"
+
+SCHEMA = pa.schema([
+    ("logged_at", pa.timestamp("us", tz="UTC")),
+    ("endpoint", pa.string()),
+    ("patient_id", pa.string()),
+    ("day", pa.int64()),
+    ("model_version", pa.int64()),
+    ("pred_trigger_probability", pa.float64()),
+    ("pred_trigger_recommended", pa.int64()),
+    ("latency_ms", pa.float64()),
+    ("input_valid", pa.bool_()),
+    ("inputs", pa.string()),  # JSON, so new request fields never break the schema
+])
+
+LOG_RECORDS = Counter(
+    "ivf_prediction_log_records_total",
+    "Prediction log records by outcome",
+    ["outcome"],  # written | dropped
+)
+LOG_BLOCKED_SECONDS = Histogram(
+    "ivf_prediction_log_blocked_seconds",
+    "Time request threads waited for room in the prediction log buffer",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+LOG_BUFFERED = Gauge(
+    "ivf_prediction_log_buffered_records",
+    "Prediction log records waiting to be flushed",
+)
+LOG_WRITE_ERRORS = Counter(
+    "ivf_prediction_log_write_errors_total",
+    "Prediction log flushes that failed (batch dropped, file reopened)",
+)
+LOG_FLUSH_SECONDS = Histogram(
+    "ivf_prediction_log_flush_seconds",
+    "Time to serialize and write one prediction log batch",
+)
+
+
+def _to_int(value):
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PredictionLogger:
+    """Bounded buffer plus a background Parquet writer with rotation"""
+
+    def __init__(self, log_dir: str = LOG_DIR, capacity: int = BUFFER_CAPACITY,
+                 flush_interval_s: float = FLUSH_INTERVAL_S, flush_rows: int = FLUSH_ROWS,
+                 rotate_bytes: int = ROTATE_BYTES, rotate_s: int = ROTATE_S,
+                 backpressure: str = BACKPRESSURE, block_timeout_s: float = BLOCK_TIMEOUT_S):
+        if backpressure not in ("drop", "block"):
+            raise ValueError(f"Unknown backpressure policy: {backpressure}")
+        self.log_dir = log_dir
+        self.capacity = capacity
+        self.flush_interval_s = flush_interval_s
+        # A full buffer must always be enough to wake the flusher
+        self.flush_rows = max(1, min(flush_rows, capacity))
+        self.rotate_bytes = rotate_bytes
+        self.rotate_s = rotate_s
+        self.backpressure = backpressure
+        self.block_timeout_s = block_timeout_s
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._stop = False
+        self._thread = None
+
+        self._writer = None
+        self._path = None
+        self._opened_at = 0.0
+
+    # ---------------------------------------------------------------
+    # Request path
+    # ---------------------------------------------------------------
+    def log(self, record: dict) -> bool:
+        return self.log_many([record]) == 1
+
+    def log_many(self, records: list) -> int:
+        """Buffer records; returns how many were accepted"""
+        now = datetime.now(timezone.utc)
+        for record in records:
+            record.setdefault("logged_at", now)
+        with self._lock:
+            room = self.capacity - len(self._buffer)
+            if room < len(records) and self.backpressure == "block":
+                start = time.perf_counter()
+                deadline = start + self.block_timeout_s
+                while room < len(records) and not self._stop:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.notify()
+                    self._not_full.wait(remaining)
+                    room = self.capacity - len(self._buffer)
+                LOG_BLOCKED_SECONDS.observe(time.perf_counter() - start)
+            accepted = records[:max(room, 0)]
+            self._buffer.extend(accepted)
+            buffered = len(self._buffer)
+            if buffered >= self.flush_rows:
+                self._not_empty.notify()
+        LOG_BUFFERED.set(buffered)
+        dropped = len(records) - len(accepted)
+        if dropped:
+            LOG_RECORDS.labels(outcome="dropped").inc(dropped)
+        return len(accepted)
+
+    # ---------------------------------------------------------------
+    # Flusher
+    # ---------------------------------------------------------------
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        last_write = time.monotonic()
+        while True:
+            with self._lock:
+                # Write when flush_rows are buffered, flush_interval_s after the
+                # last write, or on close - not as soon as anything arrives
+                while not self._stop and len(self._buffer) < self.flush_rows:
+                    remaining = last_write + self.flush_interval_s - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+                batch, self._buffer = self._buffer, []
+                stopping = self._stop
+                self._not_full.notify_all()
+            last_write = time.monotonic()
+            LOG_BUFFERED.set(0)
+            try:
+                if batch:
+                    self._write(batch)
+                    batch = []  # written; a failure below only loses the file close
+                elif self._writer is not None and time.time() - self._opened_at >= self.rotate_s:
+                    self._close_file()
+                if stopping:
+                    self._close_file()
+            except Exception as e:
+                # Disk full, permissions, ...: lose this batch, not the flusher
+                LOG_WRITE_ERRORS.inc()
+                if batch:
+                    LOG_RECORDS.labels(outcome="dropped").inc(len(batch))
+                print(f"⚠️  Prediction log write failed ({e}); dropped {len(batch)} records")
+                self._abandon_file()
+            if stopping:
+                return
+
+    def _write(self, batch: list):
+        start = time.perf_counter()
+        table = pa.Table.from_pydict({
+            "logged_at": [r["logged_at"] for r in batch],
+            "endpoint": [r.get("endpoint") for r in batch],
+            "patient_id": [None if r.get("patient_id") is None else str(r["patient_id"]) for r in batch],
+            "day": [_to_int(r.get("day")) for r in batch],
+            "model_version": [_to_int(r.get("model_version")) for r in batch],
+            "pred_trigger_probability": [r.get("pred_trigger_probability") for r in batch],
+            "pred_trigger_recommended": [_to_int(r.get("pred_trigger_recommended")) for r in batch],
+            "latency_ms": [r.get("latency_ms") for r in batch],
+            "input_valid": [r.get("input_valid") for r in batch],
+            "inputs": [json.dumps(r.get("inputs"), default=str) for r in batch],
+        }, schema=SCHEMA)
+
+        if self._writer is not None and (
+            os.path.getsize(self._path) >= self.rotate_bytes
+            or time.time() - self._opened_at >= self.rotate_s
+        ):
+            self._close_file()
+        if self._writer is None:
+            self._open_file()
+        self._writer.write_table(table)
+        LOG_RECORDS.labels(outcome="written").inc(len(batch))
+        LOG_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    def _open_file(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self._path = os.path.join(self.log_dir, f"predictions-{stamp}.parquet{INPROGRESS_SUFFIX}")
+        self._writer = pq.ParquetWriter(self._path, SCHEMA)
+        self._opened_at = time.time()
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self._path, self._path[: -len(INPROGRESS_SUFFIX)])
+        self._writer = None
+        self._path = None
+
+    def _abandon_file(self):
+        """Forget a file after a failed write; the next batch opens a fresh one"""
+        writer, self._writer, self._path = self._writer, None, None
+        if writer is not None:
+            try:
+                # Left with its .inprogress suffix, so readers never pick it up
+                writer.close()
+            except Exception:
+                pass
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything buffered and finalize the current file"""
+        with self._lock:
+            self._stop = True
+            self._not_empty.notify()
+            self._not_full.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        elif self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+            self._close_file()
+
+
+def list_log_files(log_dir: str = LOG_DIR) -> list:
+    """Completed prediction log files, oldest first"""
+    if not os.path.isdir(log_dir):
+        return []
+    return sorted(
+        os.path.join(log_dir, f) for f in os.listdir(log_dir)
+        if f.startswith("predictions-") and f.endswith(".parquet")
+    )
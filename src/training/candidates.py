@@ -0,0 +1,120 @@
+"""
+Candidate models for retraining, one entry per DAG task.
+
+Kept free of heavy imports: the retraining DAG reads these when it is
+parsed and maps one train task over each entry, so a slow or failing
+algorithm only holds up (and retries) its own task. A hyperparameter block
+is just another entry with the same estimator and different params.
+
+resources describe the task running the candidate:
+    n_jobs      estimator worker threads; also caps the BLAS/OpenMP pools
+                inside the task (threadpoolctl, so it holds even when the
+                worker process loaded numpy before the task started)
+    pool_slots  Airflow pool slots the task occupies (default: n_jobs), so
+                the pool's size bounds the CPUs all candidates use at once
+    pool/queue  optional Airflow pool and executor queue overrides
+task_groups() turns them into Airflow task arguments; candidates sharing
+the same arguments are one mapped task.
+"""
+import importlib
+import json
+import os
+import re
+
+CANDIDATES = [
+    {
+        "name": "LogisticRegression",
+        "estimator": "sklearn.linear_model.LogisticRegression",
+        "params": {"max_iter": 1000, "random_state": 42},
+        "resources": {"n_jobs": 1},
+    },
+    {
+        "name": "RandomForest",
+        "estimator": "sklearn.ensemble.RandomForestClassifier",
+        "params": {"n_estimators": 200, "max_depth": 8, "random_state": 42},
+        "resources": {"n_jobs": 4, "pool_slots": 4},
+    },
+    {
+        "name": "GradientBoosting",
+        "estimator": "sklearn.ensemble.GradientBoostingClassifier",
+        "params": {"n_estimators": 200, "max_depth": 3, "random_state": 42},
+        "resources": {"n_jobs": 1},
+    },
+]
+
+
+def get_candidate(name: str) -> dict:
+    for candidate in CANDIDATES:
+        if candidate["name"] == name:
+            return candidate
+    raise KeyError(f"Unknown candidate '{name}' (known: {[c['name'] for c in CANDIDATES]})")
+
+
+def build_model(candidate: dict):
+    """Instantiate the estimator; n_jobs comes from IVF_TRAIN_N_JOBS when the task sets it"""
+    module_name, class_name = candidate["estimator"].rsplit(".", 1)
+    estimator = getattr(importlib.import_module(module_name), class_name)
+    params = dict(candidate["params"])
+    if "n_jobs" in estimator().get_params():
+        params["n_jobs"] = int(os.environ.get("IVF_TRAIN_N_JOBS", candidate["resources"]["n_jobs"]))
+    return estimator(**params)
+
+
+def task_env(candidate: dict) -> dict:
+    """Environment for the candidate's task, from its resource hints"""
+    threads = str(candidate["resources"]["n_jobs"])
+    return {
+        "IVF_TRAIN_N_JOBS": threads,
+        "OMP_NUM_THREADS": threads,
+        "OPENBLAS_NUM_THREADS": threads,
+        "MKL_NUM_THREADS": threads,
+    }
+
+
+TRAIN_POOL = os.environ.get("IVF_TRAIN_POOL", "default_pool")
+
+
+def task_args(candidate: dict) -> dict:
+    """Airflow operator arguments for the candidate's training task"""
+    resources = candidate["resources"]
+    args = {
+        "pool": resources.get("pool", TRAIN_POOL),
+        "pool_slots": int(resources.get("pool_slots", resources["n_jobs"])),
+    }
+    if resources.get("queue"):
+        args["queue"] = resources["queue"]
+    return args
+
+
+def task_groups() -> dict:
+    """{task id suffix: (task args, candidate names)}; one mapped task per distinct args"""
+    groups = {}
+    for candidate in CANDIDATES:
+        args = task_args(candidate)
+        parts = [args["pool"], f"{args['pool_slots']}slot", args.get("queue")]
+        suffix = re.sub(r"\W+", "_", "_".join(p for p in parts if p))
+        groups.setdefault(suffix, (args, []))[1].append(candidate["name"])
+    return groups
+
+
+# ===================================================================
+# FAN-IN
+# ===================================================================
+BATCH_TAG = "ivf.training_batch"  # run tag shared by one DAG run's candidates
+WINNER_PATH = os.path.join("data", "processed", "training_winner.json")
+
+
+def read_winner(path: str = WINNER_PATH):
+    """Latest reduce-step result ({batch_id, run_ids, winner_run_id, ...}) or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_winner(result: dict, path: str = WINNER_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, path)
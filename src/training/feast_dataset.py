@@ -0,0 +1,236 @@
+"""
+Point-in-time correct training sets from the Feast offline store.
+
+write_offline_source() turns the raw scans into the Feast FileSource:
+every row gets a real event timestamp (cycle start + stimulation day - 1)
+and the Parquet dataset is partitioned by event_date, so the offline
+store only touches the days an entity chunk asks for.
+
+build_training_set() takes the labeled scans as the entity dataframe,
+splits it into time-ordered chunks and runs get_historical_features()
+per chunk, so join cost and memory grow with the chunk rather than with
+the whole history. The joined frame is renamed to the processed-data
+column names, so mlflow_training.py can train on it directly.
+
+The built set is saved under the fingerprint of what it was joined from
+(offline source files, feature definitions, cleaning code), so a changed
+source is rebuilt on the next load and an unchanged one is read back. The
+file is written to a temp name and renamed, so candidate tasks loading it
+at the same time never see a half-written set.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from src.pipeline.stage_cache import file_sha256
+    from src.preprocessing.preprocess_ivf_trigger_data import (
+        FEATURE_SPEC_VERSION,
+        add_feature_engineering,
+        drop_impossible_values,
+        handle_missing,
+        standardize_columns,
+    )
+except ImportError:  # run as a script: python src/training/feast_dataset.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.pipeline.stage_cache import file_sha256
+    from src.preprocessing.preprocess_ivf_trigger_data import (
+        FEATURE_SPEC_VERSION,
+        add_feature_engineering,
+        drop_impossible_values,
+        handle_missing,
+        standardize_columns,
+    )
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+FEAST_REPO_PATH = os.path.join(PROJECT_ROOT, "feast", "feature_repo")
+RAW_CSV_PATH = os.path.join(FEAST_REPO_PATH, "data", "Trigger_day_prediction.csv")
+# Must match the FileSource path in feast/feature_repo/features/feature_views.py
+OFFLINE_SOURCE_DIR = os.path.join(FEAST_REPO_PATH, "data", "trigger_day_prediction")
+# ivf_training_set-<source fingerprint>.parquet
+TRAINING_SET_DIR = os.path.join(PROJECT_ROOT, "data", "processed")
+TRAINING_SET_PREFIX = "ivf_training_set-"
+# Files whose change alters the joined training set
+FINGERPRINT_GLOBS = [
+    os.path.join(OFFLINE_SOURCE_DIR, "**", "*.parquet"),
+    os.path.join(FEAST_REPO_PATH, "feature_store.yaml"),
+    os.path.join(FEAST_REPO_PATH, "features", "*.py"),
+    os.path.join(PROJECT_ROOT, "src", "preprocessing", "preprocess_ivf_trigger_data.py"),
+    os.path.join(PROJECT_ROOT, "src", "validation", "suite.py"),
+    os.path.abspath(__file__),
+]
+
+FEATURE_SERVICE = "ivf_trigger_service_v1"
+ENTITY_KEY = "Patient_ID"
+LABEL_COL = "Trigger_Recommended (0/1)"
+TIMESTAMP_COL = "event_timestamp"
+PARTITION_COL = "event_date"
+# Used when the source has a cycle start date; otherwise every cycle is
+# anchored at IVF_CYCLE_ANCHOR_DATE so scans keep their relative spacing
+CYCLE_START_COL = "Cycle_Start_Date"
+CYCLE_ANCHOR_DATE = os.environ.get("IVF_CYCLE_ANCHOR_DATE", "2025-01-01")
+ENTITY_CHUNK_ROWS = int(os.environ.get("IVF_FEAST_ENTITY_CHUNK_ROWS", "50000"))
+
+# Column order of data/processed/ivf_trigger_preprocessed.csv
+TRAINING_COLUMNS = [
+    "patient_id", "age", "amh_ng_ml", "day", "avg_follicle_size_mm",
+    "follicle_count", "estradiol_pg_ml", "progesterone_ng_ml", "trigger_recommended",
+    "age_group", "amh_group", "follicle_size_band", "follicle_size_12_19",
+    "high_follicle_count", "high_e2", "high_p4", "late_cycle",
+]
+
+
+def scan_timestamps(df: pd.DataFrame) -> pd.Series:
+    """Event time of each scan: cycle start + (stimulation day - 1) days, UTC"""
+    if CYCLE_START_COL in df.columns:
+        start = pd.to_datetime(df[CYCLE_START_COL], utc=True)
+    else:
+        start = pd.Series(pd.Timestamp(CYCLE_ANCHOR_DATE, tz="UTC"), index=df.index)
+    return start + pd.to_timedelta(df["Day"] - 1, unit="D")
+
+
+def write_offline_source(csv_path: str = RAW_CSV_PATH, out_dir: str = OFFLINE_SOURCE_DIR) -> int:
+    """Write the date-partitioned Parquet FileSource; returns rows written"""
+    df = pd.read_csv(csv_path)
+    df[ENTITY_KEY] = df[ENTITY_KEY].str.upper().str.strip()
+    df["AMH (ng/mL)"] = df["AMH (ng/mL)"].fillna(df["AMH (ng/mL)"].median())
+    df[TIMESTAMP_COL] = scan_timestamps(df)
+    df[PARTITION_COL] = df[TIMESTAMP_COL].dt.strftime("%Y-%m-%d")
+
+    # Build next to the target and swap so Feast never reads a half-written source
+    parent = os.path.dirname(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".source_")
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        root_path=tmp_dir,
+        partition_cols=[PARTITION_COL],
+    )
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return len(df)
+
+
+def load_entity_df(source_dir: str = OFFLINE_SOURCE_DIR) -> pd.DataFrame:
+    """Labeled scans (key, event time, label) to join features onto"""
+    return pd.read_parquet(source_dir, columns=[ENTITY_KEY, TIMESTAMP_COL, LABEL_COL])
+
+
+def iter_entity_chunks(entity_df: pd.DataFrame, chunk_rows: int = ENTITY_CHUNK_ROWS):
+    """Time-ordered chunks, so each join only spans a narrow range of partitions"""
+    entity_df = entity_df.sort_values(TIMESTAMP_COL, kind="stable").reset_index(drop=True)
+    for start in range(0, len(entity_df), chunk_rows):
+        yield entity_df.iloc[start:start + chunk_rows]
+
+
+def to_training_frame(joined: pd.DataFrame) -> pd.DataFrame:
+    """Feast column names -> processed-data names, cleaned like the CSV pipeline"""
+    df = standardize_columns(joined)
+    df = handle_missing(df)
+    df = drop_impossible_values(df)
+    df = add_feature_engineering(df)
+    # Plain object columns, as the CSV round trip gives mlflow_training.py
+    for col in df.select_dtypes("category").columns:
+        df[col] = df[col].astype(object)
+    return df[[c for c in TRAINING_COLUMNS if c in df.columns] + [TIMESTAMP_COL]]
+
+
+def source_fingerprint() -> str:
+    """sha256 over the offline source and the code that joins and cleans it"""
+    files = set()
+    for pattern in FINGERPRINT_GLOBS:
+        files.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    payload = {
+        "feature_service": FEATURE_SERVICE,
+        "feature_spec_version": FEATURE_SPEC_VERSION,
+        "files": {os.path.relpath(p, PROJECT_ROOT).replace(os.sep, "/"): file_sha256(p) for p in sorted(files)},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def training_set_path(fingerprint: str) -> str:
+    return os.path.join(TRAINING_SET_DIR, f"{TRAINING_SET_PREFIX}{fingerprint[:16]}.parquet")
+
+
+def build_training_set(store=None, entity_df: pd.DataFrame = None,
+                       chunk_rows: int = ENTITY_CHUNK_ROWS,
+                       output_path: str = None) -> pd.DataFrame:
+    """Point-in-time join of the labeled scans against the feature service"""
+    from feast import FeatureStore
+
+    store = store or FeatureStore(repo_path=FEAST_REPO_PATH)
+    service = store.get_feature_service(FEATURE_SERVICE)
+    entity_df = load_entity_df() if entity_df is None else entity_df
+
+    start = time.perf_counter()
+    frames = []
+    for i, chunk in enumerate(iter_entity_chunks(entity_df, chunk_rows)):
+        joined = store.get_historical_features(entity_df=chunk, features=service).to_df()
+        frames.append(to_training_frame(joined))
+        print(f"  chunk {i}: {len(chunk)} entity rows joined")
+    df = pd.concat(frames, ignore_index=True).sort_values(TIMESTAMP_COL, kind="stable")
+    elapsed = time.perf_counter() - start
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Unique temp name: parallel candidate tasks may build the same set
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix=".parquet.tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    print(f"✅ Training set: {len(df)} rows in {elapsed:.2f}s ({len(df) / max(elapsed, 1e-9):.0f} rows/s)")
+    return df
+
+
+def prune_training_sets(keep: str):
+    """Remove training sets built from earlier sources"""
+    for path in glob.glob(os.path.join(TRAINING_SET_DIR, f"{TRAINING_SET_PREFIX}*.parquet")):
+        if os.path.abspath(path) != os.path.abspath(keep):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # still being read by another task; next build retries
+
+
+def load_training_set(rebuild: bool = False) -> pd.DataFrame:
+    """Training frame for mlflow_training.py; rebuilt whenever the source fingerprint changes"""
+    path = training_set_path(source_fingerprint())
+    if rebuild or not os.path.exists(path):
+        df = build_training_set(output_path=path)
+        prune_training_sets(keep=path)
+        return df
+    print(f"✅ Training set unchanged since last build: {path}")
+    return pd.read_parquet(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the point-in-time IVF training set from Feast")
+    parser.add_argument("--write-source", action="store_true",
+                        help="rewrite the partitioned offline source from the raw CSV first")
+    parser.add_argument("--chunk-rows", type=int, default=ENTITY_CHUNK_ROWS)
+    parser.add_argument("--output", help="default: the fingerprint-keyed path load_training_set() reads")
+    args = parser.parse_args()
+
+    if args.write_source:
+        rows = write_offline_source()
+        print(f"✅ Offline source: {rows} rows under {OFFLINE_SOURCE_DIR}")
+    build_training_set(chunk_rows=args.chunk_rows,
+                       output_path=args.output or training_set_path(source_fingerprint()))
@@ -0,0 +1,122 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mlflow
+import mlflow.sklearn
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+from src.training.profiling import log_profile
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+# Per-request limits enforced by the MLflow tracking server for log_batch
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+
+UPLOAD_WORKERS = 2
+
+
+class BatchedRunLogger:
+    """
+    Buffer params, metrics and tags for one run and send them with
+    log_batch instead of one tracking request per value.
+    """
+
+    def __init__(self, run_id: str, client: MlflowClient = None):
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self._params = {}
+        self._metrics = []
+        self._tags = {}
+
+    def log_params(self, params: dict):
+        for k, v in params.items():
+            self._params[k] = str(v)
+
+    def log_metrics(self, metrics: dict, step: int = 0):
+        timestamp = int(time.time() * 1000)
+        for k, v in metrics.items():
+            self._metrics.append(Metric(k, float(v), timestamp, step))
+
+    def set_tags(self, tags: dict):
+        for k, v in tags.items():
+            self._tags[k] = str(v)
+
+    def flush(self):
+        """Send everything buffered so far, split to the server's batch limits"""
+        params = [Param(k, v) for k, v in self._params.items()]
+        tags = [RunTag(k, v) for k, v in self._tags.items()]
+        metrics = self._metrics
+
+        while params or metrics or tags:
+            self.client.log_batch(
+                self.run_id,
+                metrics=metrics[:MAX_METRICS_PER_BATCH],
+                params=params[:MAX_PARAMS_PER_BATCH],
+                tags=tags[:MAX_TAGS_PER_BATCH],
+            )
+            metrics = metrics[MAX_METRICS_PER_BATCH:]
+            params = params[MAX_PARAMS_PER_BATCH:]
+            tags = tags[MAX_TAGS_PER_BATCH:]
+
+        self._params = {}
+        self._metrics = []
+        self._tags = {}
+
+
+class BackgroundUploader:
+    """
+    Run artifact / model uploads on worker threads so the next candidate
+    can start training while the previous one is still being serialized.
+    Call wait() as the barrier before reading runs back from the server.
+    """
+
+    def __init__(self, max_workers: int = UPLOAD_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mlflow-upload"
+        )
+        self._futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """Block until every submitted upload is done; re-raise the first failure"""
+        errors = []
+        for future in self._futures:
+            exc = future.exception()
+            if exc is not None:
+                errors.append(exc)
+        self._futures = []
+        if errors:
+            raise errors[0]
+
+    def shutdown(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+
+def finish_run(
+    logger: BatchedRunLogger, model=None, artifact_path: str = "model", profiler=None
+):
+    """
+    Flush buffered values, log the model and close the run.
+    Safe to run on an uploader thread: the active-run stack is thread local.
+    If a StageProfiler is given, model logging is timed as the log_model
+    stage and the profile is logged before the run is closed.
+    """
+    with mlflow.start_run(run_id=logger.run_id):
+        logger.flush()
+        if model is not None:
+            if profiler is not None:
+                with profiler.stage("log_model"):
+                    mlflow.sklearn.log_model(model, artifact_path=artifact_path)
+            else:
+                mlflow.sklearn.log_model(model, artifact_path=artifact_path)
+        if profiler is not None:
+            log_profile(logger.client, logger.run_id, profiler)
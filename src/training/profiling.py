@@ -0,0 +1,169 @@
+import cProfile
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from mlflow.entities import Metric
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; fall back to the process high-water mark
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+# Set IVF_CPROFILE=1 to dump a cProfile file per stage as a run artifact
+CPROFILE_ENV = "IVF_CPROFILE"
+RSS_SAMPLE_INTERVAL_S = 0.05
+METRIC_PREFIX = "profile"
+ARTIFACT_DIR = "profile"
+
+# Only one cProfile collector can be active per process at a time
+_cprofile_lock = threading.Lock()
+
+
+def _current_rss_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    if resource is not None:
+        # ru_maxrss is KB on Linux; already the peak, not the current value
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+class _RssSampler(threading.Thread):
+    """Poll RSS in the background and keep the maximum seen during a stage"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak_mb = _current_rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(RSS_SAMPLE_INTERVAL_S):
+            rss = _current_rss_mb()
+            if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+                self.peak_mb = rss
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        rss = _current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+        return self.peak_mb
+
+
+class StageProfiler:
+    """
+    Record wall time, CPU time and peak RSS for named pipeline stages.
+    CPU time and peak RSS are process wide, so stages running concurrently
+    on other threads (background model uploads) show up in each other.
+    """
+
+    def __init__(self, cprofile: bool = None):
+        if cprofile is None:
+            cprofile = os.environ.get(CPROFILE_ENV, "0") == "1"
+        self.cprofile = cprofile
+        self.stages = {}
+        self.prof_files = []
+        self._prof_dir = None
+
+    @contextmanager
+    def stage(self, name: str, cprofile: bool = None):
+        """Time a block; cprofile=False skips the dump for wrapper stages"""
+        sampler = _RssSampler()
+        sampler.start()
+        profiler = self._start_cprofile() if cprofile is not False else None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            cpu_s = time.process_time() - cpu_start
+            wall_s = time.perf_counter() - wall_start
+            peak_mb = sampler.stop()
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_lock.release()
+                self._dump_cprofile(name, profiler)
+            self.stages[name] = {
+                "wall_s": round(wall_s, 6),
+                "cpu_s": round(cpu_s, 6),
+                "peak_rss_mb": round(peak_mb, 2) if peak_mb is not None else None,
+            }
+
+    def _start_cprofile(self):
+        if not self.cprofile:
+            return None
+        # A stage already being profiled (e.g. on an upload thread) wins
+        if not _cprofile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Some other profiling tool is active
+            _cprofile_lock.release()
+            return None
+        return profiler
+
+    def _dump_cprofile(self, name: str, profiler: cProfile.Profile):
+        if self._prof_dir is None:
+            self._prof_dir = tempfile.mkdtemp(prefix="ivf_profile_")
+        path = os.path.join(self._prof_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        self.prof_files.append(path)
+
+    def merge(self, other: "StageProfiler"):
+        """Copy another profiler's stages in (e.g. shared load_data timings)"""
+        self.stages.update(other.stages)
+        self.prof_files.extend(other.prof_files)
+
+    def metrics(self, stages: list = None) -> dict:
+        """Flatten to MLflow metric names like profile.fit.wall_s"""
+        out = {}
+        for stage, values in self.stages.items():
+            if stages is not None and stage not in stages:
+                continue
+            for key, value in values.items():
+                if value is not None:
+                    out[f"{METRIC_PREFIX}.{stage}.{key}"] = value
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": self.stages,
+            "cprofile": self.cprofile,
+            "rss_source": "psutil" if psutil is not None else (
+                "ru_maxrss" if resource is not None else None
+            ),
+        }
+
+
+def log_profile(client, run_id: str, profiler: StageProfiler, stages: list = None):
+    """
+    Log stage metrics, the JSON summary and any cProfile dumps to a run.
+    Passing stages only logs those metrics and skips the artifacts.
+    """
+    timestamp = int(time.time() * 1000)
+    client.log_batch(
+        run_id,
+        metrics=[
+            Metric(k, float(v), timestamp, 0)
+            for k, v in profiler.metrics(stages).items()
+        ],
+    )
+    if stages is not None:
+        return
+    client.log_dict(run_id, profiler.to_dict(), f"{ARTIFACT_DIR}/stages.json")
+    for path in profiler.prof_files:
+        client.log_artifact(run_id, path, artifact_path=ARTIFACT_DIR)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import mlflow
+import mlflow.sklearn
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+SINGLE_ROW_ITERATIONS = 200
+BATCH_ROWS = 10_000
+TAG_PREFIX = "bench."
+
+
+class PromotionPolicy:
+    """
+    Budgets a candidate must meet before it is registered.
+    Every limit can be overridden with an environment variable so the DAG
+    can tighten or relax them without a code change.
+    """
+
+    def __init__(
+        self,
+        max_p99_latency_ms: float = 50.0,
+        max_model_size_mb: float = 200.0,
+        max_load_time_s: float = 10.0,
+        min_auc_gain: float = 0.0,
+    ):
+        self.max_p99_latency_ms = max_p99_latency_ms
+        self.max_model_size_mb = max_model_size_mb
+        self.max_load_time_s = max_load_time_s
+        self.min_auc_gain = min_auc_gain
+
+    @classmethod
+    def from_env(cls):
+        defaults = cls()
+        return cls(
+            max_p99_latency_ms=float(os.environ.get("IVF_MAX_P99_LATENCY_MS", defaults.max_p99_latency_ms)),
+            max_model_size_mb=float(os.environ.get("IVF_MAX_MODEL_SIZE_MB", defaults.max_model_size_mb)),
+            max_load_time_s=float(os.environ.get("IVF_MAX_LOAD_TIME_S", defaults.max_load_time_s)),
+            min_auc_gain=float(os.environ.get("IVF_MIN_AUC_GAIN", defaults.min_auc_gain)),
+        )
+
+    def budget_violations(self, bench: dict) -> list:
+        """Latency / memory budget failures for one benchmarked candidate"""
+        violations = []
+        if bench["p99_latency_ms"] > self.max_p99_latency_ms:
+            violations.append(
+                f"p99 latency {bench['p99_latency_ms']:.2f}ms > {self.max_p99_latency_ms}ms"
+            )
+        if bench["model_size_mb"] > self.max_model_size_mb:
+            violations.append(
+                f"model size {bench['model_size_mb']:.2f}MB > {self.max_model_size_mb}MB"
+            )
+        if bench["load_time_s"] > self.max_load_time_s:
+            violations.append(
+                f"load time {bench['load_time_s']:.2f}s > {self.max_load_time_s}s"
+            )
+        return violations
+
+    def auc_gain_ok(self, candidate_auc: float, champion_auc: float = None) -> bool:
+        if champion_auc is None:
+            return True
+        return candidate_auc - champion_auc >= self.min_auc_gain
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def _dir_size_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def benchmark_model(model_uri: str, X_sample) -> dict:
+    """
+    Download a logged model once, then measure load time, on-disk size,
+    single-row predict_proba latency (p50/p99) and batch throughput.
+    """
+    local_dir = tempfile.mkdtemp(prefix="ivf_bench_")
+    try:
+        local_path = mlflow.artifacts.download_artifacts(model_uri, dst_path=local_dir)
+        size_bytes = _dir_size_bytes(local_path)
+
+        start = time.perf_counter()
+        model = mlflow.sklearn.load_model(local_path)
+        load_time_s = time.perf_counter() - start
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
+
+    # Pre-slice single rows so the timing only covers predict_proba
+    rows = [X_sample.iloc[[i % len(X_sample)]] for i in range(SINGLE_ROW_ITERATIONS)]
+    model.predict_proba(rows[0])  # warm-up
+
+    latencies = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        latencies[i] = time.perf_counter() - start
+
+    reps = int(np.ceil(BATCH_ROWS / len(X_sample)))
+    batch = X_sample.iloc[np.tile(np.arange(len(X_sample)), reps)[:BATCH_ROWS]]
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "p50_latency_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_latency_ms": float(np.percentile(latencies, 99) * 1000),
+        "batch_rows_per_s": float(len(batch) / batch_s),
+        "model_size_mb": size_bytes / 1024 ** 2,
+        "load_time_s": load_time_s,
+    }
+
+
+def tag_model_version(client, name: str, version: str, bench: dict):
+    """Store benchmark results on the registered model version"""
+    for key, value in bench.items():
+        client.set_model_version_tag(name, version, f"{TAG_PREFIX}{key}", f"{value:.6g}")
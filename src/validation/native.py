@@ -0,0 +1,249 @@
+"""
+Native single-pass validator for the expectation suite in suite.py.
+
+Expectations are grouped by column; each column is read once (null mask,
+non-null values, dtype) and every expectation on it is answered from
+those arrays with vectorized numpy operations. The report has the same
+JSON shape as Great Expectations' validation result.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+VALIDATOR_NAME = "ivf-native-validator"
+VALIDATOR_VERSION = "1"
+PARTIAL_UNEXPECTED_COUNT = 20  # GE's BASIC result_format limit
+RESULT_FORMAT = "BASIC"
+
+TABLE_EXPECTATIONS = {
+    "expect_table_row_count_to_be_between",
+    "expect_table_column_count_to_be_between",
+}
+
+
+def _pct(part: int, whole: int):
+    return part / whole * 100 if whole else None
+
+
+def _between_mask(values: np.ndarray, kwargs: dict) -> np.ndarray:
+    """True where a value is outside [min_value, max_value] (None = unbounded)"""
+    low, high = kwargs.get("min_value"), kwargs.get("max_value")
+    bad = np.zeros(len(values), dtype=bool)
+    if low is not None:
+        bad |= values < low
+    if high is not None:
+        bad |= values > high
+    return bad
+
+
+class ColumnProfile:
+    """Everything the column expectations need, computed in one read"""
+
+    def __init__(self, series: pd.Series):
+        self.element_count = len(series)
+        null_mask = series.isna().to_numpy()
+        self.missing_count = int(null_mask.sum())
+        self.nonnull = series[~null_mask].to_numpy()
+        self.dtype_name = series.dtype.name
+        self.dtype_type_name = series.dtype.type.__name__
+        self._numeric = None
+        self._distinct = None
+
+    @property
+    def numeric(self) -> np.ndarray:
+        if self._numeric is None:
+            self._numeric = pd.to_numeric(pd.Series(self.nonnull), errors="coerce").to_numpy(dtype="float64")
+        return self._numeric
+
+    @property
+    def distinct(self) -> np.ndarray:
+        if self._distinct is None:
+            self._distinct = pd.unique(self.nonnull)
+        return self._distinct
+
+
+def map_result(element_count: int, missing_count: int, unexpected_count: int, partial: list):
+    """GE's result block for column-map expectations (between / in_set)"""
+    nonmissing = element_count - missing_count
+    return {
+        "element_count": element_count,
+        "missing_count": missing_count,
+        "missing_percent": _pct(missing_count, element_count),
+        "unexpected_count": unexpected_count,
+        "unexpected_percent": _pct(unexpected_count, nonmissing),
+        "unexpected_percent_total": _pct(unexpected_count, element_count),
+        "unexpected_percent_nonmissing": _pct(unexpected_count, nonmissing),
+        "partial_unexpected_list": partial[:PARTIAL_UNEXPECTED_COUNT],
+    }
+
+
+def not_null_result(element_count: int, missing_count: int) -> dict:
+    return {
+        "element_count": element_count,
+        "unexpected_count": missing_count,
+        "unexpected_percent": _pct(missing_count, element_count),
+        "unexpected_percent_total": _pct(missing_count, element_count),
+        "partial_unexpected_list": [None] * min(missing_count, PARTIAL_UNEXPECTED_COUNT),
+    }
+
+
+def distinct_result(distinct_values, value_set, element_count: int):
+    """(success, result) for expect_column_distinct_values_to_be_in_set"""
+    observed = sorted({str(v) for v in distinct_values})
+    allowed = {str(v) for v in value_set}
+    return set(observed) <= allowed, {
+        "observed_value": observed,
+        "element_count": element_count,
+        "missing_count": None,
+        "missing_percent": None,
+    }
+
+
+def type_ok(expectation_type: str, kwargs: dict, dtype_name: str, dtype_type_name: str) -> bool:
+    if expectation_type == "expect_column_values_to_be_in_type_list":
+        return dtype_name in kwargs["type_list"]
+    return dtype_name == kwargs["type_"] or dtype_type_name == kwargs["type_"]
+
+
+def unexpected_mask(expectation_type: str, kwargs: dict, profile: ColumnProfile) -> np.ndarray:
+    """Boolean mask over profile.nonnull for the column-map expectations"""
+    if expectation_type == "expect_column_values_to_be_between":
+        values = profile.numeric
+        # Non-numeric values count as unexpected, like GE's comparison failure
+        return _between_mask(values, kwargs) | np.isnan(values)
+    return ~pd.Series(profile.nonnull).isin(kwargs["value_set"]).to_numpy()
+
+
+MAP_EXPECTATIONS = {
+    "expect_column_values_to_be_between",
+    "expect_column_values_to_be_in_set",
+}
+TYPE_EXPECTATIONS = {
+    "expect_column_values_to_be_in_type_list",
+    "expect_column_values_to_be_of_type",
+}
+
+
+def evaluate_column(expectation_type: str, kwargs: dict, profile: ColumnProfile):
+    """(success, result) for one column expectation"""
+    if expectation_type == "expect_column_to_exist":
+        return True, {}
+
+    if expectation_type == "expect_column_values_to_not_be_null":
+        return profile.missing_count == 0, not_null_result(profile.element_count, profile.missing_count)
+
+    if expectation_type in TYPE_EXPECTATIONS:
+        ok = type_ok(expectation_type, kwargs, profile.dtype_name, profile.dtype_type_name)
+        observed = profile.dtype_name if expectation_type.endswith("type_list") else profile.dtype_type_name
+        return ok, {"observed_value": observed}
+
+    if expectation_type in MAP_EXPECTATIONS:
+        unexpected = unexpected_mask(expectation_type, kwargs, profile)
+        count = int(unexpected.sum())
+        partial = profile.nonnull[unexpected][:PARTIAL_UNEXPECTED_COUNT].tolist()
+        return count == 0, map_result(profile.element_count, profile.missing_count, count, partial)
+
+    if expectation_type == "expect_column_distinct_values_to_be_in_set":
+        return distinct_result(profile.distinct, kwargs["value_set"], profile.element_count)
+
+    raise NotImplementedError(expectation_type)
+
+
+def result_entry(expectation: dict, success: bool, result: dict, error: str = None) -> dict:
+    kwargs = dict(expectation["kwargs"], result_format=RESULT_FORMAT)
+    return {
+        "success": success,
+        "expectation_config": {
+            "expectation_type": expectation["expectation_type"],
+            "kwargs": kwargs,
+            "meta": {},
+        },
+        "result": result,
+        "meta": {},
+        "exception_info": {
+            "raised_exception": error is not None,
+            "exception_message": error,
+            "exception_traceback": None,
+        },
+    }
+
+
+def group_by_column(suite: list) -> "OrderedDict[str, list]":
+    """Column name -> indexes of the suite's column expectations"""
+    by_column = OrderedDict()
+    for i, expectation in enumerate(suite):
+        if expectation["expectation_type"] not in TABLE_EXPECTATIONS:
+            by_column.setdefault(expectation["kwargs"]["column"], []).append(i)
+    return by_column
+
+
+def table_results(suite: list, results: list, n_rows: int, n_columns: int) -> None:
+    """Fill in the table-level expectations of suite into results"""
+    for i, expectation in enumerate(suite):
+        etype, kwargs = expectation["expectation_type"], expectation["kwargs"]
+        if etype == "expect_table_row_count_to_be_between":
+            observed = n_rows
+        elif etype == "expect_table_column_count_to_be_between":
+            observed = n_columns
+        else:
+            continue
+        ok = not _between_mask(np.array([observed]), kwargs)[0]
+        results[i] = result_entry(expectation, bool(ok), {"observed_value": observed})
+
+
+def missing_column_results(suite: list, results: list, column: str, indexes: list) -> None:
+    for i in indexes:
+        exists = suite[i]["expectation_type"] == "expect_column_to_exist"
+        results[i] = result_entry(
+            suite[i], False, {},
+            None if exists else f"Column '{column}' not found in dataframe",
+        )
+
+
+def validate(df: pd.DataFrame, suite: list, suite_name: str = "default") -> dict:
+    """Validate df against suite; returns a GE-shaped validation result dict"""
+    run_time = datetime.now(timezone.utc)
+    start = time.perf_counter()
+
+    results = [None] * len(suite)
+    table_results(suite, results, len(df), df.shape[1])
+
+    for column, indexes in group_by_column(suite).items():
+        if column not in df.columns:
+            missing_column_results(suite, results, column, indexes)
+            continue
+        profile = ColumnProfile(df[column])
+        for i in indexes:
+            ok, result = evaluate_column(suite[i]["expectation_type"], suite[i]["kwargs"], profile)
+            results[i] = result_entry(suite[i], bool(ok), result)
+
+    return build_report(results, suite_name, run_time, time.perf_counter() - start)
+
+
+def build_report(results: list, suite_name: str, run_time: datetime, elapsed_s: float) -> dict:
+    successful = sum(r["success"] for r in results)
+    return {
+        "success": successful == len(results),
+        "results": results,
+        "evaluation_parameters": {},
+        "statistics": {
+            "evaluated_expectations": len(results),
+            "successful_expectations": successful,
+            "unsuccessful_expectations": len(results) - successful,
+            "success_percent": _pct(successful, len(results)),
+        },
+        "meta": {
+            "validator": VALIDATOR_NAME,
+            "validator_version": VALIDATOR_VERSION,
+            "expectation_suite_name": suite_name,
+            "run_id": {"run_name": None, "run_time": run_time.isoformat()},
+            "validation_time": run_time.strftime("%Y%m%dT%H%M%S.%fZ"),
+            "validation_seconds": round(elapsed_s, 6),
+        },
+    }
@@ -0,0 +1,139 @@
+"""
+Online input checks compiled from the offline expectation suite.
+
+The row-level expectations in suite.py (not-null, value ranges, value
+sets) are compiled once into arrays: a column list with lower/upper bound
+vectors for the range rules and frozensets for the set rules. A batch is
+then checked with a handful of vectorized comparisons, and a single
+record with a tight loop over precomputed tuples. Because the rules are
+read from the same suite, online and offline checks cannot drift apart.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.validation.suite import build_suite
+
+ROW_EXPECTATIONS = {
+    "expect_column_values_to_not_be_null",
+    "expect_column_values_to_be_between",
+    "expect_column_values_to_be_in_set",
+    "expect_column_distinct_values_to_be_in_set",
+}
+
+
+class CheckResult:
+    """Per-row verdicts for one checked batch"""
+
+    def __init__(self, rule_names: list, bad: np.ndarray):
+        self.rule_names = rule_names
+        self.bad = bad                       # rows x rules boolean matrix
+        self.row_ok = ~bad.any(axis=1)
+
+    @property
+    def n_invalid(self) -> int:
+        return int((~self.row_ok).sum())
+
+    def rule_counts(self) -> dict:
+        counts = self.bad.sum(axis=0)
+        return {name: int(c) for name, c in zip(self.rule_names, counts) if c}
+
+    def violations(self) -> list:
+        """Rule names broken by each row ([] for valid rows)"""
+        out = [[] for _ in range(len(self.row_ok))]
+        for row, col in zip(*np.nonzero(self.bad)):
+            out[row].append(self.rule_names[col])
+        return out
+
+
+class InputChecker:
+    """Row-level suite rules restricted to the given feature columns"""
+
+    def __init__(self, columns, suite: list = None):
+        columns = list(columns)
+        suite = suite if suite is not None else build_suite(columns)
+        rules = [
+            e for e in suite
+            if e["expectation_type"] in ROW_EXPECTATIONS and e["kwargs"]["column"] in columns
+        ]
+        self.null_rules = [e["kwargs"]["column"] for e in rules
+                           if e["expectation_type"] == "expect_column_values_to_not_be_null"]
+        ranges = [e for e in rules if e["expectation_type"] == "expect_column_values_to_be_between"]
+        self.range_cols = [e["kwargs"]["column"] for e in ranges]
+        self.range_low = np.array([_bound(e["kwargs"].get("min_value"), -np.inf) for e in ranges])
+        self.range_high = np.array([_bound(e["kwargs"].get("max_value"), np.inf) for e in ranges])
+        self.set_rules = [
+            (e["kwargs"]["column"], frozenset(e["kwargs"]["value_set"]))
+            for e in rules if "in_set" in e["expectation_type"]
+        ]
+        self.rule_names = (
+            [f"{c}:not_null" for c in self.null_rules]
+            + [f"{c}:between" for c in self.range_cols]
+            + [f"{c}:in_set" for c, _ in self.set_rules]
+        )
+        self.columns = list(dict.fromkeys(self.null_rules + self.range_cols + [c for c, _ in self.set_rules]))
+        self._record_rules = (
+            [(c, None, None, None) for c in self.null_rules]
+            + [(c, lo, hi, None) for c, lo, hi in zip(self.range_cols, self.range_low, self.range_high)]
+            + [(c, None, None, values) for c, values in self.set_rules]
+        )
+
+    def check_frame(self, df: pd.DataFrame) -> CheckResult:
+        """Vectorized check of a batch; columns missing from df are skipped"""
+        n = len(df)
+        arrays, nulls = {}, {}
+        for col in self.columns:
+            if col in df.columns:
+                arrays[col] = df[col].to_numpy()
+                nulls[col] = pd.isna(arrays[col])
+        bad = np.zeros((n, len(self.rule_names)), dtype=bool)
+
+        for j, col in enumerate(self.null_rules):
+            if col in arrays:
+                bad[:, j] = nulls[col]
+
+        offset = len(self.null_rules)
+        idx = [i for i, col in enumerate(self.range_cols) if col in arrays]
+        if idx:
+            values = np.column_stack([_as_float(arrays[self.range_cols[i]]) for i in idx])
+            present = ~np.column_stack([nulls[self.range_cols[i]] for i in idx])
+            # Non-numeric values coerce to NaN and fail the range like offline;
+            # genuinely missing values only count under not_null
+            inside = (values >= self.range_low[idx]) & (values <= self.range_high[idx])
+            bad[:, offset + np.array(idx)] = present & ~inside
+
+        offset += len(self.range_cols)
+        for j, (col, values) in enumerate(self.set_rules):
+            if col in arrays:
+                member = np.fromiter((v in values for v in arrays[col]), dtype=bool, count=n)
+                bad[:, offset + j] = ~nulls[col] & ~member
+
+        return CheckResult(self.rule_names, bad)
+
+    def check_record(self, record: dict) -> list:
+        """Rule names a single record breaks; no pandas on this path"""
+        broken = []
+        for (col, low, high, values), name in zip(self._record_rules, self.rule_names):
+            if col not in record:
+                continue
+            value = record[col]
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                if low is None and values is None:
+                    broken.append(name)
+            elif values is not None:
+                if value not in values:
+                    broken.append(name)
+            elif low is not None and not (low <= value <= high):
+                broken.append(name)
+        return broken
+
+
+def _as_float(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind in "biuf":
+        return values.astype("float64", copy=False)
+    return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+def _bound(value, default: float) -> float:
+    return default if value is None else float(value)
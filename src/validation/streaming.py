@@ -0,0 +1,308 @@
+"""
+Mergeable streaming validation for chunked or partitioned datasets.
+
+ValidationState consumes DataFrame chunks one at a time and keeps only
+summary state per column: element/null counts, observed dtypes, min/max,
+per-expectation unexpected counts (plus GE's first-20 partial list),
+value-set tallies and an approximate quantile sketch. States built by
+separate workers merge into one, and finalize() turns the merged state
+into the same GE-shaped report the native validator produces, so memory
+stays flat no matter how many rows or partitions are validated.
+"""
+import glob
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.validation.native import (
+    MAP_EXPECTATIONS,
+    PARTIAL_UNEXPECTED_COUNT,
+    TYPE_EXPECTATIONS,
+    ColumnProfile,
+    build_report,
+    distinct_result,
+    group_by_column,
+    map_result,
+    missing_column_results,
+    not_null_result,
+    result_entry,
+    table_results,
+    type_ok,
+    unexpected_mask,
+)
+
+# ===================================================================
+# CONFIG
+# ===================================================================
+DEFAULT_CHUNK_SIZE = 100_000
+SKETCH_CENTROIDS = 256          # rank error roughly 1 / SKETCH_CENTROIDS
+MAX_TALLY_KEYS = 10_000         # value-set tallies stop growing past this
+SUMMARY_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+TALLY_EXPECTATIONS = {
+    "expect_column_values_to_be_in_set",
+    "expect_column_distinct_values_to_be_in_set",
+}
+SKETCH_EXPECTATIONS = {
+    "expect_column_values_to_be_between",
+    "expect_column_values_to_be_in_type_list",
+}
+
+
+class QuantileSketch:
+    """Mergeable approximate quantiles from equal-weight centroids"""
+
+    def __init__(self, max_centroids: int = SKETCH_CENTROIDS):
+        self.max_centroids = max_centroids
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.sort(values[~np.isnan(values)])
+        if not len(values):
+            return
+        self.min = min(self.min, values[0])
+        self.max = max(self.max, values[-1])
+        starts = np.unique(np.linspace(0, len(values), self.max_centroids + 1, dtype=np.int64)[:-1])
+        weights = np.diff(np.append(starts, len(values))).astype("float64")
+        means = np.add.reduceat(values, starts) / weights
+        self._absorb(means, weights)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._absorb(other.means, other.weights)
+
+    def _absorb(self, means: np.ndarray, weights: np.ndarray) -> None:
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        if len(means) > self.max_centroids:
+            # Bucket centroids by cumulative rank into max_centroids equal-weight groups
+            before = np.cumsum(weights) - weights
+            group = np.minimum(before / weights.sum() * self.max_centroids,
+                               self.max_centroids - 1).astype(np.int64)
+            merged_w = np.bincount(group, weights)
+            merged_m = np.bincount(group, weights * means)
+            keep = merged_w > 0
+            means, weights = merged_m[keep] / merged_w[keep], merged_w[keep]
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float):
+        if not len(self.weights):
+            return None
+        centers = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.concatenate([[0], centers, [self.count]])
+        points = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * self.count, ranks, points))
+
+
+class ColumnState:
+    """Mergeable summary of one column across chunks"""
+
+    def __init__(self, track_tally: bool, track_sketch: bool):
+        self.element_count = 0
+        self.missing_count = 0
+        self.dtypes = {}                 # dtype name -> dtype.type name
+        self.unexpected = Counter()      # expectation index -> count
+        self.partial = {}                # expectation index -> first unexpected values
+        self.tally = Counter() if track_tally else None
+        self.tally_truncated = False
+        self.sketch = QuantileSketch() if track_sketch else None
+
+    def update(self, profile: ColumnProfile, suite: list, indexes: list) -> None:
+        self.element_count += profile.element_count
+        self.missing_count += profile.missing_count
+        self.dtypes.setdefault(profile.dtype_name, profile.dtype_type_name)
+
+        for i in indexes:
+            etype, kwargs = suite[i]["expectation_type"], suite[i]["kwargs"]
+            if etype not in MAP_EXPECTATIONS:
+                continue
+            mask = unexpected_mask(etype, kwargs, profile)
+            self.unexpected[i] += int(mask.sum())
+            kept = self.partial.setdefault(i, [])
+            if len(kept) < PARTIAL_UNEXPECTED_COUNT and mask.any():
+                kept.extend(profile.nonnull[mask][:PARTIAL_UNEXPECTED_COUNT - len(kept)].tolist())
+
+        if self.tally is not None:
+            self._add_tally(Counter(pd.Series(profile.nonnull).value_counts().to_dict()))
+        if self.sketch is not None:
+            self.sketch.update(profile.numeric)
+
+    def _add_tally(self, counts: Counter) -> None:
+        if self.tally_truncated:
+            return
+        self.tally.update(counts)
+        if len(self.tally) > MAX_TALLY_KEYS:
+            self.tally_truncated = True
+
+    def merge(self, other: "ColumnState") -> None:
+        self.element_count += other.element_count
+        self.missing_count += other.missing_count
+        for name, type_name in other.dtypes.items():
+            self.dtypes.setdefault(name, type_name)
+        self.unexpected.update(other.unexpected)
+        for i, values in other.partial.items():
+            kept = self.partial.setdefault(i, [])
+            kept.extend(values[:PARTIAL_UNEXPECTED_COUNT - len(kept)])
+        if self.tally is not None:
+            self._add_tally(other.tally)
+            self.tally_truncated |= other.tally_truncated
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+
+    def dtype(self):
+        """(name, type name) the concatenated column would have"""
+        if len(self.dtypes) == 1:
+            return next(iter(self.dtypes.items()))
+        try:
+            common = np.result_type(*[np.dtype(name) for name in self.dtypes])
+        except TypeError:
+            return "object", "object_"
+        return common.name, common.type.__name__
+
+    def summary(self) -> dict:
+        out = {"element_count": self.element_count, "missing_count": self.missing_count}
+        if self.sketch is not None and self.sketch.count:
+            out["min"] = float(self.sketch.min)
+            out["max"] = float(self.sketch.max)
+            out["quantiles"] = {str(q): self.sketch.quantile(q) for q in SUMMARY_QUANTILES}
+        if self.tally is not None:
+            out["value_counts"] = {str(k): int(v) for k, v in self.tally.most_common(50)}
+            out["value_counts_truncated"] = self.tally_truncated
+        return out
+
+
+class ValidationState:
+    """Mergeable validation state for one expectation suite"""
+
+    def __init__(self, suite: list):
+        self.suite = suite
+        self.by_column = group_by_column(suite)
+        self.n_rows = 0
+        self.columns = []
+        self.column_states = {}
+
+    def update(self, df: pd.DataFrame) -> "ValidationState":
+        self.n_rows += len(df)
+        self.columns.extend(c for c in df.columns if c not in self.columns)
+        for column, indexes in self.by_column.items():
+            if column not in df.columns:
+                continue
+            state = self.column_states.get(column)
+            if state is None:
+                types = {self.suite[i]["expectation_type"] for i in indexes}
+                state = self.column_states[column] = ColumnState(
+                    track_tally=bool(types & TALLY_EXPECTATIONS),
+                    track_sketch=bool(types & SKETCH_EXPECTATIONS),
+                )
+            state.update(ColumnProfile(df[column]), self.suite, indexes)
+        return self
+
+    def merge(self, other: "ValidationState") -> "ValidationState":
+        self.n_rows += other.n_rows
+        self.columns.extend(c for c in other.columns if c not in self.columns)
+        for column, state in other.column_states.items():
+            if column in self.column_states:
+                self.column_states[column].merge(state)
+            else:
+                self.column_states[column] = state
+        return self
+
+    def _column_result(self, i: int, state: ColumnState):
+        etype, kwargs = self.suite[i]["expectation_type"], self.suite[i]["kwargs"]
+        if etype == "expect_column_to_exist":
+            return True, {}
+        if etype == "expect_column_values_to_not_be_null":
+            return state.missing_count == 0, not_null_result(state.element_count, state.missing_count)
+        if etype in TYPE_EXPECTATIONS:
+            name, type_name = state.dtype()
+            observed = name if etype.endswith("type_list") else type_name
+            return type_ok(etype, kwargs, name, type_name), {"observed_value": observed}
+        if etype in MAP_EXPECTATIONS:
+            count = state.unexpected[i]
+            return count == 0, map_result(state.element_count, state.missing_count, count, state.partial.get(i, []))
+        if etype == "expect_column_distinct_values_to_be_in_set":
+            return distinct_result(state.tally.keys(), kwargs["value_set"], state.element_count)
+        raise NotImplementedError(etype)
+
+    def finalize(self, suite_name: str = "default", elapsed_s: float = 0.0) -> dict:
+        """GE-shaped report for everything seen so far"""
+        results = [None] * len(self.suite)
+        table_results(self.suite, results, self.n_rows, len(self.columns))
+        for column, indexes in self.by_column.items():
+            state = self.column_states.get(column)
+            if state is None:
+                missing_column_results(self.suite, results, column, indexes)
+                continue
+            for i in indexes:
+                ok, result = self._column_result(i, state)
+                results[i] = result_entry(self.suite[i], bool(ok), result)
+
+        report = build_report(results, suite_name, datetime.now(timezone.utc), elapsed_s)
+        report["meta"]["column_summaries"] = {
+            column: state.summary() for column, state in self.column_states.items()
+        }
+        return report
+
+
+# ===================================================================
+# CHUNK / PARTITION DRIVERS
+# ===================================================================
+def iter_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield DataFrame chunks from a CSV or Parquet file"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def read_columns(path: str) -> list:
+    """Column names of a CSV or Parquet file without reading its rows"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def list_partitions(dataset_dir: str) -> list:
+    return sorted(glob.glob(os.path.join(dataset_dir, "**", "*.parquet"), recursive=True))
+
+
+def validate_file(path: str, suite: list, chunk_size: int = DEFAULT_CHUNK_SIZE) -> ValidationState:
+    state = ValidationState(suite)
+    for chunk in iter_chunks(path, chunk_size):
+        state.update(chunk)
+    return state
+
+
+def validate_partitions(paths: list, suite: list, max_workers: int = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE, suite_name: str = "default") -> dict:
+    """Validate partitions in parallel worker processes and merge their states"""
+    start = time.perf_counter()
+    merged = ValidationState(suite)
+    if max_workers == 1 or len(paths) <= 1:
+        for path in paths:
+            merged.merge(validate_file(path, suite, chunk_size))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for state in pool.map(validate_file, paths, [suite] * len(paths), [chunk_size] * len(paths)):
+                merged.merge(state)
+    return merged.finalize(suite_name, time.perf_counter() - start)
@@ -0,0 +1,88 @@
+"""
+The IVF preprocessed-data expectation suite, defined once as data.
+
+Each expectation is a dict in Great Expectations' expectation_config shape
+({"expectation_type": ..., "kwargs": {...}}) so the same definitions drive
+the offline native validator, the streaming validator and the API's
+online checks.
+"""
+
+# ===================================================================
+# RULE DEFINITIONS
+# ===================================================================
+ROW_COUNT_RANGE = (600, 800)
+COLUMN_COUNT_RANGE = (15, 20)
+
+NUMERIC_COLS = [
+    "age",
+    "amh_ng_ml",
+    "day",
+    "avg_follicle_size_mm",
+    "follicle_count",
+    "estradiol_pg_ml",
+    "progesterone_ng_ml",
+    "trigger_recommended",
+]
+NUMERIC_TYPES = ["int64", "float64", "Int64"]
+
+# Clinical ranges (inclusive); preprocessing's drop_impossible_values builds its mask from these
+CLINICAL_RANGES = {
+    "age": (18, 50),
+    "amh_ng_ml": (0.1, 15),
+    "day": (2, 14),
+    "avg_follicle_size_mm": (8, 30),
+    "follicle_count": (1, 60),
+    "estradiol_pg_ml": (20, 6000),
+    "progesterone_ng_ml": (0.1, 5.0),
+}
+
+TARGET_VALUES = {"trigger_recommended": [0, 1]}
+
+# Engineered categorical features, checked only when present
+CATEGORY_SETS = {
+    "age_group": ["<30", "30-34", "35-37", "38-40", ">40"],
+    "amh_group": ["low", "normal", "high"],
+    "follicle_size_band": ["<12", "12-19", ">=20"],
+}
+BINARY_PROXY_COLS = ["high_response_proxy", "ohss_risk_proxy"]
+
+
+def _exp(expectation_type: str, **kwargs) -> dict:
+    return {"expectation_type": expectation_type, "kwargs": kwargs}
+
+
+def build_suite(columns) -> list:
+    """Expectations in the order ge_validate_ivf_preprocessed.py declared them"""
+    columns = set(columns)
+    suite = [
+        _exp("expect_table_row_count_to_be_between",
+             min_value=ROW_COUNT_RANGE[0], max_value=ROW_COUNT_RANGE[1]),
+        _exp("expect_table_column_count_to_be_between",
+             min_value=COLUMN_COUNT_RANGE[0], max_value=COLUMN_COUNT_RANGE[1]),
+    ]
+
+    for col in NUMERIC_COLS:
+        suite.append(_exp("expect_column_to_exist", column=col))
+        suite.append(_exp("expect_column_values_to_not_be_null", column=col))
+        suite.append(_exp("expect_column_values_to_be_in_type_list", column=col, type_list=NUMERIC_TYPES))
+
+    suite.append(_exp("expect_column_to_exist", column="patient_id"))
+    suite.append(_exp("expect_column_values_to_not_be_null", column="patient_id"))
+    suite.append(_exp("expect_column_values_to_be_of_type", column="patient_id", type_="object"))
+
+    for col, (low, high) in CLINICAL_RANGES.items():
+        suite.append(_exp("expect_column_values_to_be_between", column=col, min_value=low, max_value=high))
+
+    for col, values in TARGET_VALUES.items():
+        suite.append(_exp("expect_column_values_to_be_in_set", column=col, value_set=values))
+
+    for col, values in CATEGORY_SETS.items():
+        if col in columns:
+            suite.append(_exp("expect_column_values_to_not_be_null", column=col))
+            suite.append(_exp("expect_column_distinct_values_to_be_in_set", column=col, value_set=values))
+
+    for col in BINARY_PROXY_COLS:
+        if col in columns:
+            suite.append(_exp("expect_column_values_to_be_in_set", column=col, value_set=[0, 1]))
+
+    return suite